@@ -0,0 +1,150 @@
+"""Time the reporting queries against a fixture database (see fixture_db.py).
+
+Each case runs --repeticiones times. The table shows the best and median
+wall time, the rows produced and the peak Python memory (tracemalloc) of the
+best run. --json keeps the results, and --comparar prints the ratio against
+a previous --json run. Query or streaming changes can then be measured at
+--escala 10 and 100 before they reach production:
+
+    python bench_reportes.py --url postgresql://localhost/sisat_fixture --json bench_x10.json
+    python bench_reportes.py --url postgresql://localhost/sisat_fixture --comparar bench_x10.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import sisat_db
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scratch"))
+import check_eval_results as evals  # noqa: E402
+import reporte_nocturno as nocturno  # noqa: E402
+
+WATERMARK_QUERY = 'SELECT "updatedAt", id FROM "PreRevision" ORDER BY "updatedAt", id OFFSET %s LIMIT 1'
+
+
+def _drain(rows):
+    n = 0
+    for _ in rows:
+        n += 1
+    return n
+
+
+def case_eval_fetchall(ctx):
+    # The original check_eval_results.py: everything in memory before output
+    with sisat_db.pooled_connection() as conn:
+        with conn.cursor(cursor_factory=evals.RealDictCursor) as cur:
+            cur.execute(evals.REPORT_QUERY)
+            return len(cur.fetchall())
+
+
+def case_eval_stream(batch_size):
+    def run(ctx):
+        with sisat_db.pooled_connection() as conn, open(os.devnull, "w", encoding="utf-8") as out:
+            return evals.write_csv(evals.iter_rows(conn, batch_size), out)
+    return run
+
+
+def case_eval_since(ctx):
+    with sisat_db.pooled_connection() as conn:
+        return _drain(evals.iter_rows(conn, 1000, ctx["watermark"], full_history=False))
+
+
+def case_aggregate(query):
+    def run(ctx):
+        with sisat_db.pooled_connection() as conn:
+            return len(evals.fetch_aggregate(conn, query)[1])
+    return run
+
+
+def case_nocturno_serial(ctx):
+    return sum(len(nocturno.run_report(r, ctx)[2]) for r in nocturno.REPORTS)
+
+
+def case_nocturno_concurrente(ctx):
+    return sum(len(rows) for _, _, rows, _ in nocturno.run_reports(nocturno.REPORTS, ctx))
+
+
+CASES = [
+    ("eval_fetchall", case_eval_fetchall),
+    ("eval_stream_1000", case_eval_stream(1000)),
+    ("eval_stream_10000", case_eval_stream(10000)),
+    ("eval_since_10pct", case_eval_since),
+    ("eval_resumen", case_aggregate(evals.RESUMEN_QUERY)),
+    ("eval_intentos", case_aggregate(evals.INTENTOS_QUERY)),
+    ("nocturno_serial", case_nocturno_serial),
+    ("nocturno_concurrente", case_nocturno_concurrente),
+]
+
+
+def build_context():
+    # Active cycle for the nightly reports, and a watermark that leaves the
+    # newest 10% of PreRevisions for the incremental case
+    ciclo_id, ciclo_nombre = sisat_db.resolve_ciclo()
+    with sisat_db.pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT count(*) FROM "PreRevision"')
+            total = cur.fetchone()[0]
+            cur.execute(WATERMARK_QUERY, (max(int(total * 0.9) - 1, 0),))
+            row = cur.fetchone()
+    watermark = {"updatedAt": row[0].isoformat(), "id": row[1]} if row else None
+    return {"ciclo_id": ciclo_id, "ciclo_nombre": ciclo_nombre, "tenant": sisat_db.TENANT_ID,
+            "watermark": watermark, "prerevisiones": total}
+
+
+def measure(fn, ctx, repeticiones):
+    times, best = [], None
+    for _ in range(repeticiones):
+        tracemalloc.start()
+        start = time.perf_counter()
+        rows = fn(ctx)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        times.append(elapsed)
+        if best is None or elapsed < best["segundos"]:
+            best = {"segundos": elapsed, "filas": rows, "pico_mib": peak / 2**20}
+    best["mediana"] = statistics.median(times)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide los reportes contra una base de datos sintética")
+    parser.add_argument("--url", required=True, help="Fixture Postgres URL built by fixture_db.py")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--casos", nargs="+", choices=[name for name, _ in CASES], help="Only these cases")
+    parser.add_argument("--json", help="Save the results here")
+    parser.add_argument("--comparar", help="Previous --json results to compare against")
+    args = parser.parse_args()
+
+    # Everything below goes through sisat_db, so point it at the fixture first
+    os.environ["DATABASE_URL"] = args.url
+    sisat_db.get_database_url.cache_clear()
+
+    ctx = build_context()
+    print(f"Ciclo {ctx['ciclo_nombre']}, {ctx['prerevisiones']} PreRevisions")
+    baseline = {}
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["casos"]
+
+    results = {}
+    print(f"{'caso':<22}{'mejor s':>10}{'mediana s':>11}{'filas':>10}{'pico MiB':>10}{'vs base':>9}")
+    for name, fn in CASES:
+        if args.casos and name not in args.casos:
+            continue
+        r = results[name] = measure(fn, ctx, args.repeticiones)
+        ratio = f"{r['segundos'] / baseline[name]['segundos']:.2f}x" if name in baseline else ""
+        print(f"{name:<22}{r['segundos']:>10.3f}{r['mediana']:>11.3f}{r['filas']:>10}{r['pico_mib']:>10.1f}{ratio:>9}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"prerevisiones": ctx["prerevisiones"], "casos": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
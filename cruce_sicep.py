@@ -0,0 +1,377 @@
+"""Cross-check the Formato 911 against a SICEP enrollment export, group by group.
+
+The export is a CSV or workbook with one row per student (CCT, semestre,
+grupo, CURP and sexo; the headers are found by name). Students are sorted by
+(CCT, semestre, grupo) and rolled up into groups and semesters in one pass.
+The 911 detalle rows are sorted by (CCT, semestre), and the two sides are
+compared with a single merge-join, so the whole zone (or state) costs one
+sort per side. Both sides are sorted here rather than with ORDER BY, so the
+join never depends on the database collation. A separate sort by CURP finds
+students listed more than once.
+
+Each Estadistica911Registro whose CCT is in the export gets one
+EstadisticaCruceSicep row with the totals and the per-semester/per-group
+differences in discrepancias. Its previous row is replaced, and everything is
+loaded with one COPY. Registros absent from the export are only listed, so a
+partial export never overwrites the other schools (--incluir-sin-sicep writes
+zero-enrollment rows for them on purpose):
+
+    python cruce_sicep.py matricula_sicep.csv --dry-run --out cruce.csv
+    python cruce_sicep.py sicep_estatal.xlsx --todas-las-zonas --corte INICIO_DE_CURSOS
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from itertools import groupby
+from operator import itemgetter
+
+from openpyxl import load_workbook
+
+import sisat_db
+
+HEADER_SCAN_ROWS = 20
+FIELD_PATTERNS = {
+    "cct": re.compile(r"\bcct\b|clave (del )?(centro|escuela|plantel)|^clave$"),
+    "semestre": re.compile(r"semestre|grado"),
+    "grupo": re.compile(r"grupo"),
+    "curp": re.compile(r"curp"),
+    "sexo": re.compile(r"sexo|genero"),
+}
+REQUIRED_FIELDS = ("cct", "semestre", "grupo")
+ORDINALES = {"primer": 1, "segund": 2, "tercer": 3, "cuart": 4, "quint": 5, "sext": 6}
+SEXO_HOMBRE = {"h", "hombre", "masculino", "1"}
+SEXO_MUJER = {"m", "mujer", "femenino", "2"}
+REPORT_FIELDS = ["cct", "semestreGrado", "grupo", "alumnosGrupo", "tipo", "sicep", "f911", "diferencia", "descripcion"]
+
+CRUCE_911_QUERY = """
+    SELECT r.id, r."tenantId", r."escuelaCCT", d."semestreGrado", d.hombres, d.mujeres, d.total, d.grupos
+    FROM "Estadistica911Registro" r
+    LEFT JOIN "EstadisticaDetalleGrado" d ON d."registroId" = r.id
+    WHERE r."cicloEscolarId" = %(ciclo)s AND r."tipoCorte" = %(corte)s
+      AND (%(tenant)s::text IS NULL OR r."tenantId" = %(tenant)s)
+"""
+DELETE_QUERY = 'DELETE FROM "EstadisticaCruceSicep" WHERE "registroId" = ANY(%s)'
+CRUCE_COLUMNS = ["id", "tenantId", "registroId", "matriculaSicepTotal", "matricula911Total", "diferencia",
+                 "discrepancias"]
+
+
+def _norm(value):
+    text = unicodedata.normalize("NFKD", str(value)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def parse_semestre(value):
+    # 3, "3", "3°", "3ER SEMESTRE", "TERCERO" -> 3; None when it isn't 1-6
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value) if 1 <= value <= 6 else None
+    text = _norm(value or "")
+    m = re.search(r"[1-6]", text)
+    if m:
+        return int(m.group(0))
+    for prefix, n in ORDINALES.items():
+        if prefix in text:
+            return n
+    return None
+
+
+def parse_sexo(value, curp):
+    # The sexo column first; failing that, the CURP's 11th character (H/M)
+    text = _norm(value or "")
+    if text in SEXO_HOMBRE:
+        return "H"
+    if text in SEXO_MUJER:
+        return "M"
+    if len(curp) == 18 and curp[10] in "HM":
+        return curp[10]
+    return None
+
+
+# ── SICEP export ────────────────────────────────────────────────────────────
+
+def _sheet_rows(path):
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from wb[wb.sheetnames[0]].iter_rows(values_only=True)
+        finally:
+            wb.close()
+        return
+    # SICEP CSVs come as UTF-8 or as Windows-1252, depending on who exported them
+    for encoding in ("utf-8-sig", "cp1252"):
+        try:
+            with open(path, "r", encoding=encoding, newline="") as f:
+                f.read()
+            break
+        except UnicodeDecodeError:
+            continue
+    with open(path, "r", encoding=encoding, newline="") as f:
+        yield from csv.reader(f)
+
+
+def read_sicep(path):
+    """-> sorted [(cct, semestre, grupo, curp, sexo, fila)] and the rows skipped.
+
+    Sorted by (CCT, semestre, grupo), the order the merge-join needs.
+    """
+    rows = _sheet_rows(path)
+    columns = None
+    for fila, row in enumerate(rows, 1):
+        labels = [_norm(v) if v not in (None, "") else "" for v in row]
+        found = {}
+        for field, pattern in FIELD_PATTERNS.items():
+            for c, label in enumerate(labels):
+                if label and c not in found.values() and pattern.search(label):
+                    found[field] = c
+                    break
+        if all(f in found for f in REQUIRED_FIELDS):
+            columns = found
+            break
+        if fila >= HEADER_SCAN_ROWS:
+            break
+    if columns is None:
+        raise ValueError(f"{os.path.basename(path)}: no se encontró el encabezado (CCT, semestre, grupo)")
+
+    def cell(row, field):
+        c = columns.get(field)
+        return row[c] if c is not None and c < len(row) else None
+
+    alumnos, omitidas = [], []
+    for fila, row in enumerate(rows, fila + 1):
+        if not row or all(v in (None, "") for v in row):
+            continue
+        cct = str(cell(row, "cct") or "").strip().upper()
+        semestre = parse_semestre(cell(row, "semestre"))
+        if not cct or semestre is None:
+            omitidas.append(fila)
+            continue
+        curp = str(cell(row, "curp") or "").strip().upper()
+        grupo = str(cell(row, "grupo") or "").strip().upper()
+        alumnos.append((cct, semestre, grupo, curp, parse_sexo(cell(row, "sexo"), curp), fila))
+    alumnos.sort(key=itemgetter(0, 1, 2))
+    return alumnos, omitidas
+
+
+def sicep_semesters(alumnos):
+    # Sorted students -> [(cct, semestre, {hombres, mujeres, total, grupos: [...]})],
+    # still in (CCT, semestre) order; one linear pass
+    out = []
+    for (cct, semestre), por_semestre in groupby(alumnos, key=itemgetter(0, 1)):
+        grupos = []
+        for grupo, miembros in groupby(por_semestre, key=itemgetter(2)):
+            sexos = [a[4] for a in miembros]
+            grupos.append({"grupo": grupo, "hombres": sexos.count("H"), "mujeres": sexos.count("M"),
+                           "total": len(sexos)})
+        out.append((cct, semestre, {
+            "hombres": sum(g["hombres"] for g in grupos), "mujeres": sum(g["mujeres"] for g in grupos),
+            "total": sum(g["total"] for g in grupos), "grupos": grupos,
+        }))
+    return out
+
+
+def duplicate_curps(alumnos):
+    # -> {cct: [discrepancy]}; sorted by CURP, so repeats are adjacent
+    out = {}
+    con_curp = sorted((a for a in alumnos if a[3]), key=itemgetter(3))
+    for curp, repetidos in groupby(con_curp, key=itemgetter(3)):
+        repetidos = list(repetidos)
+        if len(repetidos) < 2:
+            continue
+        lugares = [{"cct": a[0], "semestreGrado": a[1], "grupo": a[2], "fila": a[5]} for a in repetidos]
+        for cct in sorted({a[0] for a in repetidos}):
+            out.setdefault(cct, []).append({
+                "tipo": "CURP_DUPLICADA",
+                "curp": curp,
+                "descripcion": f"La CURP {curp} aparece {len(repetidos)} veces en la matrícula SICEP.",
+                "registros": lugares,
+            })
+    return out
+
+
+# ── 911 side ────────────────────────────────────────────────────────────────
+
+def load_911(conn, ciclo_id, corte, tenant=None):
+    """-> ({cct: {registro, tenant}}, sorted [(cct, semestre, {hombres, mujeres, total, grupos})])."""
+    registros, semestres = {}, []
+    for reg_id, tenant_id, cct, s, h, m, t, g in sisat_db.stream(
+            conn, CRUCE_911_QUERY, {"ciclo": ciclo_id, "corte": corte, "tenant": tenant}, name="cruce_sicep"):
+        cct = (cct or "").strip().upper()
+        registros[cct] = {"registro": reg_id, "tenant": tenant_id}
+        if s is not None:
+            semestres.append((cct, s, {"hombres": h, "mujeres": m, "total": t, "grupos": g}))
+    semestres.sort(key=itemgetter(0, 1))
+    return registros, semestres
+
+
+# ── Merge-join ──────────────────────────────────────────────────────────────
+
+def merge_join(left, right):
+    # Full outer join of two lists sorted by their (cct, semestre) prefix
+    # -> (cct, semestre, left value or None, right value or None)
+    i = j = 0
+    while i < len(left) or j < len(right):
+        lk = left[i][:2] if i < len(left) else None
+        rk = right[j][:2] if j < len(right) else None
+        if rk is None or (lk is not None and lk < rk):
+            yield lk + (left[i][2], None)
+            i += 1
+        elif lk is None or rk < lk:
+            yield rk + (None, right[j][2])
+            j += 1
+        else:
+            yield lk + (left[i][2], right[j][2])
+            i += 1
+            j += 1
+
+
+def compare_semester(semestre, sicep, f911):
+    # -> discrepancies for one (CCT, semestre)
+    if f911 is None:
+        return [{
+            "tipo": "SEMESTRE_SIN_911", "semestreGrado": semestre, "sicep": sicep["total"], "f911": 0,
+            "diferencia": sicep["total"],
+            "descripcion": f"SICEP reporta {sicep['total']} alumnos en {semestre}° Semestre, que no aparece en el 911.",
+            "grupos": sicep["grupos"],
+        }]
+    if sicep is None:
+        if not f911["total"]:
+            return []
+        return [{
+            "tipo": "SEMESTRE_SIN_SICEP", "semestreGrado": semestre, "sicep": 0, "f911": f911["total"],
+            "diferencia": -f911["total"],
+            "descripcion": f"El 911 reporta {f911['total']} alumnos en {semestre}° Semestre sin alumnos en SICEP.",
+        }]
+    out = []
+    if (sicep["total"], sicep["hombres"], sicep["mujeres"]) != (f911["total"], f911["hombres"], f911["mujeres"]):
+        out.append({
+            "tipo": "DIFERENCIA_MATRICULA", "semestreGrado": semestre, "sicep": sicep["total"], "f911": f911["total"],
+            "diferencia": sicep["total"] - f911["total"],
+            "descripcion": f"{semestre}° Semestre: SICEP {sicep['total']} alumnos (H {sicep['hombres']}, "
+                           f"M {sicep['mujeres']}) contra 911 {f911['total']} (H {f911['hombres']}, "
+                           f"M {f911['mujeres']}).",
+            "detalles": {"sicep": {k: sicep[k] for k in ("hombres", "mujeres", "total")},
+                         "f911": {k: f911[k] for k in ("hombres", "mujeres", "total")}},
+            "grupos": sicep["grupos"],
+        })
+    if len(sicep["grupos"]) != f911["grupos"]:
+        out.append({
+            "tipo": "DIFERENCIA_GRUPOS", "semestreGrado": semestre, "sicep": len(sicep["grupos"]),
+            "f911": f911["grupos"], "diferencia": len(sicep["grupos"]) - f911["grupos"],
+            "descripcion": f"{semestre}° Semestre: SICEP tiene {len(sicep['grupos'])} grupos "
+                           f"({', '.join(g['grupo'] or '(sin grupo)' for g in sicep['grupos'])}) "
+                           f"y el 911 reporta {f911['grupos']}.",
+            "grupos": sicep["grupos"],
+        })
+    return out
+
+
+def cross_check(alumnos, registros, semestres_911, incluir_sin_sicep=False):
+    """-> (cruces, {cct: students} for CCTs without a 911 registro, [CCTs with a registro but no students]).
+
+    Only CCTs present in the export get a cruce, so a partial export (one
+    school, one region) leaves every other school's cross-check alone.
+    incluir_sin_sicep also builds them for the registros without students.
+    """
+    en_sicep = {a[0] for a in alumnos}
+    sin_sicep = sorted(cct for cct in registros if cct not in en_sicep)
+    incluidos = registros if incluir_sin_sicep else en_sicep.intersection(registros)
+    cruces = {cct: {"cct": cct, "sicep": 0, "f911": 0, "discrepancias": []} for cct in incluidos}
+    sin_registro = {}
+    for cct, semestre, sicep, f911 in merge_join(sicep_semesters(alumnos), semestres_911):
+        cruce = cruces.get(cct)
+        if cruce is None:
+            if cct not in registros:
+                sin_registro[cct] = sin_registro.get(cct, 0) + sicep["total"]
+            continue
+        cruce["sicep"] += sicep["total"] if sicep else 0
+        cruce["f911"] += f911["total"] if f911 else 0
+        cruce["discrepancias"].extend(compare_semester(semestre, sicep, f911))
+    for cct, duplicados in duplicate_curps(alumnos).items():
+        if cct in cruces:
+            cruces[cct]["discrepancias"].extend(duplicados)
+    for cct, cruce in cruces.items():
+        cruce.update(registros[cct], diferencia=cruce["sicep"] - cruce["f911"])
+    return sorted(cruces.values(), key=itemgetter("cct")), sin_registro, sin_sicep
+
+
+# ── Output ──────────────────────────────────────────────────────────────────
+
+def save_cruces(conn, cruces):
+    # Replace each registro's previous cross-check; -> rows inserted
+    with conn.cursor() as cur:
+        cur.execute(DELETE_QUERY, ([c["registro"] for c in cruces],))
+        return sisat_db.copy_rows(cur, '"EstadisticaCruceSicep"', CRUCE_COLUMNS, (
+            (sisat_db.new_id(), c["tenant"], c["registro"], c["sicep"], c["f911"], c["diferencia"],
+             json.dumps(c["discrepancias"], ensure_ascii=False)) for c in cruces))
+
+
+def write_report(path, cruces):
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        for c in cruces:
+            for d in c["discrepancias"]:
+                grupos = d.get("grupos") or [{"grupo": ""}]
+                for g in grupos:
+                    writer.writerow({
+                        "cct": c["cct"], "semestreGrado": d.get("semestreGrado", ""), "grupo": g["grupo"],
+                        "alumnosGrupo": g.get("total", ""), "tipo": d["tipo"], "sicep": d.get("sicep", ""),
+                        "f911": d.get("f911", ""), "diferencia": d.get("diferencia", ""),
+                        "descripcion": d["descripcion"],
+                    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cruza la matrícula SICEP contra el Formato 911 por semestre y grupo")
+    parser.add_argument("sicep", help="SICEP enrollment export (.csv, .xlsx), one row per student")
+    parser.add_argument("--ciclo", help="CicloEscolar.nombre (default: the active cycle)")
+    parser.add_argument("--corte", default="INICIO_DE_CURSOS", choices=["INICIO_DE_CURSOS", "FIN_DE_CURSOS"],
+                        help="911 tipoCorte the export corresponds to")
+    parser.add_argument("--tenant", default=sisat_db.TENANT_ID, help="tenantId (default: $TENANT_ID or zona004)")
+    parser.add_argument("--todas-las-zonas", action="store_true", help="Every tenant in the database (the whole state)")
+    parser.add_argument("--incluir-sin-sicep", action="store_true",
+                        help="Also write zero-enrollment cruces for 911 registros with no students in the export")
+    parser.add_argument("--dry-run", action="store_true", help="Cross-check and report without writing to the database")
+    parser.add_argument("--out", help="CSV with one row per discrepancy and group")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        alumnos, omitidas = read_sicep(args.sicep)
+    except ValueError as e:
+        parser.error(str(e))
+    leido = time.perf_counter()
+
+    ciclo_id, ciclo_nombre = sisat_db.resolve_ciclo(args.ciclo)
+    tenant = None if args.todas_las_zonas else args.tenant
+    with sisat_db.pooled_connection() as conn:
+        registros, semestres_911 = load_911(conn, ciclo_id, args.corte, tenant)
+        cargado = time.perf_counter()
+        cruces, sin_registro, sin_sicep = cross_check(alumnos, registros, semestres_911, args.incluir_sin_sicep)
+        cruzado = time.perf_counter()
+        if cruces and not args.dry_run:
+            insertados = save_cruces(conn, cruces)
+            print(f"{insertados} cruces guardados en EstadisticaCruceSicep")
+
+    con_diferencias = sum(1 for c in cruces if c["discrepancias"])
+    print(f"SICEP: {len(alumnos)} alumnos ({len(omitidas)} filas omitidas) en {leido - start:.2f}s; "
+          f"911 ciclo {ciclo_nombre} {args.corte}: {len(registros)} registros en {cargado - leido:.2f}s")
+    print(f"Cruce en {cruzado - cargado:.2f}s: {con_diferencias} de {len(cruces)} escuelas con discrepancias")
+    if sin_registro:
+        print(f"{len(sin_registro)} CCT con alumnos en SICEP sin registro 911: "
+              + ", ".join(f"{cct} ({n})" for cct, n in sorted(sin_registro.items())))
+    if sin_sicep:
+        accion = "cruzados con matrícula 0" if args.incluir_sin_sicep else "sin cambios en su cruce"
+        print(f"{len(sin_sicep)} registros 911 sin alumnos en el archivo SICEP ({accion}): " + ", ".join(sin_sicep))
+    if args.out:
+        write_report(args.out, cruces)
+        print(f"Discrepancias -> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
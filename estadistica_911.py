@@ -0,0 +1,403 @@
+"""Re-run the Formato 911 arithmetic checks over a whole zone (or state) in one pass.
+
+Python port of validarAritmetica911 / procesarFormato911Excel
+(src/lib/estadistica-911-engine.ts). The input is either every
+Estadistica911Registro with its EstadisticaDetalleGrado rows, or a folder of
+911 workbooks. It is loaded into NumPy arrays (school x semester x sex, plus
+an age axis from desgloseEdades), and every rule is evaluated over the whole
+batch at once. From the database, the new inconsistenciasJson, estado and
+totals are written back with one COPY + UPDATE, and only rows whose result
+changed are touched. After a ruleset change, nobody has to upload again:
+
+    python estadistica_911.py --dry-run --out inconsistencias_911.csv
+    python estadistica_911.py --ciclo 2025-2026 --todas-las-zonas
+    python estadistica_911.py formatos_911/ --json resultado_911.json
+
+Keep SEMESTER_RULES and validate() in step with the TypeScript engine; the
+upload route still validates single files with it.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from openpyxl import load_workbook
+
+import sisat_db
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+from read_excel import file_sha256, find_workbooks  # noqa: E402
+
+SEMESTRES = 6
+HOMBRES, MUJERES = 0, 1
+CCT_RE = re.compile(r"21[A-Z0-9]{8}")
+# Delivered to CORDE: the checks are refreshed but the state is not reopened
+ESTADO_CERRADO = "ENTREGADO_A_CORDE"
+REPORT_FIELDS = ["registro", "archivo", "cct", "semestreGrado", "tipo", "severidad", "campo", "descripcion"]
+
+# Registros with no detalle rows (PDF uploads) have nothing to re-check and are skipped
+DETALLES_QUERY = """
+    SELECT r.id, r."escuelaCCT", r."totalDocentes", r.estado, r."sha256Hash",
+           d."semestreGrado", d.hombres, d.mujeres, d.total, d.grupos, d."desgloseEdades"
+    FROM "Estadistica911Registro" r
+    JOIN "EstadisticaDetalleGrado" d ON d."registroId" = r.id
+    WHERE r."cicloEscolarId" = %(ciclo)s
+      AND (%(tenant)s::text IS NULL OR r."tenantId" = %(tenant)s)
+      AND (%(corte)s::text IS NULL OR r."tipoCorte" = %(corte)s)
+    ORDER BY r.id, d."semestreGrado"
+"""
+
+STAGE_TABLE = "revalidacion_911"
+STAGE_COLUMNS = ["id", "estado", "inconsistenciasJson", "totalHombres", "totalMujeres", "totalAlumnos", "totalGrupos"]
+STAGE_DDL = f"""
+    CREATE TEMP TABLE {STAGE_TABLE} (
+        id text PRIMARY KEY, estado text, "inconsistenciasJson" jsonb,
+        "totalHombres" int, "totalMujeres" int, "totalAlumnos" int, "totalGrupos" int
+    ) ON COMMIT DROP
+"""
+APPLY_QUERY = f"""
+    UPDATE "Estadistica911Registro" r
+    SET "inconsistenciasJson" = v."inconsistenciasJson",
+        estado = CASE WHEN r.estado = '{ESTADO_CERRADO}' THEN r.estado ELSE v.estado::"EstadoEstadistica911" END,
+        "totalHombres" = v."totalHombres", "totalMujeres" = v."totalMujeres",
+        "totalAlumnos" = v."totalAlumnos", "totalGrupos" = v."totalGrupos",
+        "updatedAt" = now()
+    FROM {STAGE_TABLE} v
+    WHERE r.id = v.id
+      AND (r."inconsistenciasJson" IS DISTINCT FROM v."inconsistenciasJson"
+           OR (r.estado <> '{ESTADO_CERRADO}' AND r.estado::text <> v.estado)
+           OR (r."totalHombres", r."totalMujeres", r."totalAlumnos", r."totalGrupos")
+              <> (v."totalHombres", v."totalMujeres", v."totalAlumnos", v."totalGrupos"))
+"""
+
+
+def _n(x):
+    # JSON/message number the way JavaScript prints it: 12, not 12.0
+    x = float(x)
+    return int(x) if x.is_integer() else x
+
+
+def _js_number(value):
+    # Number(value) for a spreadsheet cell; None for NaN (text) or an empty cell
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    if not text:
+        return 0.0
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _count(value):
+    # Math.max(0, Number(value) || 0)
+    try:
+        n = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return n if n > 0 else 0.0
+
+
+def _count_raw(value):
+    # Number(value) || 0: ages are summed as reported, without the clamp
+    try:
+        n = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if n != n else n
+
+
+# ── Loading ─────────────────────────────────────────────────────────────────
+
+def build_batch(registros, detalles):
+    """Arrays for a batch of schools.
+
+    registros: [{registro, archivo, cct, docentes, estado, sha256}], one per
+    school. detalles: [(school index, semestreGrado, h, m, t, grupos,
+    desgloseEdades or None)]. Semesters outside 1-6 are ignored.
+    """
+    n = len(registros)
+    idx, sem, values, edades = [], [], [], []
+    for i, s, h, m, t, g, desglose in detalles:
+        if not 1 <= s <= SEMESTRES:
+            continue
+        idx.append(i)
+        sem.append(s - 1)
+        values.append((_count(h), _count(m), _count(t), _count(g)))
+        if isinstance(desglose, dict) and desglose:
+            for edad, par in desglose.items():
+                par = par if isinstance(par, dict) else {}
+                edades.append((len(idx) - 1, str(edad), _count_raw(par.get("h")), _count_raw(par.get("m"))))
+
+    idx = np.array(idx, dtype=int)
+    sem = np.array(sem, dtype=int)
+    values = np.array(values, dtype=float).reshape(-1, 4)
+
+    presente = np.zeros((n, SEMESTRES), dtype=bool)
+    sexo = np.zeros((n, SEMESTRES, 2))
+    total = np.zeros((n, SEMESTRES))
+    grupos = np.zeros((n, SEMESTRES))
+    presente[idx, sem] = True
+    sexo[idx, sem, HOMBRES] = values[:, 0]
+    sexo[idx, sem, MUJERES] = values[:, 1]
+    total[idx, sem] = values[:, 2]
+    grupos[idx, sem] = values[:, 3]
+
+    # Age axis: every key seen in the batch, sorted numerically where possible
+    claves = sorted({e[1] for e in edades}, key=lambda k: (not k.isdigit(), int(k) if k.isdigit() else 0, k))
+    pos = {k: a for a, k in enumerate(claves)}
+    por_edad = np.zeros((n, SEMESTRES, len(claves), 2))
+    con_edades = np.zeros((n, SEMESTRES), dtype=bool)
+    if edades:
+        fila = np.array([e[0] for e in edades], dtype=int)
+        a = np.array([pos[e[1]] for e in edades], dtype=int)
+        por_edad[idx[fila], sem[fila], a, HOMBRES] = [e[2] for e in edades]
+        por_edad[idx[fila], sem[fila], a, MUJERES] = [e[3] for e in edades]
+        con_edades[idx[fila], sem[fila]] = True
+
+    return {
+        "registros": registros,
+        "docentes": np.array([_count(r["docentes"]) for r in registros]).reshape(n),
+        "presente": presente, "sexo": sexo, "total": total, "grupos": grupos,
+        "edades": por_edad, "claves_edad": claves, "con_edades": con_edades,
+    }
+
+
+def load_db_batch(conn, ciclo_id, tenant=None, corte=None, itersize=5000):
+    registros, detalles, pos = [], [], {}
+    params = {"ciclo": ciclo_id, "tenant": tenant, "corte": corte}
+    for row in sisat_db.stream(conn, DETALLES_QUERY, params, name="estadistica_911", itersize=itersize):
+        reg_id, cct, docentes, estado, sha, s, h, m, t, g, desglose = row
+        i = pos.get(reg_id)
+        if i is None:
+            i = pos[reg_id] = len(registros)
+            registros.append({"registro": reg_id, "archivo": None, "cct": cct, "docentes": docentes,
+                              "estado": estado, "sha256": sha})
+        detalles.append((i, s, h, m, t, g, desglose))
+    return build_batch(registros, detalles)
+
+
+def read_911_workbook(path):
+    # procesarFormato911Excel: first sheet, CCT, docentes and one row per semester
+    # -> ({archivo, cct, docentes, sha256}, [(semestre, h, m, t, grupos)])
+    registro = {"registro": None, "archivo": os.path.basename(path), "cct": "", "docentes": 0,
+                "estado": None, "sha256": file_sha256(path)}
+    semestres = {s: (0, 0, 0, 0) for s in range(1, SEMESTRES + 1)}
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[wb.sheetnames[0]]
+        for row in ws.iter_rows(values_only=True):
+            if not row or all(v is None for v in row):
+                continue
+            text = " ".join("" if v is None else str(v).upper() for v in row)
+            if not registro["cct"]:
+                m = CCT_RE.search(text)
+                if m:
+                    registro["cct"] = m.group(0)
+            if "DOCENTE" in text or "PROFESOR" in text:
+                for v in row:
+                    n = _js_number(v)
+                    if n is not None and 0 < n < 200 and registro["docentes"] == 0:
+                        registro["docentes"] = n
+                        break
+            nums = [n for n in map(_js_number, row) if n is not None and n >= 0]
+            for s in semestres:
+                labels = (f"{s}°", f"{s}ER", f"{s}DO", f"{s}TO", f"SEMESTRE {s}")
+                if len(nums) >= 3 and any(label in text for label in labels):
+                    semestres[s] = (nums[0], nums[1], nums[2], nums[3] if len(nums) >= 4 else 1)
+    finally:
+        wb.close()
+    return registro, [(s,) + v for s, v in semestres.items()]
+
+
+def load_folder_batch(paths, workers=None):
+    files = find_workbooks(paths)
+    if len(files) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(read_911_workbook, files))
+    else:
+        parsed = [read_911_workbook(f) for f in files]
+    registros = [r for r, _ in parsed]
+    detalles = [(i, s, h, m, t, g, None) for i, (_, grados) in enumerate(parsed) for s, h, m, t, g in grados]
+    return build_batch(registros, detalles)
+
+
+# ── Rules ───────────────────────────────────────────────────────────────────
+
+def _descuadre_genero(b, i, s):
+    h, m, t = b["sexo"][i, s, HOMBRES], b["sexo"][i, s, MUJERES], b["total"][i, s]
+    n = s + 1
+    return {
+        "campo": f"Semestre {n} - Matrícula",
+        "descripcion": f"Descuadre de género en {n}° Semestre: Hombres ({_n(h)}) + Mujeres ({_n(m)}) = {_n(h + m)}, "
+                       f"pero se reportó un total de {_n(t)}.",
+        "detalles": {"hombres": _n(h), "mujeres": _n(m), "sumaCalculada": _n(h + m), "totalReportado": _n(t)},
+    }
+
+
+def _descuadre_edades(b, i, s):
+    eh, em = b["edades"][i, s].sum(axis=0)
+    t = b["total"][i, s]
+    n = s + 1
+    return {
+        "campo": f"Semestre {n} - Edades",
+        "descripcion": f"Descuadre por edades en {n}° Semestre: La suma de alumnos por edad ({_n(eh + em)}) "
+                       f"no coincide con el total reportado ({_n(t)}).",
+        "detalles": {"sumaEdadesH": _n(eh), "sumaEdadesM": _n(em), "sumaEdadesTotal": _n(eh + em),
+                     "totalReportado": _n(t)},
+    }
+
+
+def _falta_grupos(b, i, s):
+    t, g = b["total"][i, s], b["grupos"][i, s]
+    n = s + 1
+    return {
+        "campo": f"Semestre {n} - Grupos",
+        "descripcion": f"En {n}° Semestre se reportan {_n(t)} alumnos pero 0 grupos asignados.",
+        "detalles": {"totalAlumnos": _n(t), "grupos": _n(g)},
+    }
+
+
+# (tipo, severidad, mask over (school, semester), message builder), in the
+# order the engine checks each semester
+SEMESTER_RULES = [
+    ("DESCUADRE_GENERO", "ERROR_CRITICO",
+     lambda b: b["sexo"].sum(axis=2) != b["total"], _descuadre_genero),
+    ("DESCUADRE_EDADES", "ERROR_CRITICO",
+     lambda b: b["con_edades"] & (b["edades"].sum(axis=(2, 3)) != b["total"]), _descuadre_edades),
+    ("FALTA_GRUPOS", "ADVERTENCIA",
+     lambda b: (b["total"] > 0) & (b["grupos"] == 0), _falta_grupos),
+]
+
+
+def validate(batch):
+    """-> per-school results: inconsistencias, esValido and the recomputed totals."""
+    presente = batch["presente"]
+    masks = np.stack([presente & rule(batch) for _, _, rule, _ in SEMESTER_RULES], axis=2)
+    criticas = np.array([sev == "ERROR_CRITICO" for _, sev, _, _ in SEMESTER_RULES])
+
+    total = batch["total"].sum(axis=1)
+    sin_matricula = total == 0
+    sin_docentes = (total > 0) & (batch["docentes"] == 0)
+    es_valido = ~((masks & criticas).any(axis=(1, 2)) | sin_matricula)
+
+    inconsistencias = [[] for _ in batch["registros"]]
+    # argwhere walks (school, semester, rule) in order, so each school's list
+    # comes out semester by semester like the engine's loop
+    for i, s, r in np.argwhere(masks):
+        tipo, severidad, _, build = SEMESTER_RULES[r]
+        inconsistencias[i].append(dict({"tipo": tipo, "severidad": severidad, "semestreGrado": int(s) + 1},
+                                       **build(batch, i, s)))
+    for i in np.flatnonzero(sin_matricula):
+        inconsistencias[i].append({"tipo": "VALOR_INVALIDO", "severidad": "ERROR_CRITICO",
+                                   "campo": "Matrícula Total",
+                                   "descripcion": "La matrícula total del plantel reportada es 0."})
+    for i in np.flatnonzero(sin_docentes):
+        inconsistencias[i].append({"tipo": "FALTA_DOCENTES", "severidad": "ADVERTENCIA", "campo": "Docentes",
+                                   "descripcion": "No se reportaron docentes frente a grupo para el plantel.",
+                                   "detalles": {"docentes": _n(batch["docentes"][i])}})
+
+    sexo = batch["sexo"].sum(axis=1)
+    grupos = batch["grupos"].sum(axis=1)
+    return [{
+        "inconsistencias": inconsistencias[i],
+        "esValido": bool(es_valido[i]),
+        "estado": "VALIDADO" if es_valido[i] else "CON_INCONSISTENCIAS",
+        "totalHombres": _n(sexo[i, HOMBRES]), "totalMujeres": _n(sexo[i, MUJERES]),
+        "totalAlumnos": _n(total[i]), "totalGrupos": _n(grupos[i]), "totalDocentes": _n(batch["docentes"][i]),
+    } for i in range(len(batch["registros"]))]
+
+
+# ── Output ──────────────────────────────────────────────────────────────────
+
+def apply_results(conn, batch, results):
+    # One COPY into a temp table, one UPDATE joined on it; -> rows changed
+    rows = ((reg["registro"], res["estado"], json.dumps(res["inconsistencias"], ensure_ascii=False),
+             int(res["totalHombres"]), int(res["totalMujeres"]), int(res["totalAlumnos"]), int(res["totalGrupos"]))
+            for reg, res in zip(batch["registros"], results))
+    with conn.cursor() as cur:
+        cur.execute(STAGE_DDL)
+        sisat_db.copy_rows(cur, STAGE_TABLE, STAGE_COLUMNS, rows)
+        cur.execute(APPLY_QUERY)
+        return cur.rowcount
+
+
+def write_report(path, batch, results):
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        for reg, res in zip(batch["registros"], results):
+            for inc in res["inconsistencias"]:
+                writer.writerow({"registro": reg["registro"] or "", "archivo": reg["archivo"] or "",
+                                 "cct": reg["cct"], "semestreGrado": inc.get("semestreGrado", ""),
+                                 "tipo": inc["tipo"], "severidad": inc["severidad"], "campo": inc["campo"],
+                                 "descripcion": inc["descripcion"]})
+
+
+def write_json(path, batch, results):
+    payload = [dict({k: reg[k] for k in ("registro", "archivo", "cct", "sha256")}, **res)
+               for reg, res in zip(batch["registros"], results)]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Revalida en lote la aritmética del Formato 911 de toda la zona")
+    parser.add_argument("paths", nargs="*", help="911 workbooks or folders; without them, the database is reprocessed")
+    parser.add_argument("--ciclo", help="CicloEscolar.nombre (default: the active cycle)")
+    parser.add_argument("--tenant", default=sisat_db.TENANT_ID, help="tenantId (default: $TENANT_ID or zona004)")
+    parser.add_argument("--todas-las-zonas", action="store_true", help="Every tenant in the database (the whole state)")
+    parser.add_argument("--corte", choices=["INICIO_DE_CURSOS", "FIN_DE_CURSOS"], help="Only this tipoCorte")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and report without writing to the database")
+    parser.add_argument("--out", help="CSV with one row per inconsistency")
+    parser.add_argument("--json", help="Full per-school results as JSON")
+    parser.add_argument("--workers", type=int, help="Worker processes for reading workbooks (default: CPU count)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.paths:
+        batch = load_folder_batch(args.paths, args.workers)
+        if not batch["registros"]:
+            parser.error("no .xlsx/.xlsm workbooks found")
+        origen = f"{len(batch['registros'])} libros"
+    else:
+        ciclo_id, ciclo_nombre = sisat_db.resolve_ciclo(args.ciclo)
+        tenant = None if args.todas_las_zonas else args.tenant
+        with sisat_db.pooled_connection() as conn:
+            batch = load_db_batch(conn, ciclo_id, tenant, args.corte)
+        origen = f"{len(batch['registros'])} registros del ciclo {ciclo_nombre} ({tenant or 'todas las zonas'})"
+    loaded = time.perf_counter()
+
+    results = validate(batch)
+    validated = time.perf_counter()
+    validos = sum(r["esValido"] for r in results)
+    n_inc = sum(len(r["inconsistencias"]) for r in results)
+    print(f"{origen}: {validos} válidos, {len(results) - validos} con inconsistencias, {n_inc} inconsistencias"
+          f" (carga {loaded - start:.2f}s, reglas {validated - loaded:.3f}s)")
+
+    if not args.paths and not args.dry_run and results:
+        with sisat_db.pooled_connection() as conn:
+            changed = apply_results(conn, batch, results)
+        print(f"{changed} registros actualizados ({time.perf_counter() - validated:.2f}s)")
+    if args.out:
+        write_report(args.out, batch, results)
+        print(f"Inconsistencias -> {args.out}")
+    if args.json:
+        write_json(args.json, batch, results)
+        print(f"Resultados -> {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""Synthetic database for profiling the Python reporting tools offline.
+
+Builds the tables the reports read: Escuela, CicloEscolar, Programa,
+PeriodoEntrega, Entrega, Correccion, PreRevision, PreRevisionConfig and
+PlantillaCorteConfig/PlantillaPersonalRegistro. Their columns and enums follow
+prisma/schema.prisma, and the rows are generated at a configurable scale. The
+reports use jsonb, FILTER and LATERAL, so the target is a local Postgres (not
+SQLite). It is never the database in .env: the URL must be passed explicitly.
+
+    createdb sisat_fixture
+    python fixture_db.py --url postgresql://localhost/sisat_fixture --escala 10
+    python bench_reportes.py --url postgresql://localhost/sisat_fixture
+
+Scale 1 is roughly the current zone (30 schools, 2 cycles, 12 programs);
+--escala multiplies the number of schools.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+
+import sisat_db
+
+ESTADOS_ENTREGA = ["PENDIENTE", "EN_REVISION", "REQUIERE_CORRECCION", "APROBADO", "NO_APROBADO", "NO_ENTREGADO",
+                   "EXENTO", "ENTREGADO_FISICO"]
+ESTADOS_PLANTILLA = ["PENDIENTE", "RECIBIDO", "VALIDADO", "CON_ERRORES", "CORREGIR", "LISTO_PARA_CORDE",
+                     "ENTREGADO_A_CORDE", "CARGADO", "EN_VALIDACION", "CONSOLIDADO"]
+# Weights per EstadoEntrega, roughly what a cycle looks like mid-year
+PESOS_ENTREGA = [8, 10, 8, 50, 2, 14, 3, 5]
+PROGRAMAS = [
+    ("PMC", "ANUAL"), ("PAEC", "ANUAL"), ("Diagnóstico Colectivo", "ANUAL"), ("Acta CTE", "MENSUAL"),
+    ("Estadística 911 Inicio", "ANUAL"), ("Estadística 911 Fin", "ANUAL"), ("Plantilla de Personal", "SEMESTRAL"),
+    ("Reporte de Tutorías", "SEMESTRAL"), ("Día Naranja", "MENSUAL"), ("Programa Interno de Protección Civil", "ANUAL"),
+    ("Inventario", "ANUAL"), ("Informe de Fin de Ciclo", "ANUAL"),
+]
+EXPLICACIONES_OK = [
+    "El documento cumple con la estructura solicitada y cuenta con las firmas requeridas.",
+    "Se verificaron los apartados obligatorios; el documento está completo.",
+    "Cumple con los lineamientos del programa; se sugieren ajustes menores de redacción.",
+]
+EXPLICACIONES_ERROR = [
+    "Error al procesar el PDF: el archivo no contiene texto extraíble.",
+    "Todos los modelos fallaron al evaluar el documento.",
+    "Error de cuota del proveedor de IA (429).",
+]
+
+DDL = """
+DO $$ BEGIN
+    CREATE TYPE "EstadoEntrega" AS ENUM ({estados_entrega});
+EXCEPTION WHEN duplicate_object THEN NULL; END $$;
+DO $$ BEGIN
+    CREATE TYPE "EstadoPlantilla" AS ENUM ({estados_plantilla});
+EXCEPTION WHEN duplicate_object THEN NULL; END $$;
+DO $$ BEGIN
+    CREATE TYPE "TipoPeriodo" AS ENUM ('ANUAL', 'SEMESTRAL', 'MENSUAL');
+EXCEPTION WHEN duplicate_object THEN NULL; END $$;
+
+CREATE TABLE IF NOT EXISTS "CicloEscolar" (
+    id text PRIMARY KEY, nombre text UNIQUE NOT NULL, inicio timestamp(3) NOT NULL, fin timestamp(3) NOT NULL,
+    activo boolean NOT NULL DEFAULT true, "anuncioGlobal" text,
+    "evaluarSoloActivosRanking" boolean NOT NULL DEFAULT false
+);
+CREATE TABLE IF NOT EXISTS "Programa" (
+    id text PRIMARY KEY, nombre text UNIQUE NOT NULL, descripcion text,
+    tipo "TipoPeriodo" NOT NULL DEFAULT 'ANUAL', "numArchivos" integer NOT NULL DEFAULT 1,
+    orden integer NOT NULL DEFAULT 0, activo boolean NOT NULL DEFAULT true,
+    "quienesPuedenSubir" text[] NOT NULL DEFAULT ARRAY['director'],
+    "createdAt" timestamp(3) NOT NULL DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS "PeriodoEntrega" (
+    id text PRIMARY KEY, "cicloEscolarId" text NOT NULL REFERENCES "CicloEscolar"(id),
+    "programaId" text NOT NULL REFERENCES "Programa"(id), mes integer, semestre integer,
+    activo boolean NOT NULL DEFAULT true, "fechaLimite" timestamp(3),
+    "createdAt" timestamp(3) NOT NULL DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS "Escuela" (
+    id text PRIMARY KEY, cct text UNIQUE NOT NULL, nombre text NOT NULL, localidad text NOT NULL,
+    municipio text, "zonaEscolar" text, email text UNIQUE NOT NULL, password text NOT NULL, director text,
+    "esDePrueba" boolean NOT NULL DEFAULT false, "esSupervision" boolean NOT NULL DEFAULT false,
+    "createdAt" timestamp(3) NOT NULL DEFAULT now(), "updatedAt" timestamp(3) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS "Entrega" (
+    id text PRIMARY KEY, "escuelaId" text NOT NULL REFERENCES "Escuela"(id) ON DELETE CASCADE,
+    "periodoEntregaId" text NOT NULL REFERENCES "PeriodoEntrega"(id),
+    estado "EstadoEntrega" NOT NULL DEFAULT 'NO_ENTREGADO', "observacionesATP" text,
+    "fechaSubida" timestamp(3), "fechaRevision" timestamp(3),
+    "createdAt" timestamp(3) NOT NULL DEFAULT now(), "updatedAt" timestamp(3) NOT NULL,
+    UNIQUE ("escuelaId", "periodoEntregaId")
+);
+CREATE TABLE IF NOT EXISTS "Correccion" (
+    id text PRIMARY KEY, "entregaId" text NOT NULL REFERENCES "Entrega"(id) ON DELETE CASCADE,
+    texto text, "archivoId" text UNIQUE, "adminId" text NOT NULL,
+    "createdAt" timestamp(3) NOT NULL DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS "PreRevision" (
+    id text PRIMARY KEY, "entregaId" text UNIQUE NOT NULL REFERENCES "Entrega"(id) ON DELETE CASCADE,
+    resultado jsonb NOT NULL, "intentosUsados" integer NOT NULL DEFAULT 0,
+    "createdAt" timestamp(3) NOT NULL DEFAULT now(), "updatedAt" timestamp(3) NOT NULL
+);
+CREATE INDEX IF NOT EXISTS "PreRevision_updatedAt_id_idx" ON "PreRevision" ("updatedAt", id);
+CREATE TABLE IF NOT EXISTS "PreRevisionConfig" (
+    id text PRIMARY KEY DEFAULT 'singleton', "limiteIntentos" integer NOT NULL DEFAULT 3
+);
+CREATE TABLE IF NOT EXISTS "PlantillaCorteConfig" (
+    id text PRIMARY KEY, "tenantId" text UNIQUE NOT NULL, "fechaCorteOficial" timestamp(3),
+    activo boolean NOT NULL DEFAULT true, "updatedAt" timestamp(3) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS "PlantillaPersonalRegistro" (
+    id text PRIMARY KEY, "tenantId" text NOT NULL, "escuelaId" text, "escuelaNombre" text, "escuelaCCT" text,
+    "nombreArchivo" text NOT NULL, "sha256Hash" text NOT NULL, "fechaEntregaPdf" timestamp(3),
+    "fechaSubidaExcel" timestamp(3), estado "EstadoPlantilla" NOT NULL DEFAULT 'PENDIENTE',
+    "createdAt" timestamp(3) NOT NULL DEFAULT now(), "updatedAt" timestamp(3) NOT NULL
+);
+CREATE INDEX IF NOT EXISTS "PlantillaPersonalRegistro_tenantId_escuelaId_idx"
+    ON "PlantillaPersonalRegistro" ("tenantId", "escuelaId");
+"""
+TABLES = ["PlantillaPersonalRegistro", "PlantillaCorteConfig", "PreRevisionConfig", "PreRevision", "Correccion",
+          "Entrega", "Escuela", "PeriodoEntrega", "Programa", "CicloEscolar"]
+
+
+def _enum(values):
+    return ", ".join(f"'{v}'" for v in values)
+
+
+class Ids:
+    # cuid-shaped ids from the seeded generator, so a given seed always
+    # produces the same database
+    def __init__(self, rng):
+        self.rng = rng
+
+    def __call__(self):
+        return f"c{self.rng.getrandbits(96):024x}"
+
+
+def periodos_de(tipo):
+    # -> [(mes, semestre)] per cycle, as the admin panel creates them
+    if tipo == "MENSUAL":
+        return [(m, None) for m in (9, 10, 11, 12, 1, 2, 3, 4, 5, 6)]
+    if tipo == "SEMESTRAL":
+        return [(None, 1), (None, 2)]
+    return [(None, None)]
+
+
+def resultado_json(rng, error):
+    explicacion = rng.choice(EXPLICACIONES_ERROR if error else EXPLICACIONES_OK)
+    return json.dumps({
+        "cumpleFirmas": not error and rng.random() < 0.9,
+        "cumpleEstructura": not error and rng.random() < 0.85,
+        "explicacion": explicacion,
+        "observaciones": [f"Apartado {i}: revisar redacción" for i in range(rng.randint(0, 4))],
+        "borradorCorreo": "Estimado(a) director(a):\n\n" + explicacion + "\n\nAtentamente,\nSupervisión Escolar",
+        "modelo": "gemini-3.5-flash-lite",
+    }, ensure_ascii=False)
+
+
+def generate(conn, escala=1, ciclos=2, seed=2026, tenant="zona004"):
+    # -> {table: rows inserted}
+    rng = random.Random(seed)
+    new_id = Ids(rng)
+    now = datetime(2026, 6, 30, 12, 0)
+    counts = {}
+
+    def load(cur, table, columns, rows):
+        counts[table] = counts.get(table, 0) + sisat_db.copy_rows(cur, f'"{table}"', columns, rows)
+
+    with conn:
+        with conn.cursor() as cur:
+            ciclo_rows = []
+            for i in range(ciclos):
+                year = 2026 - ciclos + i
+                ciclo_rows.append((new_id(), f"{year}-{year + 1}", datetime(year, 8, 1), datetime(year + 1, 7, 31),
+                                   i == ciclos - 1))
+            load(cur, "CicloEscolar", ["id", "nombre", "inicio", "fin", "activo"], ciclo_rows)
+
+            programa_rows = [(new_id(), nombre, tipo, orden) for orden, (nombre, tipo) in enumerate(PROGRAMAS)]
+            load(cur, "Programa", ["id", "nombre", "tipo", "orden"], programa_rows)
+
+            periodos = []
+            for ciclo_id, _, inicio, _, activo in ciclo_rows:
+                for programa_id, _, tipo, _ in programa_rows:
+                    for mes, semestre in periodos_de(tipo):
+                        limite = inicio + timedelta(days=rng.randint(30, 330))
+                        periodos.append((new_id(), ciclo_id, programa_id, mes, semestre, True,
+                                         limite if rng.random() < 0.85 else None))
+            load(cur, "PeriodoEntrega", ["id", "cicloEscolarId", "programaId", "mes", "semestre", "activo",
+                                         "fechaLimite"], periodos)
+
+            n_escuelas = 30 * escala
+            escuelas = [(new_id(), f"21EBH{i:04d}{chr(65 + i % 26)}", f"Bachillerato General {i + 1}",
+                         f"Localidad {i % 97}", f"{i:04d}@fixture.local", "x", f"Director(a) {i + 1}",
+                         f"{(i // 30) + 4:03d}", now) for i in range(n_escuelas)]
+            load(cur, "Escuela", ["id", "cct", "nombre", "localidad", "email", "password", "director", "zonaEscolar",
+                                  "updatedAt"], escuelas)
+
+            # Entregas, their corrections and PreRevisions are streamed straight
+            # into COPY, so even scale 100 never holds the full table in memory
+            entregas, correcciones, prerevisiones = [], [], []
+
+            def flush():
+                load(cur, "Entrega", ["id", "escuelaId", "periodoEntregaId", "estado", "fechaSubida", "updatedAt"],
+                     entregas)
+                load(cur, "Correccion", ["id", "entregaId", "texto", "adminId", "createdAt"], correcciones)
+                load(cur, "PreRevision", ["id", "entregaId", "resultado", "intentosUsados", "createdAt", "updatedAt"],
+                     prerevisiones)
+                entregas.clear()
+                correcciones.clear()
+                prerevisiones.clear()
+
+            for escuela_id, *_ in escuelas:
+                for periodo_id, _, _, _, _, _, limite in periodos:
+                    estado = rng.choices(ESTADOS_ENTREGA, PESOS_ENTREGA)[0]
+                    entrega_id = new_id()
+                    subida = None
+                    if estado not in ("PENDIENTE", "NO_ENTREGADO", "EXENTO"):
+                        base = limite or now
+                        subida = base + timedelta(days=rng.randint(-40, 10), minutes=rng.randint(0, 1439))
+                    updated = subida or now - timedelta(days=rng.randint(0, 300))
+                    entregas.append((entrega_id, escuela_id, periodo_id, estado, subida, updated))
+                    if estado == "REQUIERE_CORRECCION":
+                        correcciones.append((new_id(), entrega_id, "Falta la firma del director en la portada.",
+                                             "admin", updated + timedelta(days=1)))
+                    if subida and rng.random() < 0.7:
+                        error = rng.random() < 0.12
+                        prerevisiones.append((new_id(), entrega_id, resultado_json(rng, error),
+                                              rng.choices([1, 2, 3, 4], [60, 25, 12, 3])[0],
+                                              subida, subida + timedelta(minutes=rng.randint(1, 600))))
+                if len(entregas) >= 20000:
+                    flush()
+            flush()
+
+            load(cur, "PreRevisionConfig", ["id", "limiteIntentos"], [("singleton", 3)])
+            load(cur, "PlantillaCorteConfig", ["id", "tenantId", "fechaCorteOficial", "activo", "updatedAt"],
+                 [(new_id(), tenant, datetime(2026, 3, 15), True, now)])
+            registros = [(new_id(), tenant, e[0], e[2], e[1], f"plantilla_{e[1]}.xlsx", f"{rng.getrandbits(256):064x}",
+                          now - timedelta(days=rng.randint(0, 200)), rng.choice(ESTADOS_PLANTILLA), now)
+                         for e in escuelas if rng.random() < 0.8]
+            load(cur, "PlantillaPersonalRegistro", ["id", "tenantId", "escuelaId", "escuelaNombre", "escuelaCCT",
+                                                    "nombreArchivo", "sha256Hash", "fechaEntregaPdf", "estado",
+                                                    "updatedAt"], registros)
+            cur.execute("ANALYZE")
+    return counts
+
+
+def create_schema(conn, reset=False):
+    with conn:
+        with conn.cursor() as cur:
+            if reset:
+                cur.execute("DROP TABLE IF EXISTS " + ", ".join(f'"{t}"' for t in TABLES) + " CASCADE")
+            cur.execute(DDL.format(estados_entrega=_enum(ESTADOS_ENTREGA), estados_plantilla=_enum(ESTADOS_PLANTILLA)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera una base de datos sintética para perfilar los reportes")
+    parser.add_argument("--url", required=True, help="Fixture Postgres URL (never the production DATABASE_URL)")
+    parser.add_argument("--escala", type=int, default=1, help="Multiplier over the current size (30 schools)")
+    parser.add_argument("--ciclos", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=2026)
+    parser.add_argument("--reset", action="store_true", help="Drop the fixture tables first")
+    args = parser.parse_args()
+
+    if args.url == sisat_db.get_database_url():
+        parser.error("--url is the DATABASE_URL from the environment/.env; use a separate fixture database")
+
+    conn = psycopg2.connect(args.url)
+    try:
+        start = time.perf_counter()
+        create_schema(conn, args.reset)
+        counts = generate(conn, args.escala, args.ciclos, args.seed)
+    finally:
+        conn.close()
+    for table, n in counts.items():
+        print(f"{table}: {n}")
+    print(f"Fixture escala {args.escala} lista en {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
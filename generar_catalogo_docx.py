@@ -1,344 +1,205 @@
+import argparse
+import hashlib
+import inspect
+import io
 import json
 import os
-import docx
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
+from xml.sax.saxutils import escape as xml_escape
+
 from docx import Document
-from docx.shared import Inches, Pt, RGBColor
+from docx.shared import Emu, Inches, Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.table import WD_TABLE_ALIGNMENT
-from docx.oxml import OxmlElement, parse_xml
-from docx.oxml.ns import nsdecls, qn
-
-def set_cell_background(cell, fill_hex):
-    tcPr = cell._element.get_or_add_tcPr()
-    shd = parse_xml(f'<w:shd {nsdecls("w")} w:fill="{fill_hex}"/>')
-    tcPr.append(shd)
-
-def set_cell_margins(cell, top=100, bottom=100, left=150, right=150):
-    tcPr = cell._element.get_or_add_tcPr()
-    tcMar = parse_xml(f'''
-        <w:tcMar {nsdecls("w")}>
-            <w:top w:w="{top}" w:type="dxa"/>
-            <w:bottom w:w="{bottom}" w:type="dxa"/>
-            <w:left w:w="{left}" w:type="dxa"/>
-            <w:right w:w="{right}" w:type="dxa"/>
-        </w:tcMar>
-    ''')
-    tcPr.append(tcMar)
-
-def set_table_borders(table, color_hex="CBD5E1"):
-    tblPr = table._element.xpath('w:tblPr')
-    if tblPr:
-        borders = parse_xml(f'''
-            <w:tblBorders {nsdecls("w")}>
-                <w:top w:val="single" w:sz="4" w:space="0" w:color="{color_hex}"/>
-                <w:bottom w:val="single" w:sz="4" w:space="0" w:color="{color_hex}"/>
-                <w:left w:val="none"/>
-                <w:right w:val="none"/>
-                <w:insideH w:val="single" w:sz="4" w:space="0" w:color="{color_hex}"/>
-                <w:insideV w:val="none"/>
-            </w:tblBorders>
-        ''')
-        tblPr[0].append(borders)
-
-def build_docx():
-    doc = Document()
-
-    # Set page margins (1 inch / 72pt)
-    sections = doc.sections
-    for s in sections:
-        s.top_margin = Inches(0.8)
-        s.bottom_margin = Inches(0.8)
-        s.left_margin = Inches(0.8)
-        s.right_margin = Inches(0.8)
-
-    # Styling helpers
-    PRIMARY_COLOR = RGBColor(30, 58, 138)   # #1e3a8a Navy Blue
-    SECONDARY_COLOR = RGBColor(37, 99, 235) # #2563eb Blue
-    DARK_TEXT = RGBColor(15, 23, 42)       # #0f172a
-    MUTED_TEXT = RGBColor(100, 116, 139)   # #64748b
-
-    # Base Normal Style
-    style_normal = doc.styles['Normal']
-    style_normal.font.name = 'Calibri'
-    style_normal.font.size = Pt(11)
-    style_normal.font.color.rgb = DARK_TEXT
-
-    # Header / Title Block
-    p_title = doc.add_paragraph()
-    p_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    p_title.paragraph_format.space_before = Pt(0)
-    p_title.paragraph_format.space_after = Pt(4)
-    run_title = p_title.add_run("CATÁLOGO OFICIAL DE ASIGNATURAS Y UACs")
-    run_title.bold = True
-    run_title.font.size = Pt(22)
-    run_title.font.color.rgb = PRIMARY_COLOR
-
-    p_sub = doc.add_paragraph()
-    p_sub.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    p_sub.paragraph_format.space_before = Pt(0)
-    p_sub.paragraph_format.space_after = Pt(18)
-    run_sub = p_sub.add_run("BACHILLERATOS GENERALES — MARCO CURRICULAR COMÚN (MCCEMS 2025-2026 / 2026-2027)\nSupervisión Escolar de Educación Media Superior")
-    run_sub.font.size = Pt(12)
-    run_sub.font.color.rgb = SECONDARY_COLOR
-
-    # Intro box / note
-    p_intro = doc.add_paragraph()
-    p_intro.paragraph_format.space_after = Pt(14)
-    r_intro = p_intro.add_run("📌 Documento Normativo Institucional: Este catálogo concentra de manera organizada y detallada todas las Unidades de Aprendizaje Curricular (UACs) del mapa curricular de Bachillerato General en el estado de Puebla. Está estructurado por componentes y semestres para alimentar al Asistente Virtual IA y servir de referencia oficial para directores, docentes y supervisores.")
-    r_intro.font.size = Pt(9.5)
-    r_intro.font.italic = True
-    r_intro.font.color.rgb = MUTED_TEXT
-
-    # -------------------------------------------------------------
-    # RESUMEN EJECUTIVO
-    # -------------------------------------------------------------
-    h1 = doc.add_heading(level=1)
-    r_h1 = h1.add_run("📊 Resumen General del Plan Curricular")
-    r_h1.font.color.rgb = PRIMARY_COLOR
-
-    t_resumen = doc.add_table(rows=6, cols=3)
-    t_resumen.alignment = WD_TABLE_ALIGNMENT.CENTER
-    set_table_borders(t_resumen)
-
-    headers = ["Sección / Componente Curricular", "Semestres", "Total Asignaturas (UACs)"]
-    hdr_cells = t_resumen.rows[0].cells
-    for i, h_text in enumerate(headers):
-        hdr_cells[i].text = h_text
-        set_cell_background(hdr_cells[i], "1E3A8A")
-        set_cell_margins(hdr_cells[i], top=120, bottom=120)
-        p = hdr_cells[i].paragraphs[0]
-        p.runs[0].font.bold = True
-        p.runs[0].font.color.rgb = RGBColor(255, 255, 255)
-        p.runs[0].font.size = Pt(10)
-
-    summary_data = [
-        ("Sección 1: Currículum Fundamental", "1º a 6º Semestre", "30 UACs"),
-        ("Sección 2: Currículum Ampliado (Socioemocionales)", "1º a 6º Semestre", "6 UACs (1 por semestre)"),
-        ("Sección 3: Formación Fundamental Extendida Obligatoria (FFEO)", "1º a 6º Semestre", "8 UACs"),
-        ("Sección 4: Formación Fundamental Extendida (FFE / Optativas)", "5º y 6º Semestre", "40 UACs (20 por sem)"),
-        ("Sección 5: Currículum Laboral (15 Capacitaciones)", "3º a 6º Semestre", "120 UACs (8 por capacitación)")
-    ]
-
-    for idx, row_data in enumerate(summary_data):
-        row_cells = t_resumen.rows[idx + 1].cells
-        bg_hex = "F8FAFC" if idx % 2 == 1 else "FFFFFF"
-        for col_idx, text in enumerate(row_data):
-            row_cells[col_idx].text = text
-            set_cell_background(row_cells[col_idx], bg_hex)
-            set_cell_margins(row_cells[col_idx], top=80, bottom=80)
-            p = row_cells[col_idx].paragraphs[0]
-            p.runs[0].font.size = Pt(9.5)
-            if col_idx == 0:
-                p.runs[0].font.bold = True
-
-    doc.add_paragraph().paragraph_format.space_after = Pt(12)
-
-    # -------------------------------------------------------------
-    # SECCIÓN 1: CURRÍCULUM FUNDAMENTAL
-    # -------------------------------------------------------------
-    h_sec1 = doc.add_heading(level=1)
-    r_sec1 = h_sec1.add_run("SECCIÓN 1: CURRÍCULUM FUNDAMENTAL (1º a 6º Semestre)")
-    r_sec1.font.color.rgb = PRIMARY_COLOR
-
-    p_desc1 = doc.add_paragraph()
-    p_desc1.paragraph_format.space_after = Pt(8)
-    p_desc1.add_run("El Currículum Fundamental constituye el núcleo formativo esencial del MCCEMS. Consta de 30 UACs distribuidas desde primer hasta sexto semestre en las áreas de Conocimiento y Recursos Sociocognitivos (Lengua y Comunicación, Pensamiento Matemático, Conciencia Histórica, Cultura Digital, Humanidades, Ciencias Naturales y Ciencias Sociales).")
-
-    fundamental_by_sem = {
-        1: [
-            ("Conciencia Histórica I", "48 hrs", "Recurso Sociocognitivo"),
-            ("Cultura Digital I", "48 hrs", "Recurso Sociocognitivo"),
-            ("Humanidades I", "64 hrs", "Área de Conocimiento"),
-            ("Inglés I", "48 hrs", "Recurso Sociocognitivo"),
-            ("La Materia y sus Interacciones", "64 hrs", "Ciencias Naturales"),
-            ("Lengua y Comunicación I", "64 hrs", "Recurso Sociocognitivo"),
-            ("Pensamiento Matemático I", "64 hrs", "Recurso Sociocognitivo")
-        ],
-        2: [
-            ("Conciencia Histórica II", "48 hrs", "Recurso Sociocognitivo"),
-            ("Conservación de la Energía y sus Interacciones con la Materia", "64 hrs", "Ciencias Naturales"),
-            ("Cultura Digital II", "48 hrs", "Recurso Sociocognitivo"),
-            ("Humanidades II", "64 hrs", "Área de Conocimiento"),
-            ("Inglés II", "48 hrs", "Recurso Sociocognitivo"),
-            ("Lengua y Comunicación II", "64 hrs", "Recurso Sociocognitivo"),
-            ("Pensamiento Matemático II", "64 hrs", "Recurso Sociocognitivo")
-        ],
-        3: [
-            ("Ecosistemas: Interacciones, Energía y Dinámica", "64 hrs", "Ciencias Naturales"),
-            ("Humanidades III", "64 hrs", "Área de Conocimiento"),
-            ("Inglés III", "48 hrs", "Recurso Sociocognitivo"),
-            ("Lengua y Comunicación III", "64 hrs", "Recurso Sociocognitivo"),
-            ("Pensamiento Matemático III", "64 hrs", "Recurso Sociocognitivo")
-        ],
-        4: [
-            ("Ciencias Sociales I", "64 hrs", "Área de Conocimiento"),
-            ("Conciencia Histórica III", "48 hrs", "Recurso Sociocognitivo"),
-            ("Cultura Digital III", "48 hrs", "Recurso Sociocognitivo"),
-            ("Formación Socioemocional IV", "32 hrs", "Currículum Ampliado"),
-            ("Inglés IV", "48 hrs", "Recurso Sociocognitivo"),
-            ("La Superficie Terrestre: Procesos Naturales y Sociales", "64 hrs", "Ciencias Naturales"),
-            ("Reacciones Químicas: Conservación de la Materia en la Transformación de la Energía", "64 hrs", "Ciencias Naturales")
-        ],
-        5: [
-            ("Ciencias Sociales II", "64 hrs", "Área de Conocimiento"),
-            ("Organismo Vivo: Estructura, Función y Herencia", "64 hrs", "Ciencias Naturales")
-        ],
-        6: [
-            ("Ciencias Sociales III", "64 hrs", "Área de Conocimiento"),
-            ("La Biodiversidad y su Conservación", "64 hrs", "Ciencias Naturales")
-        ]
-    }
-
-    for sem in range(1, 7):
-        h_sem = doc.add_heading(level=2)
-        r_sem = h_sem.add_run(f"📅 {sem}º Semestre — Currículum Fundamental")
-        r_sem.font.color.rgb = SECONDARY_COLOR
-
-        uacs = fundamental_by_sem.get(sem, [])
-        t_f = doc.add_table(rows=len(uacs) + 1, cols=4)
-        t_f.alignment = WD_TABLE_ALIGNMENT.CENTER
-        set_table_borders(t_f)
-
-        f_hdrs = ["#", "Nombre de la Asignatura / UAC", "Horas Totales", "Área / Campo"]
-        for i, htext in enumerate(f_hdrs):
-            cell = t_f.rows[0].cells[i]
-            cell.text = htext
-            set_cell_background(cell, "2563EB")
-            set_cell_margins(cell, top=100, bottom=100)
-            p = cell.paragraphs[0]
-            p.runs[0].font.bold = True
-            p.runs[0].font.color.rgb = RGBColor(255, 255, 255)
-            p.runs[0].font.size = Pt(9.5)
-
-        for u_idx, (u_name, u_hrs, u_area) in enumerate(uacs):
-            row_cells = t_f.rows[u_idx + 1].cells
-            bg_hex = "F8FAFC" if u_idx % 2 == 1 else "FFFFFF"
-            data = [str(u_idx + 1), u_name, u_hrs, u_area]
-            for c_i, val in enumerate(data):
-                row_cells[c_i].text = val
-                set_cell_background(row_cells[c_i], bg_hex)
-                set_cell_margins(row_cells[c_i], top=70, bottom=70)
-                p = row_cells[c_i].paragraphs[0]
-                p.runs[0].font.size = Pt(9)
-                if c_i == 1:
-                    p.runs[0].font.bold = True
-
-        doc.add_paragraph().paragraph_format.space_after = Pt(8)
-
-    # -------------------------------------------------------------
-    # SECCIÓN 2: CURRÍCULUM AMPLIADO - FORMACIÓN SOCIOEMOCIONAL
-    # -------------------------------------------------------------
-    h_sec2 = doc.add_heading(level=1)
-    r_sec2 = h_sec2.add_run("SECCIÓN 2: CURRÍCULUM AMPLIADO — FORMACIÓN SOCIOEMOCIONAL (1º a 6º Semestre)")
-    r_sec2.font.color.rgb = PRIMARY_COLOR
-
-    p_desc2 = doc.add_paragraph()
-    p_desc2.paragraph_format.space_after = Pt(8)
-    p_desc2.add_run("El Currículum Ampliado comprende los Recursos Socioemocionales y Ámbitos de Formación Socioemocional. Se imparten 2 horas semanales (32 horas semestrales) desde 1º hasta 6º semestre, abarcando Práctica y Colaboración Ciudadana, Educación para la Salud, Educación Integral en Sexualidad y Género, Actividades Físicas y Deportivas, y Artes.")
-
-    t_soc = doc.add_table(rows=7, cols=4)
-    t_soc.alignment = WD_TABLE_ALIGNMENT.CENTER
-    set_table_borders(t_soc)
-
-    soc_hdrs = ["Semestre", "Nombre Oficial de la UAC", "Horas Semestrales / Totales", "Ámbitos de Formación Socioemocional Incluidos"]
-    for i, htext in enumerate(soc_hdrs):
-        cell = t_soc.rows[0].cells[i]
-        cell.text = htext
-        set_cell_background(cell, "2563EB")
-        set_cell_margins(cell, top=100, bottom=100)
-        p = cell.paragraphs[0]
-        p.runs[0].font.bold = True
-        p.runs[0].font.color.rgb = RGBColor(255, 255, 255)
-        p.runs[0].font.size = Pt(9.5)
-
-    soc_data = [
-        ("1º Semestre", "Formación Socioemocional I", "2 hrs / sem (32 hrs)", "Práctica y Colaboración Ciudadana, Educación para la Salud, Sexualidad y Género, Deporte y Artes"),
-        ("2º Semestre", "Formación Socioemocional II", "2 hrs / sem (32 hrs)", "Práctica y Colaboración Ciudadana, Educación para la Salud, Sexualidad y Género, Deporte y Artes"),
-        ("3º Semestre", "Formación Socioemocional III", "2 hrs / sem (32 hrs)", "Práctica y Colaboración Ciudadana, Educación para la Salud, Sexualidad y Género, Deporte y Artes"),
-        ("4º Semestre", "Formación Socioemocional IV", "2 hrs / sem (32 hrs)", "Práctica y Colaboración Ciudadana, Educación para la Salud, Sexualidad y Género, Deporte y Artes"),
-        ("5º Semestre", "Formación Socioemocional V", "2 hrs / sem (32 hrs)", "Práctica y Colaboración Ciudadana, Educación para la Salud, Sexualidad y Género, Deporte y Artes"),
-        ("6º Semestre", "Formación Socioemocional VI", "2 hrs / sem (32 hrs)", "Práctica y Colaboración Ciudadana, Educación para la Salud, Sexualidad y Género, Deporte y Artes")
-    ]
-
-    for idx, (s_name, u_name, h_val, amb_val) in enumerate(soc_data):
-        row_cells = t_soc.rows[idx + 1].cells
-        bg_hex = "F8FAFC" if idx % 2 == 1 else "FFFFFF"
-        row_vals = [s_name, u_name, h_val, amb_val]
-        for c_i, val in enumerate(row_vals):
-            row_cells[c_i].text = val
-            set_cell_background(row_cells[c_i], bg_hex)
-            set_cell_margins(row_cells[c_i], top=70, bottom=70)
-            p = row_cells[c_i].paragraphs[0]
-            p.runs[0].font.size = Pt(9)
-            if c_i == 1:
-                p.runs[0].font.bold = True
-
-    doc.add_paragraph().paragraph_format.space_after = Pt(12)
-
-    # -------------------------------------------------------------
-    # SECCIÓN 3: FORMACIÓN FUNDAMENTAL EXTENDIDA OBLIGATORIA (FFEO)
-    # -------------------------------------------------------------
-    h_sec3 = doc.add_heading(level=1)
-    r_sec3 = h_sec3.add_run("SECCIÓN 3: FORMACIÓN FUNDAMENTAL EXTENDIDA OBLIGATORIA (FFEO) (1º a 6º Semestre)")
-    r_sec3.font.color.rgb = PRIMARY_COLOR
-
-    p_desc3 = doc.add_paragraph()
-    p_desc3.paragraph_format.space_after = Pt(8)
-    p_desc3.add_run("La Formación Fundamental Extendida Obligatoria (FFEO) profundiza en la indagación científica, la lectura y redacción avanzada, y el razonamiento matemático. Consta de 8 UACs de carácter obligatorio asignadas de 1º a 6º semestre.")
-
-    t_ffeo = doc.add_table(rows=9, cols=4)
-    t_ffeo.alignment = WD_TABLE_ALIGNMENT.CENTER
-    set_table_borders(t_ffeo)
-
-    ffeo_hdrs = ["Semestre", "Nombre de la Asignatura / UAC", "Clave / Tipo", "Horas Totales"]
-    for i, htext in enumerate(ffeo_hdrs):
-        cell = t_ffeo.rows[0].cells[i]
-        cell.text = htext
-        set_cell_background(cell, "2563EB")
-        set_cell_margins(cell, top=100, bottom=100)
-        p = cell.paragraphs[0]
-        p.runs[0].font.bold = True
-        p.runs[0].font.color.rgb = RGBColor(255, 255, 255)
-        p.runs[0].font.size = Pt(9.5)
-
-    ffeo_data = [
-        ("1º Semestre", "Laboratorio de Investigación", "ffeo", "64 hrs"),
-        ("1º Semestre", "Taller de Lectura y Redacción I", "ffeo", "64 hrs"),
-        ("2º Semestre", "Taller de Ciencias I", "ffeo", "64 hrs"),
-        ("2º Semestre", "Taller de Lectura y Redacción II", "ffeo", "64 hrs"),
-        ("3º Semestre", "Taller de Ciencias II", "ffeo", "64 hrs"),
-        ("4º Semestre", "Espacio y Sociedad", "ffeo", "64 hrs"),
-        ("5º Semestre", "Taller de Pensamiento Variacional I", "ffeo", "64 hrs"),
-        ("6º Semestre", "Temas Selectos de Matemáticas II", "ffeo", "64 hrs")
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from lxml import etree
+
+LABORAL_JSON = r'C:\NotebookLM\documentos_referencia\Horarios\laboral_grouped.json'
+OUTPUT_PATHS = [
+    r"C:\NotebookLM\documentos_referencia\Horarios\Catalogo_Oficial_Asignaturas_Bachilleratos_Generales_2025-2026.docx",
+    r"C:\Users\samue\.gemini\antigravity-ide\brain\7569d40a-c01f-4ce4-836e-6314c3c5f299\Catalogo_Oficial_Asignaturas_Bachilleratos_Generales_2025-2026.docx",
+]
+
+# Styling
+PRIMARY_COLOR = RGBColor(30, 58, 138)   # #1e3a8a Navy Blue
+SECONDARY_COLOR = RGBColor(37, 99, 235) # #2563eb Blue
+DARK_TEXT = RGBColor(15, 23, 42)       # #0f172a
+MUTED_TEXT = RGBColor(100, 116, 139)   # #64748b
+
+HEADER_FILL = "2563EB"
+HEADER_FILL_DARK = "1E3A8A"
+ZEBRA_FILLS = ("FFFFFF", "F8FAFC")
+
+
+# Table XML is emitted as one string per table and parsed once; the repeated
+# tcPr/rPr fragments are built once per distinct value and reused for every cell
+
+@lru_cache(maxsize=None)
+def _tc_pr(width, fill, top, bottom, left=150, right=150):
+    return (
+        f'<w:tcPr><w:tcW w:w="{width}" w:type="dxa"/>'
+        f'<w:shd w:val="clear" w:color="auto" w:fill="{fill}"/>'
+        f'<w:tcMar><w:top w:w="{top}" w:type="dxa"/><w:bottom w:w="{bottom}" w:type="dxa"/>'
+        f'<w:left w:w="{left}" w:type="dxa"/><w:right w:w="{right}" w:type="dxa"/></w:tcMar></w:tcPr>'
+    )
+
+
+@lru_cache(maxsize=None)
+def _r_pr(bold, color, size_pt):
+    bold_xml = "<w:b/>" if bold else ""
+    color_xml = f'<w:color w:val="{color}"/>' if color else ""
+    return f'<w:rPr>{bold_xml}{color_xml}<w:sz w:val="{round(size_pt * 2)}"/></w:rPr>'
+
+
+@lru_cache(maxsize=None)
+def _tbl_pr(color_hex="CBD5E1"):
+    line = f'w:val="single" w:sz="4" w:space="0" w:color="{color_hex}"'
+    return (
+        '<w:tblPr><w:tblW w:type="auto" w:w="0"/><w:jc w:val="center"/>'
+        f'<w:tblBorders><w:top {line}/><w:left w:val="none"/><w:bottom {line}/>'
+        f'<w:right w:val="none"/><w:insideH {line}/><w:insideV w:val="none"/></w:tblBorders>'
+        '<w:tblLook w:val="04A0" w:firstRow="1" w:lastRow="0" w:firstColumn="1" '
+        'w:lastColumn="0" w:noHBand="0" w:noVBand="1"/></w:tblPr>'
+    )
+
+
+def _cell_xml(text, tc_pr, r_pr):
+    text = str(text)
+    space = ' xml:space="preserve"' if text != text.strip() else ""
+    return f'<w:tc>{tc_pr}<w:p><w:r>{r_pr}<w:t{space}>{xml_escape(text)}</w:t></w:r></w:p></w:tc>'
+
+
+def table_xml(spec, block_width):
+    """Serialize a declarative table spec to one ``<w:tbl>`` string.
+
+    spec keys: headers, rows, header_fill, header_size, header_margin (top, bottom),
+    row_size, row_margin, bold_col, zebra_start (index into ZEBRA_FILLS for the
+    first data row) and optional widths (inches, one per column). block_width is
+    the usable page width in twips, split evenly when no widths are given.
+    """
+    headers = spec["headers"]
+    n = len(headers)
+    if spec.get("widths"):
+        widths = [int(w * 1440) for w in spec["widths"]]
+    else:
+        widths = [block_width // n] * n
+
+    parts = [f'<w:tbl {nsdecls("w")}>', _tbl_pr(), "<w:tblGrid>"]
+    parts += [f'<w:gridCol w:w="{w}"/>' for w in widths]
+    parts.append("</w:tblGrid><w:tr>")
+    h_top, h_bottom = spec.get("header_margin", (100, 100))
+    h_rpr = _r_pr(True, "FFFFFF", spec.get("header_size", 9.5))
+    for w, text in zip(widths, headers):
+        parts.append(_cell_xml(text, _tc_pr(w, spec.get("header_fill", HEADER_FILL), h_top, h_bottom), h_rpr))
+    parts.append("</w:tr>")
+
+    r_top, r_bottom = spec.get("row_margin", (70, 70))
+    size = spec.get("row_size", 9)
+    bold_col = spec.get("bold_col", 1)
+    r_plain, r_bold = _r_pr(False, None, size), _r_pr(True, None, size)
+    zebra_start = spec.get("zebra_start", 0)
+    for idx, row in enumerate(spec["rows"]):
+        fill = ZEBRA_FILLS[(idx + zebra_start) % 2]
+        parts.append("<w:tr>")
+        for c_i, (w, val) in enumerate(zip(widths, row)):
+            parts.append(_cell_xml(val, _tc_pr(w, fill, r_top, r_bottom), r_bold if c_i == bold_col else r_plain))
+        parts.append("</w:tr>")
+    parts.append("</w:tbl>")
+    return "".join(parts)
+
+
+def add_table(doc, spec):
+    # One parse for the whole table, appended to the body like doc.add_table():
+    # as wide as the last section's text block, before the body's sectPr
+    section = doc.sections[-1]
+    width = section.page_width - section.left_margin - section.right_margin
+    tbl = parse_xml(table_xml(spec, Emu(width).twips))
+    body = doc.element.body
+    if body.sectPr is not None:
+        body.sectPr.addprevious(tbl)
+    else:
+        body.append(tbl)
+    return tbl
+
+
+SUMMARY_DATA = [
+    ("Sección 1: Currículum Fundamental", "1º a 6º Semestre", "30 UACs"),
+    ("Sección 2: Currículum Ampliado (Socioemocionales)", "1º a 6º Semestre", "6 UACs (1 por semestre)"),
+    ("Sección 3: Formación Fundamental Extendida Obligatoria (FFEO)", "1º a 6º Semestre", "8 UACs"),
+    ("Sección 4: Formación Fundamental Extendida (FFE / Optativas)", "5º y 6º Semestre", "40 UACs (20 por sem)"),
+    ("Sección 5: Currículum Laboral (15 Capacitaciones)", "3º a 6º Semestre", "120 UACs (8 por capacitación)")
+]
+
+FUNDAMENTAL_BY_SEM = {
+    1: [
+        ("Conciencia Histórica I", "48 hrs", "Recurso Sociocognitivo"),
+        ("Cultura Digital I", "48 hrs", "Recurso Sociocognitivo"),
+        ("Humanidades I", "64 hrs", "Área de Conocimiento"),
+        ("Inglés I", "48 hrs", "Recurso Sociocognitivo"),
+        ("La Materia y sus Interacciones", "64 hrs", "Ciencias Naturales"),
+        ("Lengua y Comunicación I", "64 hrs", "Recurso Sociocognitivo"),
+        ("Pensamiento Matemático I", "64 hrs", "Recurso Sociocognitivo")
+    ],
+    2: [
+        ("Conciencia Histórica II", "48 hrs", "Recurso Sociocognitivo"),
+        ("Conservación de la Energía y sus Interacciones con la Materia", "64 hrs", "Ciencias Naturales"),
+        ("Cultura Digital II", "48 hrs", "Recurso Sociocognitivo"),
+        ("Humanidades II", "64 hrs", "Área de Conocimiento"),
+        ("Inglés II", "48 hrs", "Recurso Sociocognitivo"),
+        ("Lengua y Comunicación II", "64 hrs", "Recurso Sociocognitivo"),
+        ("Pensamiento Matemático II", "64 hrs", "Recurso Sociocognitivo")
+    ],
+    3: [
+        ("Ecosistemas: Interacciones, Energía y Dinámica", "64 hrs", "Ciencias Naturales"),
+        ("Humanidades III", "64 hrs", "Área de Conocimiento"),
+        ("Inglés III", "48 hrs", "Recurso Sociocognitivo"),
+        ("Lengua y Comunicación III", "64 hrs", "Recurso Sociocognitivo"),
+        ("Pensamiento Matemático III", "64 hrs", "Recurso Sociocognitivo")
+    ],
+    4: [
+        ("Ciencias Sociales I", "64 hrs", "Área de Conocimiento"),
+        ("Conciencia Histórica III", "48 hrs", "Recurso Sociocognitivo"),
+        ("Cultura Digital III", "48 hrs", "Recurso Sociocognitivo"),
+        ("Formación Socioemocional IV", "32 hrs", "Currículum Ampliado"),
+        ("Inglés IV", "48 hrs", "Recurso Sociocognitivo"),
+        ("La Superficie Terrestre: Procesos Naturales y Sociales", "64 hrs", "Ciencias Naturales"),
+        ("Reacciones Químicas: Conservación de la Materia en la Transformación de la Energía", "64 hrs", "Ciencias Naturales")
+    ],
+    5: [
+        ("Ciencias Sociales II", "64 hrs", "Área de Conocimiento"),
+        ("Organismo Vivo: Estructura, Función y Herencia", "64 hrs", "Ciencias Naturales")
+    ],
+    6: [
+        ("Ciencias Sociales III", "64 hrs", "Área de Conocimiento"),
+        ("La Biodiversidad y su Conservación", "64 hrs", "Ciencias Naturales")
     ]
-
-    for idx, (s_val, u_val, clv_val, h_val) in enumerate(ffeo_data):
-        row_cells = t_ffeo.rows[idx + 1].cells
-        bg_hex = "F8FAFC" if idx % 2 == 1 else "FFFFFF"
-        row_vals = [s_val, u_val, clv_val, h_val]
-        for c_i, val in enumerate(row_vals):
-            row_cells[c_i].text = val
-            set_cell_background(row_cells[c_i], bg_hex)
-            set_cell_margins(row_cells[c_i], top=70, bottom=70)
-            p = row_cells[c_i].paragraphs[0]
-            p.runs[0].font.size = Pt(9)
-            if c_i == 1:
-                p.runs[0].font.bold = True
-
-    doc.add_paragraph().paragraph_format.space_after = Pt(12)
-
-    # -------------------------------------------------------------
-    # SECCIÓN 4: FORMACIÓN FUNDAMENTAL EXTENDIDA (FFE / OPTATIVAS)
-    # -------------------------------------------------------------
-    h_sec4 = doc.add_heading(level=1)
-    r_sec4 = h_sec4.add_run("SECCIÓN 4: FORMACIÓN FUNDAMENTAL EXTENDIDA (FFE / OPTATIVAS 5º Y 6º SEMESTRE)")
-    r_sec4.font.color.rgb = PRIMARY_COLOR
-
-    p_desc4 = doc.add_paragraph()
-    p_desc4.paragraph_format.space_after = Pt(8)
-    p_desc4.add_run("La Formación Fundamental Extendida (FFE) ofrece 40 asignaturas optativas especializadas (20 en 5º semestre y 20 en 6º semestre) organizadas en áreas de acentuación profesional (Ciencias Naturales, Pensamiento Matemático, Ciencias Sociales, Humanidades y Lenguaje) para preparar al alumno hacia el nivel superior.")
-
-    ffe_5to = [
+}
+
+SOCIOEMOCIONAL_DATA = [
+    ("1º Semestre", "Formación Socioemocional I", "2 hrs / sem (32 hrs)", "Práctica y Colaboración Ciudadana, Educación para la Salud, Sexualidad y Género, Deporte y Artes"),
+    ("2º Semestre", "Formación Socioemocional II", "2 hrs / sem (32 hrs)", "Práctica y Colaboración Ciudadana, Educación para la Salud, Sexualidad y Género, Deporte y Artes"),
+    ("3º Semestre", "Formación Socioemocional III", "2 hrs / sem (32 hrs)", "Práctica y Colaboración Ciudadana, Educación para la Salud, Sexualidad y Género, Deporte y Artes"),
+    ("4º Semestre", "Formación Socioemocional IV", "2 hrs / sem (32 hrs)", "Práctica y Colaboración Ciudadana, Educación para la Salud, Sexualidad y Género, Deporte y Artes"),
+    ("5º Semestre", "Formación Socioemocional V", "2 hrs / sem (32 hrs)", "Práctica y Colaboración Ciudadana, Educación para la Salud, Sexualidad y Género, Deporte y Artes"),
+    ("6º Semestre", "Formación Socioemocional VI", "2 hrs / sem (32 hrs)", "Práctica y Colaboración Ciudadana, Educación para la Salud, Sexualidad y Género, Deporte y Artes")
+]
+
+FFEO_DATA = [
+    ("1º Semestre", "Laboratorio de Investigación", "ffeo", "64 hrs"),
+    ("1º Semestre", "Taller de Lectura y Redacción I", "ffeo", "64 hrs"),
+    ("2º Semestre", "Taller de Ciencias I", "ffeo", "64 hrs"),
+    ("2º Semestre", "Taller de Lectura y Redacción II", "ffeo", "64 hrs"),
+    ("3º Semestre", "Taller de Ciencias II", "ffeo", "64 hrs"),
+    ("4º Semestre", "Espacio y Sociedad", "ffeo", "64 hrs"),
+    ("5º Semestre", "Taller de Pensamiento Variacional I", "ffeo", "64 hrs"),
+    ("6º Semestre", "Temas Selectos de Matemáticas II", "ffeo", "64 hrs")
+]
+
+FFE_BY_SEM = {
+    5: [
         ("Análisis de Fenómenos Biológicos", "CNET", "64 hrs"),
         ("Análisis de Fenómenos Físicos I", "CNET", "64 hrs"),
         ("Arte y Cultura I", "Artes/HUM", "64 hrs"),
@@ -359,9 +220,8 @@ def build_docx():
         ("Salud Integral I", "CNET", "64 hrs"),
         ("Taller Pensamiento Variacional I", "Pensamiento Matemático", "64 hrs"),
         ("Temas Selectos CS I", "Ciencias Sociales", "64 hrs")
-    ]
-
-    ffe_6to = [
+    ],
+    6: [
         ("Análisis de Fenómenos Físicos II", "CNET", "64 hrs"),
         ("Arte y Cultura II", "Artes/HUM", "64 hrs"),
         ("Comunicación y Sociedad II", "Lenguaje", "64 hrs"),
@@ -383,107 +243,520 @@ def build_docx():
         ("Temas Selectos CS II", "Ciencias Sociales", "64 hrs"),
         ("Temas Selectos de Biología", "CNET", "64 hrs")
     ]
+}
+
+
+# Section headings and descriptions, keyed by HorarioAsignaturaCatalogo.component where one exists
+SECTION_INTROS = {
+    "fundamental": (
+        "SECCIÓN 1: CURRÍCULUM FUNDAMENTAL (1º a 6º Semestre)",
+        "El Currículum Fundamental constituye el núcleo formativo esencial del MCCEMS. Consta de 30 UACs distribuidas desde primer hasta sexto semestre en las áreas de Conocimiento y Recursos Sociocognitivos (Lengua y Comunicación, Pensamiento Matemático, Conciencia Histórica, Cultura Digital, Humanidades, Ciencias Naturales y Ciencias Sociales).",
+    ),
+    "socioemocional": (
+        "SECCIÓN 2: CURRÍCULUM AMPLIADO — FORMACIÓN SOCIOEMOCIONAL (1º a 6º Semestre)",
+        "El Currículum Ampliado comprende los Recursos Socioemocionales y Ámbitos de Formación Socioemocional. Se imparten 2 horas semanales (32 horas semestrales) desde 1º hasta 6º semestre, abarcando Práctica y Colaboración Ciudadana, Educación para la Salud, Educación Integral en Sexualidad y Género, Actividades Físicas y Deportivas, y Artes.",
+    ),
+    "ext_obligatorio": (
+        "SECCIÓN 3: FORMACIÓN FUNDAMENTAL EXTENDIDA OBLIGATORIA (FFEO) (1º a 6º Semestre)",
+        "La Formación Fundamental Extendida Obligatoria (FFEO) profundiza en la indagación científica, la lectura y redacción avanzada, y el razonamiento matemático. Consta de 8 UACs de carácter obligatorio asignadas de 1º a 6º semestre.",
+    ),
+    "ext_optativo": (
+        "SECCIÓN 4: FORMACIÓN FUNDAMENTAL EXTENDIDA (FFE / OPTATIVAS 5º Y 6º SEMESTRE)",
+        "La Formación Fundamental Extendida (FFE) ofrece 40 asignaturas optativas especializadas (20 en 5º semestre y 20 en 6º semestre) organizadas en áreas de acentuación profesional (Ciencias Naturales, Pensamiento Matemático, Ciencias Sociales, Humanidades y Lenguaje) para preparar al alumno hacia el nivel superior.",
+    ),
+    "laboral": (
+        "SECCIÓN 5: CURRÍCULUM LABORAL — CAPACITACIONES (3º a 6º Semestre)",
+        "El Currículum Laboral abarca las 15 Capacitaciones Oficiales para el Trabajo de Bachillerato General. Cada capacitación se imparte desde 3º hasta 6º semestre (2 submódulos/UACs por semestre, 64 horas cada una). A continuación se presentan las 15 capacitaciones completas desglosadas por semestre:",
+    ),
+    "carreras": (
+        "SECCIÓN 6: CARRERAS TÉCNICAS (2º a 6º Semestre)",
+        "Módulos profesionales de las carreras técnicas registradas en SISAT. Cada carrera se cursa en cinco módulos, del 2º al 6º semestre.",
+    ),
+}
+
+COMPONENT_ORDER = ["fundamental", "ext_obligatorio", "ext_optativo", "laboral"]
+COMPONENT_LABELS = {
+    "fundamental": "Currículum Fundamental",
+    "ext_obligatorio": "Formación Fundamental Extendida Obligatoria (FFEO)",
+    "ext_optativo": "Asignaturas FFE Optativas",
+    "laboral": "Currículum Laboral",
+}
+
+
+def component_label(component):
+    # School-defined components (e.g. "personalizado") fall back to their own name
+    return COMPONENT_LABELS.get(component) or component.replace("_", " ").capitalize()
+
+
+# CarreraTecnica.modulo1..5 -> (label, semester, weekly hours)
+CARRERA_MODULOS = [("Módulo I", 2, 17), ("Módulo II", 3, 17), ("Módulo III", 4, 17), ("Módulo IV", 5, 12), ("Módulo V", 6, 12)]
+
+
+PORTADA = {
+    "title": "CATÁLOGO OFICIAL DE ASIGNATURAS Y UACs",
+    "subtitle": "BACHILLERATOS GENERALES — MARCO CURRICULAR COMÚN (MCCEMS 2025-2026 / 2026-2027)\nSupervisión Escolar de Educación Media Superior",
+    "note": "📌 Documento Normativo Institucional: Este catálogo concentra de manera organizada y detallada todas las Unidades de Aprendizaje Curricular (UACs) del mapa curricular de Bachillerato General en el estado de Puebla. Está estructurado por componentes y semestres para alimentar al Asistente Virtual IA y servir de referencia oficial para directores, docentes y supervisores.",
+}
+
+# Worksheet names for the xlsx export, keyed like SECTION_INTROS
+SECTION_SHEETS = {
+    "fundamental": "Fundamental",
+    "socioemocional": "Socioemocional",
+    "ext_obligatorio": "FFEO",
+    "ext_optativo": "FFE Optativas",
+    "laboral": "Laboral",
+    "carreras": "Carreras Técnicas",
+}
+
+
+# -------------------------------------------------------------
+# Catalog model: a flat list of plain-dict blocks in document order, built once
+# from either source and rendered by every writer (docx, xlsx, JSON)
+#   portada  title, subtitle, note
+#   intro    title, description, sheet
+#   table    title (optional heading), level, headers, rows, style (docx table
+#            spec extras), spacer (points after the table)
+# -------------------------------------------------------------
+
+def intro_block(key, component):
+    title, description = SECTION_INTROS.get(component, (component_label(component).upper(), ""))
+    return {"key": key, "type": "intro", "title": title, "description": description,
+            "sheet": SECTION_SHEETS.get(component, component_label(component))}
+
+
+def table_block(key, title, headers, rows, level=2, spacer=8, **style):
+    return {"key": key, "type": "table", "title": title, "level": level, "headers": headers,
+            "rows": [list(r) for r in rows], "style": style, "spacer": spacer}
+
+
+def resumen_block(rows):
+    return table_block("resumen", "📊 Resumen General del Plan Curricular",
+                       ["Sección / Componente Curricular", "Semestres", "Total Asignaturas (UACs)"], rows,
+                       level=1, spacer=12, header_fill=HEADER_FILL_DARK, header_size=10, header_margin=(120, 120),
+                       row_size=9.5, row_margin=(80, 80), bold_col=0)
+
+
+def catalog_model(laboral_dict):
+    # Built-in data plus laboral_grouped.json
+    model = [
+        {"key": "portada", "type": "portada", **PORTADA},
+        resumen_block(SUMMARY_DATA),
+        intro_block("fundamental", "fundamental"),
+    ]
+    for sem in range(1, 7):
+        uacs = FUNDAMENTAL_BY_SEM.get(sem, [])
+        model.append(table_block(
+            f"fundamental_{sem}", f"📅 {sem}º Semestre — Currículum Fundamental",
+            ["#", "Nombre de la Asignatura / UAC", "Horas Totales", "Área / Campo"],
+            [(str(u_idx), u_name, u_hrs, u_area) for u_idx, (u_name, u_hrs, u_area) in enumerate(uacs, 1)]))
+    model += [
+        intro_block("socioemocional_intro", "socioemocional"),
+        table_block("socioemocional", None,
+                    ["Semestre", "Nombre Oficial de la UAC", "Horas Semestrales / Totales", "Ámbitos de Formación Socioemocional Incluidos"],
+                    SOCIOEMOCIONAL_DATA, spacer=12),
+        intro_block("ffeo_intro", "ext_obligatorio"),
+        table_block("ffeo", None, ["Semestre", "Nombre de la Asignatura / UAC", "Clave / Tipo", "Horas Totales"],
+                    FFEO_DATA, spacer=12),
+        intro_block("ffe", "ext_optativo"),
+    ]
+    for sem_num in sorted(FFE_BY_SEM):
+        ffe_list = FFE_BY_SEM[sem_num]
+        model.append(table_block(
+            f"ffe_{sem_num}", f"📅 {sem_num}º Semestre — Asignaturas FFE Optativas (20 UACs)",
+            ["#", "Nombre de la Asignatura FFE", "Área de Acentuación / Campo", "Horas Totales"],
+            [(str(u_idx), u_name, u_area, u_hrs) for u_idx, (u_name, u_area, u_hrs) in enumerate(ffe_list, 1)]))
+    model.append(intro_block("laboral", "laboral"))
+    for cap_idx, (cap_name, cap_sem_data) in enumerate(laboral_dict.items(), 1):
+        lab_rows = [
+            (f"{s_str}º Semestre", f"Submódulo {sub_idx}", sub_name, "64 hrs")
+            for s_str in ["3", "4", "5", "6"]
+            for sub_idx, sub_name in enumerate(cap_sem_data.get(s_str, []), 1)
+        ]
+        # Laboral rows count from the header row, so the first data row is shaded
+        model.append(table_block(
+            f"capacitacion_{cap_idx}", f"🛠️ Capacitación {cap_idx}: {cap_name}",
+            ["Semestre", "# Submódulo", "Nombre de la UAC / Submódulo Laboral", "Horas Totales"], lab_rows,
+            spacer=10, header_fill=HEADER_FILL_DARK, bold_col=2, zebra_start=1))
+    return model
+
+
+# Official catalog (escuelaId NULL) plus the school's own UACs when one is given
+CATALOGO_QUERY = """
+    SELECT component, semester, "uacName", "totalHours", "horasSemanales"
+    FROM "HorarioAsignaturaCatalogo"
+    WHERE "escuelaId" IS NULL OR "escuelaId" = %(escuela)s
+    ORDER BY array_position(%(orden)s::text[], component) NULLS LAST, component, semester, "uacName"
+"""
+RESUMEN_QUERY = """
+    SELECT component, count(*), min(semester), max(semester)
+    FROM "HorarioAsignaturaCatalogo"
+    WHERE "escuelaId" IS NULL OR "escuelaId" = %(escuela)s
+    GROUP BY component
+    ORDER BY array_position(%(orden)s::text[], component) NULLS LAST, component
+"""
+CARRERAS_QUERY = 'SELECT nombre, clave, modulo1, modulo2, modulo3, modulo4, modulo5 FROM "CarreraTecnica" ORDER BY nombre'
+
+
+def db_catalog_model(conn, escuela_id=None, itersize=500):
+    # Same blocks as catalog_model(), read from the tables the timetable solver
+    # uses. UACs come through a server-side cursor ordered by
+    # (component, semester); each group is yielded, and so rendered, as soon as it
+    # is complete, so only one semester's rows are held at a time
+    import sisat_db
+
+    params = {"escuela": escuela_id, "orden": COMPONENT_ORDER}
+    with conn.cursor() as cur:
+        cur.execute(RESUMEN_QUERY, params)
+        resumen = cur.fetchall()
+        cur.execute('SELECT count(*) FROM "CarreraTecnica"')
+        n_carreras = cur.fetchone()[0]
+
+    summary = [
+        (component_label(c), f"{lo}º Semestre" if lo == hi else f"{lo}º a {hi}º Semestre", f"{n} UACs")
+        for c, n, lo, hi in resumen
+    ]
+    if n_carreras:
+        summary.append(("Carreras Técnicas", "2º a 6º Semestre", f"{n_carreras} carreras (5 módulos c/u)"))
+    yield {"key": "portada", "type": "portada", **PORTADA}
+    yield resumen_block(summary)
+
+    with sisat_db.server_cursor(conn, "catalogo_uacs", itersize) as cur:
+        cur.execute(CATALOGO_QUERY, params)
+        for component, comp_rows in groupby(cur, key=itemgetter(0)):
+            yield intro_block(component, component)
+            for sem, uacs in groupby(comp_rows, key=itemgetter(1)):
+                yield table_block(
+                    f"{component}_{sem}", f"📅 {sem}º Semestre — {component_label(component)}",
+                    ["#", "Nombre de la Asignatura / UAC", "Horas Totales", "Horas / Semana"],
+                    [(str(u_idx), u_name, f"{total} hrs", f"{weekly} hrs")
+                     for u_idx, (_, _, u_name, total, weekly) in enumerate(uacs, 1)])
+
+    if not n_carreras:
+        return
+    yield intro_block("carreras", "carreras")
+    with sisat_db.server_cursor(conn, "catalogo_carreras", itersize) as cur:
+        cur.execute(CARRERAS_QUERY)
+        for idx, (nombre, clave, *modulos) in enumerate(cur, 1):
+            yield table_block(
+                f"carrera_{idx}", f"🛠️ Carrera Técnica {idx}: {nombre}" + (f" ({clave})" if clave else ""),
+                ["Módulo", "Semestre", "Nombre del Módulo Profesional", "Horas / Semana"],
+                [(label, f"{sem}º Semestre", name, f"{hrs} hrs")
+                 for (label, sem, hrs), name in zip(CARRERA_MODULOS, modulos) if name],
+                spacer=10, header_fill=HEADER_FILL_DARK, bold_col=2)
+
+
+# -------------------------------------------------------------
+# docx writer
+# -------------------------------------------------------------
+
+def _heading(doc, text, level, color):
+    h = doc.add_heading(level=level)
+    h.add_run(text).font.color.rgb = color
+
+
+def _spacer(doc, points):
+    doc.add_paragraph().paragraph_format.space_after = Pt(points)
+
+
+def render_block(doc, block):
+    # Appends one model block to the document body
+    if block["type"] == "portada":
+        # Header / Title Block
+        p_title = doc.add_paragraph()
+        p_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        p_title.paragraph_format.space_before = Pt(0)
+        p_title.paragraph_format.space_after = Pt(4)
+        run_title = p_title.add_run(block["title"])
+        run_title.bold = True
+        run_title.font.size = Pt(22)
+        run_title.font.color.rgb = PRIMARY_COLOR
+
+        p_sub = doc.add_paragraph()
+        p_sub.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        p_sub.paragraph_format.space_before = Pt(0)
+        p_sub.paragraph_format.space_after = Pt(18)
+        run_sub = p_sub.add_run(block["subtitle"])
+        run_sub.font.size = Pt(12)
+        run_sub.font.color.rgb = SECONDARY_COLOR
+
+        # Intro box / note
+        p_intro = doc.add_paragraph()
+        p_intro.paragraph_format.space_after = Pt(14)
+        r_intro = p_intro.add_run(block["note"])
+        r_intro.font.size = Pt(9.5)
+        r_intro.font.italic = True
+        r_intro.font.color.rgb = MUTED_TEXT
+    elif block["type"] == "intro":
+        _heading(doc, block["title"], 1, PRIMARY_COLOR)
+        p = doc.add_paragraph()
+        p.paragraph_format.space_after = Pt(8)
+        p.add_run(block["description"])
+    else:
+        if block.get("title"):
+            level = block.get("level", 2)
+            _heading(doc, block["title"], level, PRIMARY_COLOR if level == 1 else SECONDARY_COLOR)
+        add_table(doc, {"headers": block["headers"], "rows": block["rows"], **block.get("style", {})})
+        _spacer(doc, block.get("spacer", 8))
+
+
+# -------------------------------------------------------------
+# Incremental build: section XML is cached under a hash of the section's input
+# plus the source of the code that renders it
+# -------------------------------------------------------------
+
+RENDER_HELPERS = (render_block, _heading, _spacer, add_table, table_xml, _cell_xml, _tc_pr, _r_pr, _tbl_pr)
+
+
+@lru_cache(maxsize=None)
+def _renderer_source():
+    return "".join(inspect.getsource(h) for h in RENDER_HELPERS)
+
+
+def section_hash(block):
+    payload = json.dumps(block, ensure_ascii=False)
+    return hashlib.sha256((_renderer_source() + payload).encode("utf-8")).hexdigest()
+
+
+def new_document():
+    doc = Document()
 
-    for sem_num, ffe_list in [(5, ffe_5to), (6, ffe_6to)]:
-        h_fsem = doc.add_heading(level=2)
-        r_fsem = h_fsem.add_run(f"📅 {sem_num}º Semestre — Asignaturas FFE Optativas (20 UACs)")
-        r_fsem.font.color.rgb = SECONDARY_COLOR
-
-        t_ffe = doc.add_table(rows=len(ffe_list) + 1, cols=4)
-        t_ffe.alignment = WD_TABLE_ALIGNMENT.CENTER
-        set_table_borders(t_ffe)
-
-        ffe_hdrs = ["#", "Nombre de la Asignatura FFE", "Área de Acentuación / Campo", "Horas Totales"]
-        for i, htext in enumerate(ffe_hdrs):
-            cell = t_ffe.rows[0].cells[i]
-            cell.text = htext
-            set_cell_background(cell, "2563EB")
-            set_cell_margins(cell, top=100, bottom=100)
-            p = cell.paragraphs[0]
-            p.runs[0].font.bold = True
-            p.runs[0].font.color.rgb = RGBColor(255, 255, 255)
-            p.runs[0].font.size = Pt(9.5)
-
-        for u_idx, (u_name, u_area, u_hrs) in enumerate(ffe_list):
-            row_cells = t_ffe.rows[u_idx + 1].cells
-            bg_hex = "F8FAFC" if u_idx % 2 == 1 else "FFFFFF"
-            data = [str(u_idx + 1), u_name, u_area, u_hrs]
-            for c_i, val in enumerate(data):
-                row_cells[c_i].text = val
-                set_cell_background(row_cells[c_i], bg_hex)
-                set_cell_margins(row_cells[c_i], top=70, bottom=70)
-                p = row_cells[c_i].paragraphs[0]
-                p.runs[0].font.size = Pt(9)
-                if c_i == 1:
-                    p.runs[0].font.bold = True
-
-        doc.add_paragraph().paragraph_format.space_after = Pt(8)
-
-    # -------------------------------------------------------------
-    # SECCIÓN 5: CURRÍCULUM LABORAL (15 CAPACITACIONES)
-    # -------------------------------------------------------------
-    h_sec5 = doc.add_heading(level=1)
-    r_sec5 = h_sec5.add_run("SECCIÓN 5: CURRÍCULUM LABORAL — CAPACITACIONES (3º a 6º Semestre)")
-    r_sec5.font.color.rgb = PRIMARY_COLOR
-
-    p_desc5 = doc.add_paragraph()
-    p_desc5.paragraph_format.space_after = Pt(8)
-    p_desc5.add_run("El Currículum Laboral abarca las 15 Capacitaciones Oficiales para el Trabajo de Bachillerato General. Cada capacitación se imparte desde 3º hasta 6º semestre (2 submódulos/UACs por semestre, 64 horas cada una). A continuación se presentan las 15 capacitaciones completas desglosadas por semestre:")
-
-    with open(r'C:\NotebookLM\documentos_referencia\Horarios\laboral_grouped.json', 'r', encoding='utf-8') as f:
-        laboral_dict = json.load(f)
+    # Set page margins (1 inch / 72pt)
+    for s in doc.sections:
+        s.top_margin = Inches(0.8)
+        s.bottom_margin = Inches(0.8)
+        s.left_margin = Inches(0.8)
+        s.right_margin = Inches(0.8)
+
+    # Base Normal Style
+    style_normal = doc.styles['Normal']
+    style_normal.font.name = 'Calibri'
+    style_normal.font.size = Pt(11)
+    style_normal.font.color.rgb = DARK_TEXT
+    return doc
+
+
+def render_section(doc, block):
+    # Render through python-docx and return the XML of the elements it appended
+    body = doc.element.body
+    start = len(body) - 1  # new elements go in before the trailing sectPr
+    render_block(doc, block)
+    return "".join(etree.tostring(el, encoding="unicode") for el in body[start:len(body) - 1])
+
+
+def append_section_xml(doc, xml):
+    body = doc.element.body
+    wrapper = parse_xml(f'<w:body {nsdecls("w")}>{xml}</w:body>')
+    for el in list(wrapper):
+        body.sectPr.addprevious(el)
+
+
+def load_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {"digest": None, "sections": {}}
+    cache.setdefault("sections", {})
+    return cache
+
+
+def load_laboral(path=LABORAL_JSON):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def build_docx(model, outputs=OUTPUT_PATHS, cache_path=None, full=False):
+    # model is consumed lazily, so database-backed blocks render while rows arrive
+    cache_path = cache_path or outputs[0] + ".cache.json"
+    cache = {"digest": None, "sections": {}} if full else load_cache(cache_path)
+
+    # Page setup lives outside the sections, so it is part of the overall digest only
+    digest = hashlib.sha256(inspect.getsource(new_document).encode("utf-8"))
+    doc = new_document()
+    rendered = total = 0
+    new_cache = {"digest": None, "sections": {}}
+    for block in model:
+        key = block["key"]
+        h = section_hash(block)
+        digest.update(h.encode("ascii"))
+        cached = cache["sections"].get(key)
+        if cached and cached["hash"] == h:
+            xml = cached["xml"]
+            append_section_xml(doc, xml)
+        else:
+            xml = render_section(doc, block)
+            rendered += 1
+        total += 1
+        new_cache["sections"][key] = {"hash": h, "xml": xml}
+    new_cache["digest"] = digest.hexdigest()
+
+    if new_cache["digest"] == cache["digest"] and all(os.path.exists(p) for p in outputs):
+        print("Catalog unchanged; nothing to publish")
+        return
+
+    # Serialize the package once; every destination gets the same bytes
+    buf = io.BytesIO()
+    doc.save(buf)
+    payload = buf.getvalue()
+    for path in outputs:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(payload)
+
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(new_cache, f, ensure_ascii=False)
+
+    print(f"Re-rendered {rendered}/{total} sections")
+    print(f"Successfully saved docx to {' and '.join(outputs)}")
+
+
+# -------------------------------------------------------------
+# xlsx and JSON writers
+# -------------------------------------------------------------
+
+def _sheet_name(name, used):
+    # Excel: at most 31 chars, no []:*?/\ and unique case-insensitively
+    base = "".join("_" if ch in '[]:*?/\\' else ch for ch in name).strip("' ")[:31] or "Hoja"
+    sheet, n = base, 1
+    while sheet.lower() in used:
+        n += 1
+        suffix = f" ({n})"
+        sheet = base[:31 - len(suffix)] + suffix
+    used.add(sheet.lower())
+    return sheet
+
+
+def write_xlsx(model, path):
+    # One worksheet per component (the portada gets its own), tables stacked
+    # under their headings with the docx header colours and zebra rows
+    import xlsxwriter
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    wb = xlsxwriter.Workbook(path)
+    fmt = {
+        "title": wb.add_format({"bold": True, "font_size": 16, "font_color": "#1E3A8A"}),
+        "subtitle": wb.add_format({"font_size": 11, "font_color": "#2563EB", "text_wrap": True}),
+        "note": wb.add_format({"italic": True, "font_size": 9, "font_color": "#64748B", "text_wrap": True}),
+        "h1": wb.add_format({"bold": True, "font_size": 14, "font_color": "#1E3A8A"}),
+        "h2": wb.add_format({"bold": True, "font_size": 12, "font_color": "#2563EB"}),
+        "text": wb.add_format({"text_wrap": True, "valign": "top"}),
+    }
+    cell_formats = {}
+
+    def cell_fmt(fill, bold=False, header=False):
+        k = (fill, bold, header)
+        if k not in cell_formats:
+            cell_formats[k] = wb.add_format({
+                "bg_color": f"#{fill}", "bold": bold or header, "border": 1, "border_color": "#CBD5E1",
+                "font_color": "#FFFFFF" if header else "#0F172A", "text_wrap": True, "valign": "top",
+            })
+        return cell_formats[k]
+
+    used = set()
+    ws = None
+    row = 0
+    widths = {}
+
+    def finish(ws, widths):
+        for col, width in widths.items():
+            ws.set_column(col, col, min(max(width, 8), 60) + 2)
+
+    for block in model:
+        kind = block["type"]
+        if kind in ("portada", "intro") or ws is None:
+            if ws is not None:
+                finish(ws, widths)
+            name = "Portada" if kind == "portada" else block.get("sheet") or block.get("title") or "Catálogo"
+            ws, row, widths = wb.add_worksheet(_sheet_name(name, used)), 0, {}
+        if kind == "portada":
+            # The summary table that follows lands under the cover texts
+            ws.write(0, 0, block["title"], fmt["title"])
+            ws.merge_range(1, 0, 1, 3, block["subtitle"], fmt["subtitle"])
+            ws.merge_range(3, 0, 3, 3, block["note"], fmt["note"])
+            ws.set_row(1, 32)
+            ws.set_row(3, 60)
+            row = 5
+            continue
+        if kind == "intro":
+            ws.write(row, 0, block["title"], fmt["h1"])
+            ws.merge_range(row + 1, 0, row + 1, 3, block["description"], fmt["text"])
+            ws.set_row(row + 1, 15 * (len(block["description"]) // 120 + 1))
+            row += 3
+            continue
+        if block.get("title"):
+            ws.write(row, 0, block["title"], fmt["h1" if block.get("level", 2) == 1 else "h2"])
+            row += 1
+        style = block.get("style", {})
+        bold_col = style.get("bold_col")
+        zebra_start = style.get("zebra_start", 0)
+        header_fill = style.get("header_fill", HEADER_FILL)
+        for c, text in enumerate(block["headers"]):
+            ws.write_string(row, c, text, cell_fmt(header_fill, header=True))
+            widths[c] = max(widths.get(c, 0), len(text))
+        for r_idx, values in enumerate(block["rows"]):
+            fill = ZEBRA_FILLS[(r_idx + zebra_start) % 2]
+            for c, text in enumerate(values):
+                ws.write_string(row + 1 + r_idx, c, str(text), cell_fmt(fill, bold=c == bold_col))
+                widths[c] = max(widths.get(c, 0), len(str(text)))
+        row += len(block["rows"]) + 2
+    if ws is not None:
+        finish(ws, widths)
+    wb.close()
+    print(f"Successfully saved xlsx to {path}")
+
+
+def write_json(model, path):
+    # Content only; docx styling (style, spacer, level) stays out of the export
+    catalogo = [{k: v for k, v in block.items() if k not in ("style", "spacer", "level")} for block in model]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"catalogo": catalogo}, f, ensure_ascii=False, indent=2)
+    print(f"Successfully saved JSON to {path}")
+
+
+def export_catalog(model, outputs=OUTPUT_PATHS, cache_path=None, full=False, xlsx_path=None, json_path=None,
+                   workers=None):
+    # docx only: stream the model straight into build_docx. With extra formats the
+    # model is built once and each writer renders it in its own worker process
+    if not (xlsx_path or json_path):
+        build_docx(model, outputs, cache_path, full)
+        return
+    model = list(model)
+    jobs = [(build_docx, (model, outputs, cache_path, full))]
+    if xlsx_path:
+        jobs.append((write_xlsx, (model, xlsx_path)))
+    if json_path:
+        jobs.append((write_json, (model, json_path)))
+    with ProcessPoolExecutor(max_workers=workers or len(jobs)) as pool:
+        futures = [pool.submit(fn, *fn_args) for fn, fn_args in jobs]
+        for future in futures:
+            future.result()
 
-    for cap_idx, (cap_name, cap_sem_data) in enumerate(laboral_dict.items(), 1):
-        h_cap = doc.add_heading(level=2)
-        r_cap = h_cap.add_run(f"🛠️ Capacitación {cap_idx}: {cap_name}")
-        r_cap.font.color.rgb = SECONDARY_COLOR
-
-        rows_count = 1
-        for s_str in ["3", "4", "5", "6"]:
-            rows_count += len(cap_sem_data.get(s_str, []))
-
-        t_lab = doc.add_table(rows=rows_count, cols=4)
-        t_lab.alignment = WD_TABLE_ALIGNMENT.CENTER
-        set_table_borders(t_lab)
-
-        l_hdrs = ["Semestre", "# Submódulo", "Nombre de la UAC / Submódulo Laboral", "Horas Totales"]
-        for i, htext in enumerate(l_hdrs):
-            cell = t_lab.rows[0].cells[i]
-            cell.text = htext
-            set_cell_background(cell, "1E3A8A")
-            set_cell_margins(cell, top=100, bottom=100)
-            p = cell.paragraphs[0]
-            p.runs[0].font.bold = True
-            p.runs[0].font.color.rgb = RGBColor(255, 255, 255)
-            p.runs[0].font.size = Pt(9.5)
-
-        curr_row = 1
-        for s_str in ["3", "4", "5", "6"]:
-            submod_list = cap_sem_data.get(s_str, [])
-            for sub_idx, sub_name in enumerate(submod_list, 1):
-                row_cells = t_lab.rows[curr_row].cells
-                bg_hex = "F8FAFC" if curr_row % 2 == 1 else "FFFFFF"
-                row_vals = [f"{s_str}º Semestre", f"Submódulo {sub_idx}", sub_name, "64 hrs"]
-                for c_i, val in enumerate(row_vals):
-                    row_cells[c_i].text = val
-                    set_cell_background(row_cells[c_i], bg_hex)
-                    set_cell_margins(row_cells[c_i], top=70, bottom=70)
-                    p = row_cells[c_i].paragraphs[0]
-                    p.runs[0].font.size = Pt(9)
-                    if c_i == 2:
-                        p.runs[0].font.bold = True
-                curr_row += 1
-
-        doc.add_paragraph().paragraph_format.space_after = Pt(10)
-
-    # Save outputs
-    out_path_1 = r"C:\NotebookLM\documentos_referencia\Horarios\Catalogo_Oficial_Asignaturas_Bachilleratos_Generales_2025-2026.docx"
-    out_path_2 = r"C:\Users\samue\.gemini\antigravity-ide\brain\7569d40a-c01f-4ce4-836e-6314c3c5f299\Catalogo_Oficial_Asignaturas_Bachilleratos_Generales_2025-2026.docx"
-
-    doc.save(out_path_1)
-    doc.save(out_path_2)
-
-    print(f"Successfully saved docx to {out_path_1} and {out_path_2}")
 
 if __name__ == '__main__':
-    build_docx()
+    parser = argparse.ArgumentParser(description="Genera el catálogo oficial de asignaturas (.docx, y opcionalmente .xlsx/JSON)")
+    parser.add_argument("--laboral", default=LABORAL_JSON, help="laboral_grouped.json (capacitación -> semestre -> submódulos)")
+    parser.add_argument("--out", action="append", help="Output path; repeat for extra destinations (default: the two publish paths)")
+    parser.add_argument("--cache", help="Section cache file (default: <first output>.cache.json)")
+    parser.add_argument("--full", action="store_true", help="Ignore the cache and re-render every section")
+    parser.add_argument("--db", action="store_true", help="Read HorarioAsignaturaCatalogo/CarreraTecnica instead of the built-in data and --laboral")
+    parser.add_argument("--escuela", help="With --db: CCT whose custom UACs are added to the official catalog")
+    parser.add_argument("--xlsx", help="Also export the catalog as an .xlsx workbook")
+    parser.add_argument("--json", help="Also export the catalog as JSON")
+    args = parser.parse_args()
+    outputs = args.out or OUTPUT_PATHS
+    if args.db:
+        import sisat_db
+
+        with sisat_db.pooled_connection() as conn:
+            escuela_id = None
+            if args.escuela:
+                with conn.cursor() as cur:
+                    cur.execute('SELECT id FROM "Escuela" WHERE cct = %s', (args.escuela,))
+                    row = cur.fetchone()
+                if not row:
+                    parser.error(f"Escuela no encontrada: {args.escuela}")
+                escuela_id = row[0]
+            export_catalog(db_catalog_model(conn, escuela_id), outputs, args.cache, args.full, args.xlsx, args.json)
+    else:
+        export_catalog(catalog_model(load_laboral(args.laboral)), outputs, args.cache, args.full, args.xlsx, args.json)
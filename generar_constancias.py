@@ -0,0 +1,573 @@
+"""Batch renderer for the tagged "Constancia de NO Adeudo" template.
+
+The template tagged by fix_template.py is parsed once per worker process and
+indexed once: every {TOKEN} in the body, tables, headers and footers is recorded,
+including tokens Word split across several runs. Each CSV row or
+Escuela/DirectorExpediente record is then rendered into its own docx across a
+process pool, touching only the indexed text nodes.
+
+The default "zip" engine skips the python-docx object model at render time: the
+template zip is opened once, the document/header/footer XML is precompiled into
+literal chunks around each token, and every other member (images, styles, fonts)
+is copied byte-for-byte without being decompressed. "--engine docx" keeps the
+python-docx path.
+
+"--worker" keeps the process alive and reads one JSON job per line from stdin
+({"plantilla": path | "plantillaId": id, "values": {...}, "output": path}).
+Compiled templates stay in an LRU cache keyed by the SHA-256 of the template
+bytes (the same digest stored in PlantillaDocumento.hash), so repeated requests
+for the same constancia type never parse the template again.
+
+    python generar_constancias.py --csv directores.csv
+    python generar_constancias.py --db --zona 004 --workers 8
+    python generar_constancias.py --worker --cache-entries 64 --cache-mb 256
+
+"--zip" streams every rendered docx straight into one archive (a path, or "-"
+for stdout) instead of a directory, with an optional manifest.csv member listing
+CCT, file name and SHA-256. Only a bounded window of documents is in flight, so
+memory does not grow with the number of schools.
+
+    python generar_constancias.py --db --zip constancias.zip --manifest
+    python generar_constancias.py --csv directores.csv --zip - > constancias.zip
+"""
+import argparse
+import copy
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import struct
+import sys
+import unicodedata
+import urllib.request
+import zipfile
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape as xml_escape
+
+from docx import Document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.ns import qn
+from lxml import etree
+
+TEMPLATE_PATH = "C:/NotebookLM/documentos_referencia/4 Constancia de NO Adeudo DIRECTOR 2025-2026 (004) CON ETIQUETAS.docx"
+OUTPUT_DIR = "C:/NotebookLM/documentos_referencia/Constancias_Generadas"
+
+TOKEN_RE = re.compile(r"\{([A-Z0-9_]+)\}")
+
+W_P = qn("w:p")
+W_T = qn("w:t")
+XML_SPACE = qn("xml:space")
+
+# Parts rewritten by the zip engine; every other member is copied raw
+TEMPLATED_PART_RE = re.compile(r"^word/(document|header\d*|footer\d*)\.xml$")
+# Private-use sentinels wrapped around token names while the precompiled XML is serialized
+MARKER_OPEN = "\ue000"
+MARKER_CLOSE = "\ue001"
+MARKER_RE = re.compile(MARKER_OPEN + r"([A-Z0-9_]+)" + MARKER_CLOSE)
+
+DIRECTORES_QUERY = """
+    SELECT esc.cct, esc.nombre, esc.localidad, esc.municipio, esc.director,
+           dir."nombreCompleto", dir.rfc, dir.curp, dir."fechaIngreso", dir."clavePresupuestal"
+    FROM "Escuela" esc
+    LEFT JOIN "DirectorExpediente" dir ON dir."escuelaActualId" = esc.id
+    WHERE NOT esc."esDePrueba" AND NOT esc."esSupervision"
+"""
+
+
+def iter_story_elements(doc):
+    # Body (tables and nested tables included) plus every header/footer part, once each
+    yield doc.element.body
+    seen = set()
+    for rel in doc.part.rels.values():
+        if rel.reltype in (RT.HEADER, RT.FOOTER) and rel.target_part.partname not in seen:
+            seen.add(rel.target_part.partname)
+            yield rel.target_part.element
+
+
+def paragraph_text_nodes(p):
+    # w:t nodes owned by this paragraph, not by a text box paragraph nested inside it
+    return [t for t in p.iter(W_T) if next(t.iterancestors(W_P)) is p]
+
+
+def index_paragraph(nodes, texts, full, matches):
+    # For every w:t a token touches, split its text as [literal, TOKEN, literal, ...].
+    # The node where a token starts receives the whole value; the nodes it spills
+    # into only keep their text outside the token.
+    entries = []
+    start = 0
+    for t, text in zip(nodes, texts):
+        end = start + len(text)
+        parts, literal, pos, touched = [], "", start, False
+        for m in matches:
+            if m.end() <= start or m.start() >= end:
+                continue
+            touched = True
+            literal += full[pos:max(m.start(), start)]
+            if m.start() >= start:
+                parts += [literal, m.group(1)]
+                literal = ""
+            pos = min(m.end(), end)
+        if touched:
+            parts.append(literal + full[pos:end])
+            t.set(XML_SPACE, "preserve")
+            entries.append((t, parts))
+        start = end
+    return entries
+
+
+def index_story(story):
+    placeholders = []
+    for p in story.iter(W_P):
+        nodes = paragraph_text_nodes(p)
+        texts = [t.text or "" for t in nodes]
+        full = "".join(texts)
+        if "{" not in full:
+            continue
+        matches = list(TOKEN_RE.finditer(full))
+        if matches:
+            placeholders.extend(index_paragraph(nodes, texts, full, matches))
+    return placeholders
+
+
+def compile_template(doc):
+    # Placeholder index built in a single scan of the document, so a render costs
+    # O(placeholders) instead of O(runs x keys)
+    placeholders = []
+    for story in iter_story_elements(doc):
+        placeholders.extend(index_story(story))
+    return placeholders
+
+
+def fill_parts(parts, values, escape=None):
+    # Odd positions are token names; unknown tokens stay visible as {TOKEN}
+    out = []
+    for i, part in enumerate(parts):
+        if i % 2 == 0:
+            out.append(part)
+        else:
+            value = str(values.get(part, "{" + part + "}"))
+            out.append(escape(value) if escape else value)
+    return "".join(out)
+
+
+def render(doc, placeholders, values, output_path):
+    # Every indexed node is rewritten from its template text, so the shared doc never drifts
+    for t, parts in placeholders:
+        t.text = fill_parts(parts, values)
+    doc.save(output_path)
+
+
+# ─── Zip-level engine ──────────────────────────────────────────────────────
+
+def compile_xml_part(xml_bytes):
+    # Index the part with the same w:t logic, bake the tokens into the tree as
+    # sentinels and serialize once; the result is split into [literal, TOKEN, ...]
+    # so rendering is plain string joining with no XML parsing
+    root = etree.fromstring(xml_bytes)
+    placeholders = index_story(root)
+    if not placeholders:
+        return None
+    for t, parts in placeholders:
+        t.text = "".join(part if i % 2 == 0 else MARKER_OPEN + part + MARKER_CLOSE for i, part in enumerate(parts))
+    xml = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True).decode("utf-8")
+    return MARKER_RE.split(xml)
+
+
+def read_raw_member(zf, info):
+    # Compressed bytes of a member, read straight after its local file header
+    zf.fp.seek(info.header_offset)
+    name_len, extra_len = struct.unpack("<HH", zf.fp.read(30)[26:30])
+    zf.fp.seek(info.header_offset + 30 + name_len + extra_len)
+    return zf.fp.read(info.compress_size)
+
+
+def write_raw_member(zout, info, raw):
+    # Append an already-compressed member; CRC and sizes come from the template,
+    # so the data is never inflated or deflated again
+    zinfo = copy.copy(info)
+    zinfo.flag_bits &= ~0x08  # sizes are known up front: no data descriptor
+    zinfo.extra = b""
+    zinfo.header_offset = zout.fp.tell()
+    zout.fp.write(zinfo.FileHeader())
+    zout.fp.write(raw)
+    zout.filelist.append(zinfo)
+    zout.NameToInfo[zinfo.filename] = zinfo
+    zout.start_dir = zout.fp.tell()
+
+
+class ZipTemplate:
+    # A docx compiled at the zip level. Plain data only, so it pickles cheaply
+    # into pool workers.
+
+    def __init__(self, source):
+        # source: a path or a binary file object
+        self.members = []  # (ZipInfo, raw compressed bytes | None, parts | None)
+        self.nbytes = 0
+        with zipfile.ZipFile(source) as zf:
+            for info in zf.infolist():
+                parts = compile_xml_part(zf.read(info)) if TEMPLATED_PART_RE.match(info.filename) else None
+                raw = read_raw_member(zf, info) if parts is None else None
+                self.members.append((info, raw, parts))
+                self.nbytes += len(raw) if raw is not None else sum(len(p) for p in parts)
+
+    def render(self, fileobj, values):
+        with zipfile.ZipFile(fileobj, "w") as zout:
+            for info, raw, parts in self.members:
+                if parts is None:
+                    write_raw_member(zout, info, raw)
+                    continue
+                zinfo = zipfile.ZipInfo(info.filename, info.date_time)
+                zinfo.external_attr = info.external_attr
+                zout.writestr(zinfo, fill_parts(parts, values, escape=xml_escape), compress_type=zipfile.ZIP_DEFLATED)
+
+    def render_file(self, values, output_path):
+        with open(output_path, "wb") as f:
+            self.render(f, values)
+
+
+# ─── Template cache ────────────────────────────────────────────────────────
+
+class TemplateCache:
+    # Compiled ZipTemplates keyed by SHA-256 of the template bytes. Least recently
+    # used entries are evicted once max_entries or max_bytes (compiled size) is
+    # exceeded. Files are re-hashed only when their mtime or size changes.
+
+    def __init__(self, max_entries=32, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # sha256 -> ZipTemplate
+        self._files = {}  # path -> (mtime_ns, size, sha256)
+
+    def __contains__(self, digest):
+        return digest in self._entries
+
+    def get(self, digest, load_bytes):
+        # load_bytes is only called on a miss (e.g. a Cloudinary download)
+        template = self._entries.get(digest)
+        if template is not None:
+            self.hits += 1
+            self._entries.move_to_end(digest)
+            return template
+        self.misses += 1
+        data = load_bytes()
+        actual = hashlib.sha256(data).hexdigest()
+        if actual != digest:
+            raise ValueError(f"Template hash mismatch: expected {digest}, got {actual}")
+        return self._put(digest, ZipTemplate(io.BytesIO(data)))
+
+    def get_bytes(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        return self.get(digest, lambda: data)
+
+    def get_path(self, path):
+        st = os.stat(path)
+        known = self._files.get(path)
+        if known and known[:2] == (st.st_mtime_ns, st.st_size) and known[2] in self._entries:
+            return self.get(known[2], None)
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if known and known[2] != digest and not self._referenced(known[2], path):
+            # The file changed on disk: drop the stale compilation right away
+            self.evict(known[2])
+        self._files[path] = (st.st_mtime_ns, st.st_size, digest)
+        return self.get(digest, lambda: data)
+
+    def evict(self, digest):
+        template = self._entries.pop(digest, None)
+        if template is not None:
+            self.total_bytes -= template.nbytes
+
+    def _referenced(self, digest, except_path):
+        return any(p != except_path and entry[2] == digest for p, entry in self._files.items())
+
+    def _put(self, digest, template):
+        self._entries[digest] = template
+        self.total_bytes += template.nbytes
+        while len(self._entries) > 1 and (
+            (self.max_entries and len(self._entries) > self.max_entries)
+            or (self.max_bytes and self.total_bytes > self.max_bytes)
+        ):
+            self.evict(next(iter(self._entries)))
+        return template
+
+
+def lookup_plantilla(conn, plantilla_id):
+    cur = conn.cursor()
+    cur.execute('SELECT hash, "archivoDriveUrl" FROM "PlantillaDocumento" WHERE id = %s', (plantilla_id,))
+    row = cur.fetchone()
+    cur.close()
+    if not row:
+        raise ValueError(f"PlantillaDocumento not found: {plantilla_id}")
+    return row
+
+
+def download(url):
+    with urllib.request.urlopen(url, timeout=60) as res:
+        return res.read()
+
+
+def run_worker(cache, stdin=sys.stdin, stdout=sys.stdout):
+    # One JSON job per input line, one JSON result per output line
+    conn = None
+    try:
+        for line in stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+                if job.get("plantillaId"):
+                    if conn is None:
+                        import sisat_db
+                        conn = sisat_db.connect()
+                    digest, url = lookup_plantilla(conn, job["plantillaId"])
+                    was_cached = digest in cache
+                    template = cache.get(digest, lambda: download(url))
+                else:
+                    misses = cache.misses
+                    template = cache.get_path(job["plantilla"])
+                    was_cached = cache.misses == misses
+                template.render_file(job.get("values", {}), job["output"])
+                result = {"ok": True, "output": job["output"], "cache": "hit" if was_cached else "miss"}
+            except Exception as e:
+                result = {"ok": False, "error": str(e)}
+            stdout.write(json.dumps(result, ensure_ascii=False) + "\n")
+            stdout.flush()
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def output_name(values, index):
+    cct = values.get("CCT_ESCUELA") or f"fila_{index + 1}"
+    nombre = values.get("NOMBRE_DIRECTOR") or values.get("NOMBRE_ESCUELA") or ""
+    # NFKD keeps the letter of an accented character (Peña -> Pena) instead of a "_"
+    ascii_name = unicodedata.normalize("NFKD", nombre).encode("ascii", "ignore").decode("ascii")
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "_", ascii_name).strip("_")[:40]
+    return f"{cct}_{slug}.docx" if slug else f"{cct}.docx"
+
+
+def output_names(rows):
+    # Rows sharing CCT and director would overwrite each other's file (or repeat
+    # a zip entry), so later ones get their row number. Compared case-insensitively,
+    # since Windows and macOS filesystems are
+    names, taken = [], set()
+    for i, values in enumerate(rows):
+        name = base = output_name(values, i)
+        n = 0
+        while name.lower() in taken:
+            n += 1
+            name = f"{base[:-len('.docx')]}_fila_{i + 1}{f'_{n}' if n > 1 else ''}.docx"
+        taken.add(name.lower())
+        names.append(name)
+    return names
+
+
+def load_csv_rows(csv_path):
+    # utf-8-sig: CSVs exported from Excel carry a BOM on the first header
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        return [{k.strip(): (v or "").strip() for k, v in row.items() if k} for row in csv.DictReader(f)]
+
+
+def load_db_rows(zona=None, ccts=None):
+    import sisat_db
+    from psycopg2.extras import RealDictCursor
+
+    query = DIRECTORES_QUERY
+    params = []
+    if zona:
+        query += ' AND esc."zonaEscolar" = %s'
+        params.append(zona)
+    if ccts:
+        query += " AND esc.cct = ANY(%s)"
+        params.append(list(ccts))
+    query += " ORDER BY esc.cct"
+
+    with sisat_db.pooled_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute('SELECT * FROM "AutoridadesConfig" WHERE id = %s', ("singleton",))
+            autoridades = cur.fetchone() or {}
+            cur.execute(query, params)
+            escuelas = cur.fetchall()
+
+    return [row_from_db(e, autoridades) for e in escuelas]
+
+
+def row_from_db(e, autoridades):
+    fecha = e.get("fechaIngreso")
+    values = {
+        "CCT_ESCUELA": e["cct"],
+        "NOMBRE_ESCUELA": e["nombre"],
+        "LOCALIDAD_ESCUELA": e["localidad"],
+        "MUNICIPIO_ESCUELA": e.get("municipio") or e["localidad"],
+        "NOMBRE_DIRECTOR": e.get("nombreCompleto") or e.get("director") or "",
+        "RFC_DIRECTOR": e.get("rfc") or "",
+        "CURP_DIRECTOR": e.get("curp") or "",
+        "FECHA_INGRESO_DIRECTOR": fecha.strftime("%d/%m/%Y") if fecha else "",
+        "CLAVE_PRESUPUESTAL_DIRECTOR": e.get("clavePresupuestal") or "",
+        "SUPERVISOR": autoridades.get("supervisor") or "C. SUPERVISOR(A)",
+        "SUPERVISOR_RFC": autoridades.get("supervisorRFC") or "",
+        "SUPERVISOR_CLAVE": autoridades.get("supervisorClave") or "",
+        "COORDINADOR_REGIONAL": autoridades.get("coordinadorRegional") or "",
+        "DIRECTOR_NIVEL": autoridades.get("directorNivel") or "",
+    }
+    # Same convention as /api/admin/documentos/generar-masivo: rendered data is uppercase
+    return {k: v.upper() if isinstance(v, str) else v for k, v in values.items()}
+
+
+# ─── Bulk zip output ───────────────────────────────────────────────────────
+
+class ZipSink:
+    # Writes each rendered docx straight into a single archive as it arrives.
+    # Works on non-seekable targets (stdout): zipfile falls back to data descriptors.
+
+    def __init__(self, target, manifest=False):
+        self._own = target != "-"
+        self._fp = open(target, "wb") if self._own else sys.stdout.buffer
+        self._zip = zipfile.ZipFile(self._fp, "w")
+        self._names = set()
+        self.manifest = [] if manifest else None
+        self.count = 0
+
+    def add(self, name, data, cct=""):
+        base, ext = os.path.splitext(name)
+        n = 2
+        while name in self._names:
+            name = f"{base}_{n}{ext}"
+            n += 1
+        self._names.add(name)
+        # A docx is already deflated; storing it avoids compressing twice
+        self._zip.writestr(name, data, compress_type=zipfile.ZIP_STORED)
+        if self.manifest is not None:
+            self.manifest.append((cct, name, hashlib.sha256(data).hexdigest()))
+        self.count += 1
+
+    def close(self):
+        if self.manifest is not None:
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(["CCT", "archivo", "sha256"])
+            writer.writerows(self.manifest)
+            self._zip.writestr("manifest.csv", buf.getvalue().encode("utf-8-sig"), compress_type=zipfile.ZIP_DEFLATED)
+        self._zip.close()
+        if self._own:
+            self._fp.close()
+        else:
+            self._fp.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ─── Process pool workers ──────────────────────────────────────────────────
+
+_worker_render = None
+
+
+def _init_worker(template_path, zip_template):
+    # Each worker gets a compiled template exactly once: the zip engine receives the
+    # one compiled in the parent, the docx engine parses and indexes its own copy
+    global _worker_render
+    if zip_template is not None:
+        _worker_render = lambda values, target: zip_template.render(target, values)
+        return
+    doc = Document(template_path)
+    placeholders = compile_template(doc)
+    _worker_render = lambda values, target: render(doc, placeholders, values, target)
+
+
+def _render_job(job):
+    values, output_path = job
+    with open(output_path, "wb") as f:
+        _worker_render(values, f)
+    return output_path
+
+
+def _render_job_bytes(job):
+    values, name = job
+    buf = io.BytesIO()
+    _worker_render(values, buf)
+    return name, buf.getvalue(), values.get("CCT_ESCUELA", "")
+
+
+def bounded_map(pool, fn, jobs, window):
+    # Like pool.map, but never more than `window` results are pending or buffered
+    pending = deque()
+    for job in jobs:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(pool.submit(fn, job))
+    while pending:
+        yield pending.popleft().result()
+
+
+def render_batch(template_path, rows, output_dir=None, workers=None, engine="zip", sink=None):
+    # Renders into output_dir, or into sink (a ZipSink) when one is given
+    if sink is None:
+        os.makedirs(output_dir, exist_ok=True)
+    jobs = [
+        (values, name if sink is not None else os.path.join(output_dir, name))
+        for values, name in zip(rows, output_names(rows))
+    ]
+    if not jobs:
+        return []
+    zip_template = ZipTemplate(template_path) if engine == "zip" else None
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(template_path, zip_template)) as pool:
+        if sink is None:
+            chunksize = max(1, len(jobs) // (workers * 4))
+            return list(pool.map(_render_job, jobs, chunksize=chunksize))
+        saved = []
+        for name, data, cct in bounded_map(pool, _render_job_bytes, jobs, workers * 4):
+            sink.add(name, data, cct)
+            saved.append(name)
+        return saved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--template", default=TEMPLATE_PATH)
+    parser.add_argument("--out", default=OUTPUT_DIR)
+    parser.add_argument("--zip", help="Write one archive instead of a directory ('-' for stdout)")
+    parser.add_argument("--manifest", action="store_true", help="Add manifest.csv (CCT, file, SHA-256) to --zip")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="CSV whose headers are the template tokens (CCT_ESCUELA, NOMBRE_DIRECTOR, ...)")
+    source.add_argument("--db", action="store_true", help="Read Escuela/DirectorExpediente from DATABASE_URL")
+    source.add_argument("--worker", action="store_true", help="Serve JSON render jobs from stdin")
+    parser.add_argument("--zona", help="Only schools whose zonaEscolar matches (with --db)")
+    parser.add_argument("--cct", nargs="*", help="Only these CCTs (with --db)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--engine", choices=["zip", "docx"], default="zip")
+    parser.add_argument("--cache-entries", type=int, default=32, help="Worker cache size (templates)")
+    parser.add_argument("--cache-mb", type=float, default=None, help="Worker cache budget (compiled MB)")
+    args = parser.parse_args()
+
+    if args.worker:
+        max_bytes = int(args.cache_mb * 1024 * 1024) if args.cache_mb else None
+        run_worker(TemplateCache(args.cache_entries, max_bytes))
+        return
+
+    rows = load_csv_rows(args.csv) if args.csv else load_db_rows(args.zona, args.cct)
+    if args.zip:
+        with ZipSink(args.zip, args.manifest) as sink:
+            saved = render_batch(args.template, rows, workers=args.workers, engine=args.engine, sink=sink)
+        # stdout may carry the archive itself
+        target = "stdout" if args.zip == "-" else args.zip
+        print(f"Rendered {len(saved)} constancias into {target}", file=sys.stderr)
+        return
+    saved = render_batch(args.template, rows, args.out, args.workers, args.engine)
+    print(f"Rendered {len(saved)} constancias into {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,115 +1,281 @@
+import argparse
+import io
 import os
-import win32com.client
+import re
 import xlsxwriter
+from concurrent.futures import ProcessPoolExecutor
 
-def create_excel():
-    excel_path = os.path.abspath("Registro_Zona_2026_Temp.xlsx")
-    final_path = os.path.abspath("Registro_Zona_2026_Inteligente.xlsm")
-    
-    escuelas = [
-        ("21EBH0088T", "ALFONSO DE LA MADRID VIDAURRETA", "VENUSTIANO CARRANZA"),
-        ("21EBH0186U", "AQUILES SERDÁN", "PANTEPEC"),
-        ("21EBH0903N", "BENITO JUÁREZ GARCÍA", "SAN BARTOLO"),
-        ("21EBH0464F", "DAVID ALFARO SIQUEIROS", "HUITZILAC"),
-        ("21EBH0789L", "DAVID ALFARO SIQUEIROS", "JALTOCAN"),
-        ("21EBH0708K", "DIEGO RIVERA", "EJIDO CAÑADA COLOTLA"),
-        ("21EBH0608L", "EMILIANO ZAPATA", "SAN DIEGO"),
-        ("21EBH0200X", "HÉROES DE LA PATRIA", "CORONEL TITO HDEZ."),
-        ("21EBH0620G", "JAIME SABINES", "AGUA LINDA"),
-        ("21EBH0681U", "JOSÉ IGNACIO GREGORIO COMONFORT", "PALMA REAL"),
-        ("21EBH0201W", "JOSÉ VASCONCELOS", "LAZARO CARDENAS"),
-        ("21EBH0799S", "JUAN ALDAMA", "NUEVO ZOQUIAPAN"),
-        ("21EBH07040", "LUIS DONALDO COLOSIO MURRIETA", "LA CEIBA CHICA"),
-        ("21EBH0214Z", "MECAPALAPA", "MECAPALAPA"),
-        ("21EBH0465E", "MOISÉS SÁENZ GARZA", "TECOMATE"),
-        ("21EBH0130S", "REYES GARCÍA OLIVARES", "FCO. Z. MENA"),
-        ("21ECT0017T", "TECNOLÓGICO FCO. Z. MENA", "FCO. Z. MENA"),
-        ("21EBH0682T", "VICENTE SUÁREZ FERRER", "COYOLITO")
+from vba_project import build_vba_project
+
+# Offline fallback (--offline): Zona 004 as of the 2026 registration
+ESCUELAS_ZONA_004 = [
+    ("21EBH0088T", "ALFONSO DE LA MADRID VIDAURRETA", "VENUSTIANO CARRANZA"),
+    ("21EBH0186U", "AQUILES SERDÁN", "PANTEPEC"),
+    ("21EBH0903N", "BENITO JUÁREZ GARCÍA", "SAN BARTOLO"),
+    ("21EBH0464F", "DAVID ALFARO SIQUEIROS", "HUITZILAC"),
+    ("21EBH0789L", "DAVID ALFARO SIQUEIROS", "JALTOCAN"),
+    ("21EBH0708K", "DIEGO RIVERA", "EJIDO CAÑADA COLOTLA"),
+    ("21EBH0608L", "EMILIANO ZAPATA", "SAN DIEGO"),
+    ("21EBH0200X", "HÉROES DE LA PATRIA", "CORONEL TITO HDEZ."),
+    ("21EBH0620G", "JAIME SABINES", "AGUA LINDA"),
+    ("21EBH0681U", "JOSÉ IGNACIO GREGORIO COMONFORT", "PALMA REAL"),
+    ("21EBH0201W", "JOSÉ VASCONCELOS", "LAZARO CARDENAS"),
+    ("21EBH0799S", "JUAN ALDAMA", "NUEVO ZOQUIAPAN"),
+    ("21EBH07040", "LUIS DONALDO COLOSIO MURRIETA", "LA CEIBA CHICA"),
+    ("21EBH0214Z", "MECAPALAPA", "MECAPALAPA"),
+    ("21EBH0465E", "MOISÉS SÁENZ GARZA", "TECOMATE"),
+    ("21EBH0130S", "REYES GARCÍA OLIVARES", "FCO. Z. MENA"),
+    ("21ECT0017T", "TECNOLÓGICO FCO. Z. MENA", "FCO. Z. MENA"),
+    ("21EBH0682T", "VICENTE SUÁREZ FERRER", "COYOLITO")
+]
+
+
+# Offline fallback (--offline): discipline layout of the 2026 registration
+CATEGORIAS_2026 = {
+    "Arte y Cultura": [
+        {"name": "Baile Trad. (8-16)", "has_participants": False, "pair": None, "single_link": "Baile_Num"},
+        {"name": "Baile - Nº Part.", "has_participants": True, "min": 8, "max": 16, "pair": "Baile_Num", "single_link": None},
+
+        {"name": "Danza Trad. (4-16)", "has_participants": False, "pair": None, "single_link": "Danza_Num"},
+        {"name": "Danza - Nº Part.", "has_participants": True, "min": 4, "max": 16, "pair": "Danza_Num", "single_link": None},
+
+        {"name": "Canto - Solista", "has_participants": False, "min": 1, "max": 1, "pair": "Canto", "is_indiv": True},
+        {"name": "Canto - Dueto", "has_participants": False, "min": 2, "max": 2, "pair": "Canto", "is_indiv": False},
+        {"name": "Canto - Nº Part.", "has_participants": True, "min": 1, "max": 2, "pair": "Canto_Num"},
+
+        {"name": "Cómic - Indiv.", "has_participants": False, "min": 1, "max": 1, "pair": "Cómic", "is_indiv": True},
+        {"name": "Cómic - Equipo", "has_participants": False, "min": 2, "max": 3, "pair": "Cómic", "is_indiv": False},
+        {"name": "Cómic - Nº Part.", "has_participants": True, "min": 1, "max": 3, "pair": "Cómic_Num"},
+
+        {"name": "Foto - Indiv.", "has_participants": False, "min": 1, "max": 1, "pair": "Fotografía", "is_indiv": True},
+        {"name": "Foto - Equipo", "has_participants": False, "min": 2, "max": 3, "pair": "Fotografía", "is_indiv": False},
+        {"name": "Foto - Nº Part.", "has_participants": True, "min": 1, "max": 3, "pair": "Fotografía_Num"},
+
+        {"name": "TikTok - Indiv.", "has_participants": False, "min": 1, "max": 1, "pair": "TikTok", "is_indiv": True},
+        {"name": "TikTok - Equipo", "has_participants": False, "min": 2, "max": 3, "pair": "TikTok", "is_indiv": False},
+        {"name": "TikTok - Nº Part.", "has_participants": True, "min": 1, "max": 3, "pair": "TikTok_Num"},
+
+        {"name": "Teatro (1-10)", "has_participants": False, "pair": None, "single_link": "Teatro_Num"},
+        {"name": "Teatro - Nº Part.", "has_participants": True, "min": 1, "max": 10, "pair": "Teatro_Num", "single_link": None}
+    ],
+    "Humanidades y Com.": [
+        {"name": "Declamación (1)", "has_participants": False, "pair": None, "single_link": None},
+        {"name": "Filosofía (1)", "has_participants": False, "pair": None, "single_link": None},
+        {"name": "Oratoria Ensayo (1)", "has_participants": False, "pair": None, "single_link": None},
+        {"name": "Spelling Bee - A1", "has_participants": False, "pair": None, "single_link": None},
+        {"name": "Spelling Bee - A2", "has_participants": False, "pair": None, "single_link": None},
+        {"name": "Spelling Bee - B1", "has_participants": False, "pair": None, "single_link": None}
+    ],
+    "Ciencia y Tecnología": [
+        {"name": "Enc. Ciencias (2-4)", "has_participants": False, "pair": None, "single_link": "Ciencias_Num"},
+        {"name": "Ciencias - Nº Part.", "has_participants": True, "min": 2, "max": 4, "pair": "Ciencias_Num", "single_link": None},
+
+        {"name": "Enc. Matemáticas (2-4)", "has_participants": False, "pair": None, "single_link": "Mats_Num"},
+        {"name": "Matemáticas - Nº Part.", "has_participants": True, "min": 2, "max": 4, "pair": "Mats_Num", "single_link": None},
+
+        {"name": "Enc. Física (2-4)", "has_participants": False, "pair": None, "single_link": "Fisica_Num"},
+        {"name": "Física - Nº Part.", "has_participants": True, "min": 2, "max": 4, "pair": "Fisica_Num", "single_link": None},
+
+        {"name": "Enc. Química (2-4)", "has_participants": False, "pair": None, "single_link": "Quimica_Num"},
+        {"name": "Química - Nº Part.", "has_participants": True, "min": 2, "max": 4, "pair": "Quimica_Num", "single_link": None},
+
+        {"name": "Sabores Com. (2-4)", "has_participants": False, "pair": None, "single_link": "Sabores_Num"},
+        {"name": "Sabores - Nº Part.", "has_participants": True, "min": 2, "max": 4, "pair": "Sabores_Num", "single_link": None}
+    ],
+    "Tech-Desafíos": [
+        {"name": "Fotomontaje - Ind", "has_participants": False, "min": 1, "max": 1, "pair": "Fotomontaje", "is_indiv": True},
+        {"name": "Fotomontaje - Eq", "has_participants": False, "min": 2, "max": 3, "pair": "Fotomontaje", "is_indiv": False},
+        {"name": "Fotomontaje - Nº Part.", "has_participants": True, "min": 1, "max": 3, "pair": "Fotomontaje_Num"},
+
+        {"name": "Humor - Ind", "has_participants": False, "min": 1, "max": 1, "pair": "Humor", "is_indiv": True},
+        {"name": "Humor - Eq", "has_participants": False, "min": 2, "max": 3, "pair": "Humor", "is_indiv": False},
+        {"name": "Humor - Nº Part.", "has_participants": True, "min": 1, "max": 3, "pair": "Humor_Num"},
+
+        {"name": "Música IA - Ind", "has_participants": False, "min": 1, "max": 1, "pair": "Música", "is_indiv": True},
+        {"name": "Música IA - Eq", "has_participants": False, "min": 2, "max": 3, "pair": "Música", "is_indiv": False},
+        {"name": "Música IA - Nº Part.", "has_participants": True, "min": 1, "max": 3, "pair": "Música_Num"},
+
+        {"name": "Ritmo - Ind", "has_participants": False, "min": 1, "max": 1, "pair": "Ritmo", "is_indiv": True},
+        {"name": "Ritmo - Eq", "has_participants": False, "min": 2, "max": 3, "pair": "Ritmo", "is_indiv": False},
+        {"name": "Ritmo - Nº Part.", "has_participants": True, "min": 1, "max": 3, "pair": "Ritmo_Num"}
+    ],
+    "Eventos Externos": [
+        {"name": "Olimpiada Mats. (1)", "has_participants": False, "pair": None, "single_link": None},
+        {"name": "Encuentro PAEC (2-20)", "has_participants": False, "pair": None, "single_link": "PAEC_Num"},
+        {"name": "PAEC - Nº Part.", "has_participants": True, "min": 2, "max": 20, "pair": "PAEC_Num", "single_link": None}
     ]
+}
+
+CATEGORIAS_QUERY = 'SELECT id, nombre FROM "CategoriaEvento" ORDER BY orden, nombre'
+DISCIPLINAS_QUERY = """
+    SELECT id, "categoriaId", nombre, tipo, "minParticipantes", "maxParticipantes", "grupoExclusion"
+    FROM "DisciplinaEvento"
+    ORDER BY orden, nombre
+"""
+# "Registro General": four header rows, one school per row from Excel row 5
+FIRST_DATA_ROW = 5
+
+ESCUELAS_QUERY = """
+    SELECT cct, nombre, localidad, "zonaEscolar"
+    FROM "Escuela"
+    WHERE NOT "esDePrueba" AND NOT "esSupervision"
+"""
+
+
+def disciplinas_to_columns(disciplinas):
+    # DisciplinaEvento rows (already in display order) -> the column descriptors the
+    # workbook is built from:
+    #   simple              -> one Sí/No column
+    #   grupo               -> Sí/No column linked to its own "Nº Part." column
+    #   individual/equipo   -> exclusive pair sharing one "Nº Part." column, emitted
+    #                          after the last member of the grupoExclusion
+    columns = []
+    groups = {}
+    for d in disciplinas:
+        if d["tipo"] in ("individual", "equipo") and d["grupoExclusion"]:
+            groups.setdefault(d["grupoExclusion"], []).append(d)
+    last_of_group = {members[-1]["id"]: key for key, members in groups.items()}
+
+    for d in disciplinas:
+        base = {"id": d["id"], "min": d["minParticipantes"], "max": d["maxParticipantes"]}
+        if d["tipo"] == "grupo":
+            link = f'{d["nombre"]}_Num'
+            columns.append({**base, "name": f'{d["nombre"]} ({d["minParticipantes"]}-{d["maxParticipantes"]})',
+                            "has_participants": False, "pair": None, "single_link": link})
+            columns.append({"name": f'{d["nombre"]} - Nº Part.', "has_participants": True,
+                            "min": d["minParticipantes"], "max": d["maxParticipantes"], "pair": link, "single_link": None})
+        elif d["tipo"] in ("individual", "equipo") and d["grupoExclusion"]:
+            members = groups[d["grupoExclusion"]]
+            label = members[0]["nombre"].split(" - ")[0]
+            columns.append({**base, "name": d["nombre"], "has_participants": False, "pair": label,
+                            "is_indiv": d["tipo"] == "individual"})
+            if last_of_group.get(d["id"]):
+                columns.append({"name": f"{label} - Nº Part.", "has_participants": True,
+                                "min": min(m["minParticipantes"] for m in members),
+                                "max": max(m["maxParticipantes"] for m in members),
+                                "pair": f"{label}_Num"})
+        else:
+            columns.append({**base, "name": d["nombre"], "has_participants": False, "pair": None, "single_link": None})
+    return columns
 
-    # Definition of disciplines
+
+def _fetch_event_config(zona=None):
+    # One query per table; disciplines are grouped by category through a dict
+    import sisat_db
+    from psycopg2.extras import RealDictCursor
+
+    with sisat_db.pooled_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(CATEGORIAS_QUERY)
+            categorias = cur.fetchall()
+            cur.execute(DISCIPLINAS_QUERY)
+            disciplinas = cur.fetchall()
+            query, params = ESCUELAS_QUERY, []
+            if zona:
+                query += ' AND "zonaEscolar" = %s'
+                params.append(zona)
+            cur.execute(query + " ORDER BY nombre, cct", params)
+            escuelas = cur.fetchall()
+
+    por_categoria = {c["id"]: [] for c in categorias}
+    for d in disciplinas:
+        if d["categoriaId"] in por_categoria:
+            por_categoria[d["categoriaId"]].append(d)
     categories = {
-        "Arte y Cultura": [
-            {"name": "Baile Trad. (8-16)", "has_participants": False, "pair": None, "single_link": "Baile_Num"},
-            {"name": "Baile - Nº Part.", "has_participants": True, "min": 8, "max": 16, "pair": "Baile_Num", "single_link": None},
-            
-            {"name": "Danza Trad. (4-16)", "has_participants": False, "pair": None, "single_link": "Danza_Num"},
-            {"name": "Danza - Nº Part.", "has_participants": True, "min": 4, "max": 16, "pair": "Danza_Num", "single_link": None},
-            
-            {"name": "Canto - Solista", "has_participants": False, "min": 1, "max": 1, "pair": "Canto", "is_indiv": True},
-            {"name": "Canto - Dueto", "has_participants": False, "min": 2, "max": 2, "pair": "Canto", "is_indiv": False},
-            {"name": "Canto - Nº Part.", "has_participants": True, "min": 1, "max": 2, "pair": "Canto_Num"},
-            
-            {"name": "Cómic - Indiv.", "has_participants": False, "min": 1, "max": 1, "pair": "Cómic", "is_indiv": True},
-            {"name": "Cómic - Equipo", "has_participants": False, "min": 2, "max": 3, "pair": "Cómic", "is_indiv": False},
-            {"name": "Cómic - Nº Part.", "has_participants": True, "min": 1, "max": 3, "pair": "Cómic_Num"},
-            
-            {"name": "Foto - Indiv.", "has_participants": False, "min": 1, "max": 1, "pair": "Fotografía", "is_indiv": True},
-            {"name": "Foto - Equipo", "has_participants": False, "min": 2, "max": 3, "pair": "Fotografía", "is_indiv": False},
-            {"name": "Foto - Nº Part.", "has_participants": True, "min": 1, "max": 3, "pair": "Fotografía_Num"},
-
-            {"name": "TikTok - Indiv.", "has_participants": False, "min": 1, "max": 1, "pair": "TikTok", "is_indiv": True},
-            {"name": "TikTok - Equipo", "has_participants": False, "min": 2, "max": 3, "pair": "TikTok", "is_indiv": False},
-            {"name": "TikTok - Nº Part.", "has_participants": True, "min": 1, "max": 3, "pair": "TikTok_Num"},
-
-            {"name": "Teatro (1-10)", "has_participants": False, "pair": None, "single_link": "Teatro_Num"},
-            {"name": "Teatro - Nº Part.", "has_participants": True, "min": 1, "max": 10, "pair": "Teatro_Num", "single_link": None}
-        ],
-        "Humanidades y Com.": [
-            {"name": "Declamación (1)", "has_participants": False, "pair": None, "single_link": None},
-            {"name": "Filosofía (1)", "has_participants": False, "pair": None, "single_link": None},
-            {"name": "Oratoria Ensayo (1)", "has_participants": False, "pair": None, "single_link": None},
-            {"name": "Spelling Bee - A1", "has_participants": False, "pair": None, "single_link": None},
-            {"name": "Spelling Bee - A2", "has_participants": False, "pair": None, "single_link": None},
-            {"name": "Spelling Bee - B1", "has_participants": False, "pair": None, "single_link": None}
-        ],
-        "Ciencia y Tecnología": [
-            {"name": "Enc. Ciencias (2-4)", "has_participants": False, "pair": None, "single_link": "Ciencias_Num"},
-            {"name": "Ciencias - Nº Part.", "has_participants": True, "min": 2, "max": 4, "pair": "Ciencias_Num", "single_link": None},
-            
-            {"name": "Enc. Matemáticas (2-4)", "has_participants": False, "pair": None, "single_link": "Mats_Num"},
-            {"name": "Matemáticas - Nº Part.", "has_participants": True, "min": 2, "max": 4, "pair": "Mats_Num", "single_link": None},
-            
-            {"name": "Enc. Física (2-4)", "has_participants": False, "pair": None, "single_link": "Fisica_Num"},
-            {"name": "Física - Nº Part.", "has_participants": True, "min": 2, "max": 4, "pair": "Fisica_Num", "single_link": None},
-            
-            {"name": "Enc. Química (2-4)", "has_participants": False, "pair": None, "single_link": "Quimica_Num"},
-            {"name": "Química - Nº Part.", "has_participants": True, "min": 2, "max": 4, "pair": "Quimica_Num", "single_link": None},
-            
-            {"name": "Sabores Com. (2-4)", "has_participants": False, "pair": None, "single_link": "Sabores_Num"},
-            {"name": "Sabores - Nº Part.", "has_participants": True, "min": 2, "max": 4, "pair": "Sabores_Num", "single_link": None}
-        ],
-        "Tech-Desafíos": [
-            {"name": "Fotomontaje - Ind", "has_participants": False, "min": 1, "max": 1, "pair": "Fotomontaje", "is_indiv": True},
-            {"name": "Fotomontaje - Eq", "has_participants": False, "min": 2, "max": 3, "pair": "Fotomontaje", "is_indiv": False},
-            {"name": "Fotomontaje - Nº Part.", "has_participants": True, "min": 1, "max": 3, "pair": "Fotomontaje_Num"},
-            
-            {"name": "Humor - Ind", "has_participants": False, "min": 1, "max": 1, "pair": "Humor", "is_indiv": True},
-            {"name": "Humor - Eq", "has_participants": False, "min": 2, "max": 3, "pair": "Humor", "is_indiv": False},
-            {"name": "Humor - Nº Part.", "has_participants": True, "min": 1, "max": 3, "pair": "Humor_Num"},
-            
-            {"name": "Música IA - Ind", "has_participants": False, "min": 1, "max": 1, "pair": "Música", "is_indiv": True},
-            {"name": "Música IA - Eq", "has_participants": False, "min": 2, "max": 3, "pair": "Música", "is_indiv": False},
-            {"name": "Música IA - Nº Part.", "has_participants": True, "min": 1, "max": 3, "pair": "Música_Num"},
-            
-            {"name": "Ritmo - Ind", "has_participants": False, "min": 1, "max": 1, "pair": "Ritmo", "is_indiv": True},
-            {"name": "Ritmo - Eq", "has_participants": False, "min": 2, "max": 3, "pair": "Ritmo", "is_indiv": False},
-            {"name": "Ritmo - Nº Part.", "has_participants": True, "min": 1, "max": 3, "pair": "Ritmo_Num"}
-        ],
-        "Eventos Externos": [
-            {"name": "Olimpiada Mats. (1)", "has_participants": False, "pair": None, "single_link": None},
-            {"name": "Encuentro PAEC (2-20)", "has_participants": False, "pair": None, "single_link": "PAEC_Num"},
-            {"name": "PAEC - Nº Part.", "has_participants": True, "min": 2, "max": 20, "pair": "PAEC_Num", "single_link": None}
-        ]
+        c["nombre"]: disciplinas_to_columns(por_categoria[c["id"]])
+        for c in categorias if por_categoria[c["id"]]
     }
+    return categories, escuelas
+
+
+def load_event_config(zona=None):
+    categories, escuelas = _fetch_event_config(zona)
+    return categories, [(e["cct"], e["nombre"], e["localidad"]) for e in escuelas]
+
+
+def load_zone_configs():
+    # Same three queries as load_event_config; schools are split by zonaEscolar here
+    categories, escuelas = _fetch_event_config()
+    por_zona = {}
+    for e in escuelas:
+        por_zona.setdefault(e["zonaEscolar"] or "SIN_ZONA", []).append((e["cct"], e["nombre"], e["localidad"]))
+    return categories, por_zona
 
-    if os.path.exists(excel_path):
+
+def build_layout(categories):
+    # Column layout of "Registro General" and the participant rules the VBA and
+    # validar_registros.py enforce; all columns are 1-based.
+    # Descriptors get their positions written into them; keep the caller's intact
+    categories = {cat: [dict(d) for d in descs] for cat, descs in categories.items()}
+    col_idx = 3
+    all_disciplines = []
+    cat_spans = []
+    for cat_name, desc_list in categories.items():
+        cat_spans.append((cat_name, col_idx, col_idx + len(desc_list) - 1))
+        for desc in desc_list:
+            desc["col"] = col_idx + 1 # 1-based index
+            desc["is_num_col"] = "Nº Part." in desc["name"]
+            all_disciplines.append(desc)
+            col_idx += 1
+
+    pair_mapping = {}
+    single_mapping = {}
+
+    # Dict indexes over the columns instead of rescanning all_disciplines per group
+    indiv_by_pair = {}
+    equipo_by_pair = {}
+    by_pair = {}
+    for d in all_disciplines:
+        pair = d.get("pair")
+        if not pair:
+            continue
+        by_pair.setdefault(pair, d)
+        if d.get("is_indiv") is True:
+            indiv_by_pair.setdefault(pair, d)
+        elif d.get("is_indiv") is False:
+            equipo_by_pair.setdefault(pair, d)
+
+    for g, indiv in indiv_by_pair.items():
+        equipo = equipo_by_pair.get(g)
+        num_col = by_pair.get(f"{g}_Num")
+        if equipo and num_col:
+            pair_mapping[g] = {
+                "indiv_col": indiv["col"],
+                "equipo_col": equipo["col"],
+                "num_col": num_col["col"],
+                "indiv_val": indiv.get("min", 1),
+                "equipo_min": equipo.get("min", 2),
+                "equipo_max": equipo.get("max", 3)
+            }
+
+    for d in all_disciplines:
+        if d.get("single_link"):
+            num_d = by_pair.get(d["single_link"])
+            if num_d:
+                single_mapping[d["name"]] = {
+                    "participa_col": d["col"],
+                    "num_col": num_d["col"],
+                    "min": num_d.get("min"),
+                    "max": num_d.get("max")
+                }
+
+    return all_disciplines, cat_spans, pair_mapping, single_mapping
+
+
+def create_excel(categories, escuelas, use_com=False, output_path=None):
+    # By default the VBA project is packaged in pure Python (vba_project.py) and the
+    # .xlsm is written directly; use_com keeps the old Excel automation path (Windows only)
+    final_path = os.path.abspath(output_path or "Registro_Zona_2026_Inteligente.xlsm")
+    excel_path = os.path.splitext(final_path)[0].replace("_Inteligente", "") + "_Temp.xlsx"
+    
+    target_path = excel_path if use_com else final_path
+    if os.path.exists(target_path):
         try:
-            os.remove(excel_path)
+            os.remove(target_path)
         except Exception:
             pass
         
-    workbook = xlsxwriter.Workbook(excel_path)
+    workbook = xlsxwriter.Workbook(target_path)
     ws = workbook.add_worksheet("Registro General")
     ws_resumen = workbook.add_worksheet("Resumen")
     ws_listas = workbook.add_worksheet("Listas")
@@ -133,79 +299,40 @@ def create_excel():
     ws.set_column(1, 1, 35)
     ws.set_column(2, 2, 22)
 
+    all_disciplines, cat_spans, pair_mapping, single_mapping = build_layout(categories)
+
     ws.merge_range(0, 0, 0, 2, "DATOS DEL PLANTEL", fmt_header_main)
-    ws.write(1, 0, "", fmt_header_main)
-    ws.write(1, 1, "", fmt_header_main)
-    ws.write(1, 2, "", fmt_header_main)
-    ws.write(2, 0, "", fmt_header_main)
-    ws.write(2, 1, "", fmt_header_main)
-    ws.write(2, 2, "", fmt_header_main)
-    
+    for cat_name, first_col, last_col in cat_spans:
+        ws.merge_range(0, first_col, 0, last_col, cat_name, fmt_header_cat)
+
+    # Discipline names span rows 1-2
+    for r in (1, 2):
+        for c in range(3):
+            ws.write(r, c, "", fmt_header_main)
+    for desc in all_disciplines:
+        c = desc["col"] - 1
+        ws.merge_range(1, c, 2, c, desc["name"], fmt_num if desc["is_num_col"] else fmt_header_disc)
+
     ws.write(3, 0, "CCT", fmt_header_sub)
     ws.write(3, 1, "Nombre del Plantel", fmt_header_sub)
     ws.write(3, 2, "Localidad", fmt_header_sub)
+    for desc in all_disciplines:
+        c = desc["col"] - 1
+        if desc["is_num_col"]:
+            ws.write(3, c, "#", fmt_header_sub)
+            ws.set_column(c, c, 8)
+        elif desc["has_participants"]:
+            ws.write(3, c, "Nº Part.", fmt_header_sub)
+            ws.set_column(c, c, 8)
+        else:
+            ws.write(3, c, "Participa?", fmt_header_sub)
+            ws.set_column(c, c, 10)
 
-    col_idx = 3
-    all_disciplines = []
-    
-    pair_mapping = {}
-    single_mapping = {}
-
-    for cat_name, desc_list in categories.items():
-        num_cols = len(desc_list)
-        ws.merge_range(0, col_idx, 0, col_idx + num_cols - 1, cat_name, fmt_header_cat)
-        
-        for desc in desc_list:
-            if "Nº Part." in desc["name"]:
-                ws.merge_range(1, col_idx, 2, col_idx, desc["name"], fmt_num)
-                ws.write(3, col_idx, "#", fmt_header_sub)
-                desc["col"] = col_idx + 1
-                desc["is_num_col"] = True
-                ws.set_column(col_idx, col_idx, 8)
-                all_disciplines.append(desc)
-                col_idx += 1
-                continue
-            
-            ws.merge_range(1, col_idx, 2, col_idx, desc["name"], fmt_header_disc)
-            if desc["has_participants"]:
-                ws.write(3, col_idx, "Nº Part.", fmt_header_sub)
-                ws.set_column(col_idx, col_idx, 8)
-            else:
-                ws.write(3, col_idx, "Participa?", fmt_header_sub)
-                ws.set_column(col_idx, col_idx, 10)
-            
-            desc["col"] = col_idx + 1 # 1-based index
-            desc["is_num_col"] = False
-            all_disciplines.append(desc)
-            col_idx += 1
-
-    groups = list(set([d["pair"] for d in all_disciplines if d.get("pair") and not d["pair"].endswith("_Num")]))
-    for g in groups:
-        indiv = next((d for d in all_disciplines if d.get("pair") == g and d.get("is_indiv") == True), None)
-        equipo = next((d for d in all_disciplines if d.get("pair") == g and d.get("is_indiv") == False), None)
-        num_col = next((d for d in all_disciplines if d.get("pair") == f"{g}_Num"), None)
-        if indiv and equipo and num_col:
-            pair_mapping[g] = {
-                "indiv_col": indiv["col"],
-                "equipo_col": equipo["col"],
-                "num_col": num_col["col"],
-                "indiv_val": indiv.get("min", 1),
-                "equipo_min": equipo.get("min", 2),
-                "equipo_max": equipo.get("max", 3)
-            }
-
-    for d in all_disciplines:
-        if d.get("single_link"):
-            num_d = next((x for x in all_disciplines if x.get("pair") == d["single_link"]), None)
-            if num_d:
-                single_mapping[d["name"]] = {
-                    "participa_col": d["col"],
-                    "num_col": num_d["col"],
-                    "min": num_d.get("min"),
-                    "max": num_d.get("max")
-                }
-
-    start_row = 4
+    # Data rows run from Excel row 5 to last_row; the COUNTIFs and the VBA loops
+    # below are sized from the school count instead of a fixed zone of 18
+    first_row = FIRST_DATA_ROW
+    start_row = first_row - 1
+    last_row = start_row + max(len(escuelas), 1)
     for i, escuela in enumerate(escuelas):
         row = start_row + i
         ws.write(row, 0, escuela[0], fmt_cell_locked)
@@ -218,9 +345,14 @@ def create_excel():
                 ws.write(row, c_idx, "", fmt_num)
             else:
                 ws.write(row, c_idx, "No", fmt_cell)
-                ws.data_validation(row, c_idx, row, c_idx, {'validate': 'list', 'source': '=Listas!$A$2:$A$3'})
             c_idx += 1
 
+    # One validation per column range rather than one per cell
+    for desc in all_disciplines:
+        if not desc["is_num_col"] and not desc["has_participants"]:
+            c = desc["col"] - 1
+            ws.data_validation(start_row, c, last_row - 1, c, {'validate': 'list', 'source': '=Listas!$A$2:$A$3'})
+
     ws_resumen.write(0, 0, "RESUMEN DE PARTICIPACIÓN POR DISCIPLINA", fmt_header_main)
     ws_resumen.set_column(0, 0, 40)
     ws_resumen.set_column(1, 1, 15)
@@ -229,15 +361,13 @@ def create_excel():
         if not desc["is_num_col"] and not desc["has_participants"]:
             ws_resumen.write(row, 0, desc["name"], fmt_cell_locked)
             col_letter = xlsxwriter.utility.xl_col_to_name(desc["col"] - 1)
-            ws_resumen.write_formula(row, 1, f'=COUNTIF(\'Registro General\'!{col_letter}5:{col_letter}22, "Sí")', fmt_cell)
+            ws_resumen.write_formula(row, 1, f'=COUNTIF(\'Registro General\'!{col_letter}{first_row}:{col_letter}{last_row}, "Sí")', fmt_cell)
             row += 1
 
-    workbook.close()
-
-    vba_sheet_code = """
+    vba_sheet_code = f"""
 Private Sub Worksheet_Change(ByVal Target As Range)
     If Target.Count > 1 Then Exit Sub
-    If Target.Row < 5 Or Target.Row > 22 Then Exit Sub
+    If Target.Row < {first_row} Or Target.Row > {last_row} Then Exit Sub
     
     Dim col As Integer
     col = Target.Column
@@ -294,7 +424,7 @@ Private Sub Worksheet_Change(ByVal Target As Range)
 Private Sub Workbook_BeforeSave(ByVal SaveAsUI As Boolean, Cancel As Boolean)
     Dim ws As Worksheet
     Set ws = ThisWorkbook.Sheets("Registro General")
-    Dim r As Integer, num As Variant
+    Dim r As Long, num As Variant
     Dim err_msg As String
     Dim ind_val As String, eq_val As String, num_val As Variant
     Dim part_val As String
@@ -302,7 +432,7 @@ Private Sub Workbook_BeforeSave(ByVal SaveAsUI As Boolean, Cancel As Boolean)
     
     for g, info in pair_mapping.items():
         vba_workbook_code += f'''
-    For r = 5 To 22
+    For r = {first_row} To {last_row}
         ind_val = ws.Cells(r, {info["indiv_col"]}).Value
         eq_val = ws.Cells(r, {info["equipo_col"]}).Value
         num_val = ws.Cells(r, {info["num_col"]}).Value
@@ -351,7 +481,7 @@ Private Sub Workbook_BeforeSave(ByVal SaveAsUI As Boolean, Cancel As Boolean)
 
     for name, info in single_mapping.items():
         vba_workbook_code += f'''
-    For r = 5 To 22
+    For r = {first_row} To {last_row}
         part_val = ws.Cells(r, {info["participa_col"]}).Value
         num_val = ws.Cells(r, {info["num_col"]}).Value
         
@@ -381,6 +511,27 @@ Private Sub Workbook_BeforeSave(ByVal SaveAsUI As Boolean, Cancel As Boolean)
 
     vba_workbook_code += "\nEnd Sub\n"
 
+    if not use_com:
+        # Code names must match the document modules inside vbaProject.bin
+        workbook.set_vba_name("ThisWorkbook")
+        ws.set_vba_name("Hoja1")
+        ws_resumen.set_vba_name("Hoja2")
+        ws_listas.set_vba_name("Hoja3")
+        vba_bin = build_vba_project([
+            ("ThisWorkbook", "workbook", vba_workbook_code),
+            ("Hoja1", "worksheet", vba_sheet_code),
+            ("Hoja2", "worksheet", ""),
+            ("Hoja3", "worksheet", ""),
+        ])
+        workbook.add_vba_project(io.BytesIO(vba_bin), is_stream=True)
+        workbook.close()
+        print("Sucessfully created", final_path)
+        return final_path
+
+    workbook.close()
+
+    import win32com.client
+
     if os.path.exists(final_path):
         try:
             os.remove(final_path)
@@ -408,7 +559,7 @@ Private Sub Workbook_BeforeSave(ByVal SaveAsUI As Boolean, Cancel As Boolean)
         print(f"Failed to inject VBA: {e}")
         wb.Close(SaveChanges=False)
         excel.Quit()
-        return
+        return None
 
     wb.Close(SaveChanges=False)
     excel.Quit()
@@ -417,6 +568,53 @@ Private Sub Workbook_BeforeSave(ByVal SaveAsUI As Boolean, Cancel As Boolean)
     except:
         pass
     print("Sucessfully created", final_path)
+    return final_path
+
+
+def zone_slug(zona):
+    return re.sub(r"[^\w-]+", "_", str(zona)).strip("_") or "SIN_ZONA"
+
+
+def zone_output_path(zona, out_dir="."):
+    return os.path.join(out_dir, f"Registro_Zona_{zone_slug(zona)}_2026_Inteligente.xlsm")
+
+
+def _create_zone_workbook(job):
+    zona, categories, escuelas, out_dir = job
+    return create_excel(categories, escuelas, output_path=zone_output_path(zona, out_dir))
+
+
+def create_zone_workbooks(categories, por_zona, out_dir=".", workers=None):
+    # One workbook per zone, each built in its own process; the layout is shared
+    # and each worker only holds its own zone's schools
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(zona, categories, escuelas, out_dir) for zona, escuelas in sorted(por_zona.items()) if escuelas]
+    if not jobs:
+        return []
+    with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(jobs))) as pool:
+        return list(pool.map(_create_zone_workbook, jobs))
 
 if __name__ == '__main__':
-    create_excel()
+    parser = argparse.ArgumentParser(description="Genera el registro de zona 2026 (.xlsm con validaciones VBA)")
+    parser.add_argument("--com", action="store_true", help="Inject the VBA through Excel COM automation (Windows)")
+    parser.add_argument("--zona", help="Only schools whose zonaEscolar matches")
+    parser.add_argument("--por-zona", action="store_true", help="One workbook per zonaEscolar, built in parallel")
+    parser.add_argument("--out", default=".", help="Output folder for --por-zona")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for --por-zona (default: CPU count)")
+    parser.add_argument("--offline", action="store_true", help="Use the built-in 2026 layout instead of the database")
+    args = parser.parse_args()
+    if args.por_zona:
+        if args.com or args.zona:
+            parser.error("--por-zona cannot be combined with --com or --zona")
+        if args.offline:
+            categories, por_zona = CATEGORIAS_2026, {"004": ESCUELAS_ZONA_004}
+        else:
+            categories, por_zona = load_zone_configs()
+        paths = create_zone_workbooks(categories, por_zona, args.out, args.workers)
+        print(f"{len(paths)} workbooks in {os.path.abspath(args.out)}")
+    else:
+        if args.offline:
+            categories, escuelas = CATEGORIAS_2026, ESCUELAS_ZONA_004
+        else:
+            categories, escuelas = load_event_config(args.zona)
+        create_excel(categories, escuelas, use_com=args.com)
@@ -0,0 +1,139 @@
+"""Import returned registration workbooks into InscripcionEvento ("InscripcionEvento2026").
+
+Columns are mapped back to DisciplinaEvento ids through the same build_layout()
+the generator uses, so the layout must come from the database (the offline
+layout carries no ids). Each workbook is checked with the validator's rules.
+Its rows are then COPYed into a temp table and merged with one
+INSERT ... ON CONFLICT ("escuelaId", "cicloEscolarId"), in a single transaction
+per file. Existing datos are merged key by key (datos || nuevos), so
+re-importing a file is idempotent per (school, discipline) and leaves
+disciplines that are not in the workbook untouched.
+
+    python importar_registros.py devueltos/ --ciclo 2025-2026
+    python importar_registros.py Registro_Zona_004_2026_Inteligente.xlsm --dry-run
+"""
+import argparse
+import json
+import os
+import sys
+from contextlib import nullcontext
+
+import numpy as np
+
+import sisat_db
+from generar_excel_2026 import build_layout, load_event_config
+from validar_registros import check_layout, count_columns, find_workbooks, read_grid, validate_grid
+
+UPSERT_SQL = """
+    INSERT INTO "InscripcionEvento2026" (id, "escuelaId", "cicloEscolarId", datos, "updatedAt")
+    SELECT s.id, e.id, %(ciclo)s, s.datos::jsonb, now()
+    FROM _registro_import s
+    JOIN "Escuela" e ON e.cct = s.cct
+    ON CONFLICT ("escuelaId", "cicloEscolarId")
+    DO UPDATE SET datos = "InscripcionEvento2026".datos || EXCLUDED.datos, "updatedAt" = now()
+    RETURNING "escuelaId"
+"""
+
+
+def discipline_columns(layout):
+    # -> [(disciplinaId, participa col, count col or None, fixed count)], 0-based columns.
+    # Sí/No-only disciplines carry no count column and register minParticipantes
+    all_disciplines, _, pair_mapping, single_mapping = layout
+    num_col_by_pair = {g: info["num_col"] for g, info in pair_mapping.items()}
+    columns = []
+    for d in all_disciplines:
+        if d["is_num_col"] or not d.get("id"):
+            continue
+        if d.get("single_link") and d["name"] in single_mapping:
+            num_col = single_mapping[d["name"]]["num_col"] - 1
+        elif d.get("pair") in num_col_by_pair:
+            num_col = num_col_by_pair[d["pair"]] - 1
+        else:
+            num_col = None
+        columns.append((d["id"], d["col"] - 1, num_col, d.get("min") or 1))
+    return columns
+
+
+def rows_to_datos(grid, columns, include_empty=False):
+    # -> [(cct, datos)] in the shape the registration form posts:
+    #    {disciplinaId: {"participa": bool, "numParticipantes": int}}
+    si = grid == "Sí"
+    num, _, _ = count_columns(grid)
+    counts = np.nan_to_num(num, nan=0).astype(int)
+    any_si = si[:, [c[1] for c in columns]].any(axis=1) if columns else np.zeros(len(grid), dtype=bool)
+    out = []
+    for i in range(len(grid)):
+        if not include_empty and not any_si[i]:
+            continue
+        datos = {}
+        for disc_id, pc, nc, fixed in columns:
+            participa = bool(si[i, pc])
+            n = (int(counts[i, nc]) if nc is not None else fixed) if participa else 0
+            datos[disc_id] = {"participa": participa, "numParticipantes": n}
+        out.append((str(grid[i, 0]).strip(), datos))
+    return out
+
+
+def import_rows(conn, ciclo_id, rows):
+    # One transaction: COPY into a temp table, then a single upsert. A CCT listed
+    # twice keeps its last row (ON CONFLICT can't touch the same row twice)
+    by_cct = dict(rows)
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute("CREATE TEMP TABLE _registro_import (id text, cct text, datos text) ON COMMIT DROP")
+            sisat_db.copy_rows(cur, "_registro_import", ["id", "cct", "datos"],
+                               ((sisat_db.new_id(), cct, json.dumps(datos, ensure_ascii=False)) for cct, datos in by_cct.items()))
+            cur.execute(UPSERT_SQL, {"ciclo": ciclo_id})
+            return len(by_cct), len(cur.fetchall())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa los registros de zona 2026 devueltos a InscripcionEvento")
+    parser.add_argument("paths", nargs="+", help="Workbooks or folders of .xlsm files")
+    parser.add_argument("--ciclo", help="CicloEscolar.nombre (default: the active cycle)")
+    parser.add_argument("--incluir-vacias", action="store_true",
+                        help="Also import rows with no discipline marked Sí (default: skip them as untouched)")
+    parser.add_argument("--forzar", action="store_true", help="Import workbooks even if they fail validation")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and validate only; write nothing")
+    args = parser.parse_args()
+
+    files = find_workbooks(args.paths)
+    if not files:
+        parser.error("no .xlsm workbooks found")
+
+    layout = build_layout(load_event_config()[0])
+    all_disciplines, _, pair_mapping, single_mapping = layout
+    columns = discipline_columns(layout)
+    n_cols = max([3] + [d["col"] for d in all_disciplines])
+
+    with nullcontext() if args.dry_run else sisat_db.pooled_connection() as conn:
+        if conn is not None:
+            with conn.cursor() as cur:
+                ciclo_id, ciclo_nombre = sisat_db.resolve_ciclo(args.ciclo, cur)
+            print(f"Ciclo {ciclo_nombre}")
+        status = 0
+        for path in files:
+            name = os.path.basename(path)
+            header, _, grid = read_grid(path, n_cols)
+            problems = check_layout(header, all_disciplines)
+            if problems:
+                print(f"{name}: OMITIDO, el encabezado no coincide con el catálogo ({problems[0]})")
+                status = 1
+                continue
+            n_errors = sum(int(mask.sum()) for mask, _, _ in validate_grid(grid, pair_mapping, single_mapping))
+            if n_errors and not args.forzar:
+                print(f"{name}: OMITIDO, {n_errors} errores de validación (ver validar_registros.py)")
+                status = 1
+                continue
+
+            rows = rows_to_datos(grid, columns, args.incluir_vacias)
+            if conn is None:
+                print(f"{name}: {len(rows)} escuelas listas para importar")
+                continue
+            sent, upserted = import_rows(conn, ciclo_id, rows)
+            missing = sent - upserted
+            print(f"{name}: {upserted} escuelas importadas" + (f", {missing} CCT sin escuela en la BD" if missing else ""))
+        return status
+
+if __name__ == "__main__":
+    sys.exit(main())
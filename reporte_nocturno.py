@@ -0,0 +1,304 @@
+"""Nightly supervisor pack: every zone report in one workbook.
+
+Each report is a SQL query that does the heavy lifting (joins, per-school
+aggregates) plus a small post-processing step (medals, ordering). All
+queries run at the same time, each on its own pooled connection. The pack
+therefore takes as long as its slowest query, not the sum of all of them.
+
+The cumplimiento and ranking rules mirror /api/admin/reporte-cumplimiento
+and /api/admin/ranking. If those routes change, update these reports too.
+
+    python reporte_nocturno.py
+    python reporte_nocturno.py --ciclo 2025-2026 --out reportes/Reporte_Nocturno.xlsx
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import xlsxwriter
+from psycopg2.extras import RealDictCursor
+
+import sisat_db
+
+APROBADO = ("APROBADO", "ENTREGADO_FISICO")
+ENTREGADO = APROBADO + ("EN_REVISION", "REQUIERE_CORRECCION")
+NO_ENTREGADO = ("PENDIENTE", "NO_ENTREGADO", "NO_APROBADO")
+SPARH_APROBADO = ("VALIDADO", "LISTO_PARA_CORDE", "ENTREGADO_A_CORDE")
+SPARH_RECIBIDO = ("RECIBIDO", "EN_VALIDACION", "CONSOLIDADO")
+SPARH_CORREGIR = ("CON_ERRORES", "CORREGIR")
+MEDALLA_ORDEN = {"ORO": 4, "PLATA": 3, "BRONCE": 2, "NINGUNA": 1}
+
+
+def sql_list(values):
+    # ('A', 'B') for an IN clause; a Python tuple repr breaks on one element ("('A',)")
+    return "(" + ", ".join(f"'{v}'" for v in values) + ")"
+
+
+APROBADO_SQL = sql_list(APROBADO)
+ENTREGADO_SQL = sql_list(ENTREGADO)
+NO_ENTREGADO_SQL = sql_list(NO_ENTREGADO)
+
+# The routes compare against the end of the deadline day (setHours(23, 59, 59, 999)).
+# Like reporte-cumplimiento, a period without a deadline is never on time
+A_TIEMPO_SQL = """e."fechaSubida" IS NOT NULL AND pe."fechaLimite" IS NOT NULL
+                  AND e."fechaSubida" < date_trunc('day', pe."fechaLimite") + interval '1 day'"""
+
+CUMPLIMIENTO_QUERY = f"""
+    SELECT esc.cct, esc.nombre, coalesce(esc.director, 'Sin director registrado') AS director,
+           count(e.id) FILTER (WHERE e.estado <> 'EXENTO') AS requeridas,
+           count(e.id) FILTER (WHERE e.estado IN {APROBADO_SQL}) AS aprobadas,
+           count(e.id) FILTER (WHERE e.estado = 'EN_REVISION') AS "enRevision",
+           count(e.id) FILTER (WHERE e.estado = 'REQUIERE_CORRECCION') AS "correccionesPendientes",
+           count(e.id) FILTER (WHERE e.estado IN {NO_ENTREGADO_SQL}) AS "noEntregados",
+           coalesce(bool_and(e.estado IN {APROBADO_SQL} AND {A_TIEMPO_SQL}) FILTER (WHERE e.estado <> 'EXENTO'), false)
+               AS "todasATiempo"
+    FROM "Escuela" esc
+    LEFT JOIN ("Entrega" e JOIN "PeriodoEntrega" pe ON pe.id = e."periodoEntregaId" AND pe."cicloEscolarId" = %(ciclo)s)
+        ON e."escuelaId" = esc.id
+    WHERE NOT esc."esDePrueba" AND NOT esc."esSupervision"
+    GROUP BY esc.id
+"""
+
+# Entregas the ranking counts: programs directors upload, and with
+# evaluarSoloActivosRanking only active periods that have a deadline or that
+# some school in the zone already delivered
+RANKING_QUERY = f"""
+    WITH ciclo AS (
+        SELECT "evaluarSoloActivosRanking" AS solo FROM "CicloEscolar" WHERE id = %(ciclo)s
+    ), entregas AS (
+        SELECT e.*, pe."fechaLimite", pe.activo AS "periodoActivo"
+        FROM "Entrega" e
+        JOIN "PeriodoEntrega" pe ON pe.id = e."periodoEntregaId"
+        JOIN "Programa" p ON p.id = pe."programaId"
+        JOIN "Escuela" esc ON esc.id = e."escuelaId"
+        WHERE pe."cicloEscolarId" = %(ciclo)s AND NOT esc."esDePrueba" AND NOT esc."esSupervision"
+          AND e.estado <> 'EXENTO'
+          AND (cardinality(p."quienesPuedenSubir") = 0 OR 'director' = ANY(p."quienesPuedenSubir"))
+    ), periodos_con_entregas AS (
+        SELECT DISTINCT "periodoEntregaId" FROM entregas WHERE estado IN {ENTREGADO_SQL}
+    ), requeridas AS (
+        SELECT e.* FROM entregas e, ciclo
+        WHERE NOT ciclo.solo OR (e."periodoActivo" AND (e."fechaLimite" IS NOT NULL
+              OR e."periodoEntregaId" IN (SELECT "periodoEntregaId" FROM periodos_con_entregas)))
+    ), config AS (
+        SELECT coalesce((SELECT activo FROM "PlantillaCorteConfig" WHERE "tenantId" = %(tenant)s), true) AS "sparhActivo",
+               (SELECT "fechaCorteOficial" FROM "PlantillaCorteConfig" WHERE "tenantId" = %(tenant)s) AS "fechaCorte",
+               (SELECT count(*) FROM "PlantillaPersonalRegistro" WHERE "tenantId" = %(tenant)s) AS "sparhRegistros",
+               (SELECT solo FROM ciclo) AS "soloActivos"
+    )
+    SELECT esc.id, esc.cct, esc.nombre, esc."zonaEscolar" AS zona,
+           count(e.id) AS requeridas,
+           count(e.id) FILTER (WHERE e.estado IN {ENTREGADO_SQL}) AS entregadas,
+           count(e.id) FILTER (WHERE e.estado IN {APROBADO_SQL}) AS aprobadas,
+           count(e.id) FILTER (WHERE e.estado = 'REQUIERE_CORRECCION') AS "correccionesPendientes",
+           count(e.id) FILTER (WHERE e.estado IN {NO_ENTREGADO_SQL}) AS "noEntregados",
+           coalesce(bool_and(e.estado IN {APROBADO_SQL} AND e."fechaSubida" IS NOT NULL
+                             AND (e."fechaLimite" IS NULL OR e."fechaSubida" < date_trunc('day', e."fechaLimite") + interval '1 day')),
+                    true) AS "todasATiempo",
+           sparh.estado::text AS "sparhEstado", sparh.fecha AS "sparhFecha",
+           config."sparhActivo", config."fechaCorte", config."sparhRegistros", config."soloActivos"
+    FROM "Escuela" esc
+    CROSS JOIN config
+    LEFT JOIN requeridas e ON e."escuelaId" = esc.id
+    LEFT JOIN LATERAL (
+        SELECT r.estado, coalesce(r."fechaEntregaPdf", r."fechaSubidaExcel", r."updatedAt") AS fecha
+        FROM "PlantillaPersonalRegistro" r
+        WHERE r."tenantId" = %(tenant)s AND (r."escuelaId" = esc.id OR r."escuelaCCT" = esc.cct)
+        ORDER BY r."escuelaId" = esc.id DESC, r."updatedAt" DESC
+        LIMIT 1
+    ) sparh ON true
+    WHERE NOT esc."esDePrueba" AND NOT esc."esSupervision"
+    GROUP BY esc.id, sparh.estado, sparh.fecha, config."sparhActivo", config."fechaCorte",
+             config."sparhRegistros", config."soloActivos"
+"""
+
+PROGRAMAS_QUERY = """
+    SELECT p.nombre AS programa,
+           count(*) FILTER (WHERE e.estado <> 'EXENTO') AS requeridas,
+           count(*) FILTER (WHERE e.estado IN ('APROBADO', 'ENTREGADO_FISICO')) AS aprobadas,
+           count(*) FILTER (WHERE e.estado = 'EN_REVISION') AS "enRevision",
+           count(*) FILTER (WHERE e.estado = 'REQUIERE_CORRECCION') AS "requiereCorreccion",
+           count(*) FILTER (WHERE e.estado IN ('PENDIENTE', 'NO_ENTREGADO', 'NO_APROBADO')) AS "noEntregados",
+           count(*) FILTER (WHERE e.estado = 'EXENTO') AS exentas
+    FROM "Entrega" e
+    JOIN "PeriodoEntrega" pe ON pe.id = e."periodoEntregaId"
+    JOIN "Programa" p ON p.id = pe."programaId"
+    JOIN "Escuela" esc ON esc.id = e."escuelaId"
+    WHERE pe."cicloEscolarId" = %(ciclo)s AND NOT esc."esDePrueba" AND NOT esc."esSupervision"
+    GROUP BY p.id
+    ORDER BY p.orden, p.nombre
+"""
+
+CORRECCIONES_QUERY = """
+    SELECT esc.cct, esc.nombre AS escuela, coalesce(esc.director, '') AS director, p.nombre AS programa,
+           c.texto AS "ultimaObservacion", c."createdAt" AS "fechaObservacion"
+    FROM "Entrega" e
+    JOIN "PeriodoEntrega" pe ON pe.id = e."periodoEntregaId"
+    JOIN "Programa" p ON p.id = pe."programaId"
+    JOIN "Escuela" esc ON esc.id = e."escuelaId"
+    LEFT JOIN LATERAL (
+        SELECT texto, "createdAt" FROM "Correccion" WHERE "entregaId" = e.id ORDER BY "createdAt" DESC LIMIT 1
+    ) c ON true
+    WHERE pe."cicloEscolarId" = %(ciclo)s AND e.estado = 'REQUIERE_CORRECCION'
+      AND NOT esc."esDePrueba" AND NOT esc."esSupervision"
+    ORDER BY esc.nombre, p.orden, p.nombre
+"""
+
+
+def medalla(cumplimiento, a_tiempo):
+    if cumplimiento == 100 and a_tiempo:
+        return "ORO"
+    if cumplimiento == 100:
+        return "PLATA"
+    if cumplimiento >= 80:
+        return "BRONCE"
+    return "NINGUNA"
+
+
+def orden_ranking(r):
+    return (-MEDALLA_ORDEN[r["medalla"]], -r["cumplimiento"], r["noEntregados"], r["correccionesPendientes"], r["nombre"])
+
+
+def post_cumplimiento(rows, ctx):
+    out = []
+    for r in rows:
+        requeridas = r["requeridas"]
+        cumplimiento = r["aprobadas"] / requeridas * 100 if requeridas else 100
+        out.append({
+            **r,
+            "medalla": medalla(cumplimiento, r["todasATiempo"]),
+            "cumplimiento": round(cumplimiento, 1),
+            "fueraDeTiempo": cumplimiento == 100 and not r["todasATiempo"],
+        })
+    out.sort(key=orden_ranking)
+    columns = ["cct", "nombre", "director", "medalla", "cumplimiento", "requeridas", "aprobadas", "enRevision",
+               "correccionesPendientes", "noEntregados", "fueraDeTiempo"]
+    return columns, out
+
+
+def post_ranking(rows, ctx):
+    # SPARH (PlantillaPersonalRegistro) counts as one more required deliverable
+    out = []
+    for r in rows:
+        r = dict(r)
+        incluir_sparh = r["sparhActivo"] and (
+            not r["soloActivos"] or r["fechaCorte"] is not None or (r["sparhRegistros"] or 0) > 0)
+        sparh_a_tiempo = False
+        if incluir_sparh:
+            r["requeridas"] += 1
+            estado = r["sparhEstado"]
+            if estado in SPARH_APROBADO:
+                r["aprobadas"] += 1
+                r["entregadas"] += 1
+                sparh_a_tiempo = r["fechaCorte"] is None or r["sparhFecha"] <= r["fechaCorte"]
+            elif estado in SPARH_RECIBIDO:
+                r["entregadas"] += 1
+            elif estado in SPARH_CORREGIR:
+                r["entregadas"] += 1
+                r["correccionesPendientes"] += 1
+            else:
+                r["noEntregados"] += 1
+        total = r["requeridas"]
+        a_tiempo = total > 0 and r["todasATiempo"] and (not incluir_sparh or sparh_a_tiempo)
+        cumplimiento = r["aprobadas"] / total * 100 if total else 0
+        r["cumplimiento"] = round(cumplimiento, 1)
+        r["entregadasPorcentaje"] = round(r["entregadas"] / total * 100, 1) if total else 0
+        r["medalla"] = medalla(cumplimiento, a_tiempo) if total else "NINGUNA"
+        out.append(r)
+    out.sort(key=orden_ranking)
+    for i, r in enumerate(out, 1):
+        r["posicion"] = i
+    columns = ["posicion", "cct", "nombre", "zona", "medalla", "cumplimiento", "entregadasPorcentaje", "requeridas",
+               "aprobadas", "entregadas", "correccionesPendientes", "noEntregados"]
+    return columns, out
+
+
+def post_tabla(rows, ctx):
+    # Rows already come shaped and ordered by the query
+    return (list(rows[0].keys()) if rows else []), rows
+
+
+REPORTS = [
+    {"sheet": "Ranking", "query": RANKING_QUERY, "post": post_ranking},
+    {"sheet": "Cumplimiento", "query": CUMPLIMIENTO_QUERY, "post": post_cumplimiento},
+    {"sheet": "Por programa", "query": PROGRAMAS_QUERY, "post": post_tabla},
+    {"sheet": "Correcciones pendientes", "query": CORRECCIONES_QUERY, "post": post_tabla},
+]
+
+
+def run_report(report, ctx):
+    # -> (report, columns, rows, seconds); one pooled connection per report
+    start = time.perf_counter()
+    with sisat_db.pooled_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(report["query"], {"ciclo": ctx["ciclo_id"], "tenant": ctx["tenant"]})
+            rows = cur.fetchall()
+    columns, rows = report["post"](rows, ctx)
+    return report, columns, rows, time.perf_counter() - start
+
+
+def run_reports(reports, ctx, workers=None):
+    # Results come back in REPORTS order, whatever order the queries finish in
+    with ThreadPoolExecutor(max_workers=workers or min(len(reports), sisat_db.POOL_MAX)) as pool:
+        return list(pool.map(lambda rep: run_report(rep, ctx), reports))
+
+
+def _cell(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if hasattr(value, "isoformat"):
+        return value.isoformat(sep=" ", timespec="minutes") if hasattr(value, "hour") else value.isoformat()
+    return str(value)
+
+
+def write_workbook(path, results, ctx):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    wb = xlsxwriter.Workbook(path, {"constant_memory": True})
+    title_fmt = wb.add_format({"bold": True, "font_size": 13, "font_color": "#1E3A8A"})
+    header_fmt = wb.add_format({"bold": True, "font_color": "#FFFFFF", "bg_color": "#1E3A8A", "border": 1,
+                                "text_wrap": True, "valign": "vcenter"})
+    for report, columns, rows, _ in results:
+        ws = wb.add_worksheet(report["sheet"][:31])
+        ws.write(0, 0, f'{report["sheet"]} — Ciclo {ctx["ciclo_nombre"]} ({ctx["fecha"]})', title_fmt)
+        widths = [len(c) for c in columns]
+        for c, name in enumerate(columns):
+            ws.write(2, c, name, header_fmt)
+        for r_idx, row in enumerate(rows, 3):
+            for c, name in enumerate(columns):
+                value = _cell(row[name])
+                ws.write(r_idx, c, value)
+                widths[c] = max(widths[c], len(str(value)) if value is not None else 0)
+        for c, width in enumerate(widths):
+            ws.set_column(c, c, min(width, 60) + 2)
+        if columns:
+            ws.autofilter(2, 0, 2 + len(rows), len(columns) - 1)
+            ws.freeze_panes(3, 0)
+    wb.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera el paquete nocturno de reportes de supervisión en un solo libro")
+    parser.add_argument("--ciclo", help="CicloEscolar.nombre (default: the active cycle)")
+    parser.add_argument("--tenant", default=sisat_db.TENANT_ID, help="tenantId for the SPARH data (default: $TENANT_ID or zona004)")
+    parser.add_argument("--out", help="Output workbook (default: Reporte_Nocturno_<fecha>.xlsx)")
+    parser.add_argument("--workers", type=int, help="Concurrent queries (default: one per report, up to the pool size)")
+    args = parser.parse_args()
+
+    ciclo_id, ciclo_nombre = sisat_db.resolve_ciclo(args.ciclo)
+    ctx = {"ciclo_id": ciclo_id, "ciclo_nombre": ciclo_nombre, "tenant": args.tenant, "fecha": date.today().isoformat()}
+    out = args.out or f"Reporte_Nocturno_{ctx['fecha']}.xlsx"
+
+    start = time.perf_counter()
+    results = run_reports(REPORTS, ctx, args.workers)
+    for report, _, rows, seconds in results:
+        print(f"{report['sheet']}: {len(rows)} filas en {seconds:.2f}s")
+    write_workbook(out, results, ctx)
+    print(f"Reporte nocturno ({time.perf_counter() - start:.2f}s) -> {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,49 +1,272 @@
+"""PreRevision (AI evaluation) report, streamed from the database.
+
+Rows come through a named (server-side) cursor in fixed-size batches and are
+written as they arrive, so memory stays flat regardless of how many
+evaluations have accumulated across cycles.
+
+    python scratch/check_eval_results.py
+    python scratch/check_eval_results.py --format csv --out prerevisiones.csv
+    python scratch/check_eval_results.py --format jsonl --batch-size 5000 > prerevisiones.jsonl
+
+--since-last-run reports only the evaluations created or updated since the
+previous --since-last-run. The high-water mark ("updatedAt", id) of the last
+row reported is kept in a local state file. New rows are found with a keyset
+query over the PreRevision ("updatedAt", id) index, so the periodic check
+costs time in proportion to what changed, not to the whole history:
+
+    python scratch/check_eval_results.py --since-last-run --format jsonl >> prerevisiones.jsonl
+
+--resumen and --intentos classify in Postgres instead and return only
+aggregate rows. --resumen gives counts, failure rate and the latest failure
+per programa, escuela and day. --intentos gives the intentosUsados
+distribution per programa against PreRevisionConfig.limiteIntentos:
+
+    python scratch/check_eval_results.py --resumen --format csv --out resumen.csv
+    python scratch/check_eval_results.py --intentos
+"""
+import argparse
+import csv
+import json
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import sys
+from decimal import Decimal
 
-# Find DATABASE_URL
-env_path = os.path.join(os.path.dirname(__file__), "../.env")
-db_url = None
-if os.path.exists(env_path):
-    with open(env_path, "r", encoding="utf-8") as f:
-        for line in f:
-            if line.startswith("DATABASE_URL="):
-                db_url = line.split("=")[1].strip().strip('"').strip("'")
-                break
+from psycopg2.extras import RealDictCursor
 
-if not db_url:
-    print("DATABASE_URL not found")
-    exit(1)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import sisat_db  # noqa: E402
 
-conn = psycopg2.connect(db_url)
-cur = conn.cursor(cursor_factory=RealDictCursor)
+STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "check_eval_results.state.json")
 
-cur.execute("""
+BASE_QUERY = """
     SELECT pr.id, pr."entregaId", pr."updatedAt", esc.nombre as escuela, prog.nombre as programa, pr.resultado
     FROM "PreRevision" pr
     JOIN "Entrega" ent ON pr."entregaId" = ent.id
     JOIN "Escuela" esc ON ent."escuelaId" = esc.id
     JOIN "PeriodoEntrega" pe ON ent."periodoEntregaId" = pe.id
     JOIN "Programa" prog ON pe."programaId" = prog.id
-    ORDER BY pr."updatedAt" DESC
-""")
-
-rows = cur.fetchall()
-print(f"Total PreRevisions in DB: {len(rows)}")
-for r in rows:
-    res = r["resultado"]
-    status = "N/A"
-    if res:
-        if isinstance(res, dict):
-            status = res.get("explicacion", "N/A")
-            if "Error" in status or "fallaron" in status:
-                status = "❌ ERROR: " + status[:100]
-            else:
-                status = "✅ SUCCESS: " + status[:100]
+"""
+REPORT_QUERY = BASE_QUERY + 'ORDER BY pr."updatedAt" DESC'
+# Oldest first, so the last row streamed is the new watermark
+SINCE_QUERY = BASE_QUERY + """
+    WHERE (pr."updatedAt", pr.id) > (%(updated)s::timestamp, %(id)s)
+    ORDER BY pr."updatedAt", pr.id
+"""
+SINCE_START_QUERY = BASE_QUERY + 'ORDER BY pr."updatedAt", pr.id'
+
+# Same rule as classify(), evaluated server side
+CLASIFICADAS_CTE = """
+    WITH clasificadas AS (
+        SELECT pr."updatedAt", pr."intentosUsados", esc.nombre AS escuela, prog.nombre AS programa,
+               pr.resultado->>'explicacion' AS explicacion,
+               CASE
+                   WHEN jsonb_typeof(pr.resultado) IS DISTINCT FROM 'object' OR pr.resultado = '{}'::jsonb THEN 'N/A'
+                   WHEN strpos(pr.resultado->>'explicacion', 'Error') > 0
+                     OR strpos(pr.resultado->>'explicacion', 'fallaron') > 0 THEN 'ERROR'
+                   ELSE 'SUCCESS'
+               END AS estado
+        FROM "PreRevision" pr
+        JOIN "Entrega" ent ON pr."entregaId" = ent.id
+        JOIN "Escuela" esc ON ent."escuelaId" = esc.id
+        JOIN "PeriodoEntrega" pe ON ent."periodoEntregaId" = pe.id
+        JOIN "Programa" prog ON pe."programaId" = prog.id
+    )
+"""
+RESUMEN_QUERY = CLASIFICADAS_CTE + """
+    SELECT programa, escuela, "updatedAt"::date AS dia,
+           count(*) AS total,
+           count(*) FILTER (WHERE estado = 'ERROR') AS errores,
+           round(100.0 * count(*) FILTER (WHERE estado = 'ERROR') / count(*), 1) AS "tasaError",
+           max("updatedAt") FILTER (WHERE estado = 'ERROR') AS "ultimoError",
+           (array_agg(left(explicacion, 200) ORDER BY "updatedAt" DESC) FILTER (WHERE estado = 'ERROR'))[1]
+               AS "ultimoMensaje"
+    FROM clasificadas
+    GROUP BY programa, escuela, dia
+    ORDER BY dia DESC, programa, escuela
+"""
+# limiteIntentos defaults to 3 when the singleton config row was never created
+INTENTOS_QUERY = CLASIFICADAS_CTE + """
+    SELECT c.programa, c."intentosUsados", cfg.limite AS "limiteIntentos",
+           c."intentosUsados" >= cfg.limite AS agotado,
+           count(*) AS total,
+           count(*) FILTER (WHERE c.estado = 'ERROR') AS errores
+    FROM clasificadas c
+    CROSS JOIN (SELECT coalesce((SELECT "limiteIntentos" FROM "PreRevisionConfig" WHERE id = 'singleton'), 3) AS limite) cfg
+    GROUP BY c.programa, c."intentosUsados", cfg.limite
+    ORDER BY c.programa, c."intentosUsados"
+"""
+CSV_FIELDS = ["id", "entregaId", "updatedAt", "escuela", "programa", "estado", "explicacion"]
+
+
+def classify(res):
+    # -> (estado, explicacion): ERROR when the evaluation reports a failure
+    if not res:
+        return "N/A", ""
+    if isinstance(res, dict):
+        explicacion = res.get("explicacion", "N/A") or "N/A"
+        if "Error" in explicacion or "fallaron" in explicacion:
+            return "ERROR", explicacion
+        return "SUCCESS", explicacion
+    return "N/A", str(res)
+
+
+def load_watermark(path=STATE_PATH):
+    # -> {"updatedAt": iso timestamp, "id": str} or None before the first run
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_watermark(mark, path=STATE_PATH):
+    # Write-then-rename, so an interrupted run leaves the previous mark intact
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(mark, f)
+    os.replace(tmp, path)
+
+
+def iter_rows(conn, batch_size=1000, since=None, full_history=True):
+    # Server-side cursor: the join result stays on the server and is pulled
+    # batch_size rows at a time
+    if since:
+        query, params = SINCE_QUERY, {"updated": since["updatedAt"], "id": since["id"]}
+    else:
+        query, params = (REPORT_QUERY if full_history else SINCE_START_QUERY), None
+    with sisat_db.server_cursor(conn, "prerevision_report", batch_size, RealDictCursor) as cur:
+        cur.execute(query, params)
+        while True:
+            batch = cur.fetchmany(batch_size)
+            if not batch:
+                break
+            yield from batch
+
+
+def write_text(rows, out):
+    n = 0
+    for r in rows:
+        estado, explicacion = classify(r["resultado"])
+        if estado == "ERROR":
+            status = "❌ ERROR: " + explicacion[:100]
+        elif estado == "SUCCESS":
+            status = "✅ SUCCESS: " + explicacion[:100]
         else:
-            status = str(res)[:100]
-    print(f"Escuela: {r['escuela']}, Programa: {r['programa']}, Updated: {r['updatedAt']}, Status: {status}")
+            status = explicacion[:100] or "N/A"
+        out.write(f"Escuela: {r['escuela']}, Programa: {r['programa']}, Updated: {r['updatedAt']}, Status: {status}\n")
+        n += 1
+    return n
+
+
+def write_csv(rows, out):
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    n = 0
+    for r in rows:
+        estado, explicacion = classify(r["resultado"])
+        writer.writerow({
+            "id": r["id"], "entregaId": r["entregaId"], "updatedAt": r["updatedAt"].isoformat(),
+            "escuela": r["escuela"], "programa": r["programa"], "estado": estado, "explicacion": explicacion,
+        })
+        n += 1
+    return n
+
+
+def write_jsonl(rows, out):
+    # Full resultado JSON per line, plus the same estado the other formats report
+    n = 0
+    for r in rows:
+        estado, _ = classify(r["resultado"])
+        record = dict(r, updatedAt=r["updatedAt"].isoformat(), estado=estado)
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        n += 1
+    return n
+
+
+WRITERS = {"text": write_text, "csv": write_csv, "jsonl": write_jsonl}
+
+
+def fetch_aggregate(conn, query):
+    # -> (column names, rows); aggregates are small, so one fetch is enough
+    with conn.cursor() as cur:
+        cur.execute(query)
+        return [c[0] for c in cur.description], cur.fetchall()
+
+
+def _cell(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def write_aggregate(fmt, columns, rows, out):
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        writer.writerows([_cell(v) for v in r] for r in rows)
+    elif fmt == "jsonl":
+        for r in rows:
+            out.write(json.dumps({c: _cell(v) for c, v in zip(columns, r)}, ensure_ascii=False) + "\n")
+    else:
+        text = [[("" if v is None else str(_cell(v))) for v in r] for r in rows]
+        widths = [min(max([len(c)] + [len(r[i]) for r in text]), 60) for i, c in enumerate(columns)]
+        out.write("  ".join(c.ljust(w) for c, w in zip(columns, widths)).rstrip() + "\n")
+        for r in text:
+            out.write("  ".join(v[:w].ljust(w) for v, w in zip(r, widths)).rstrip() + "\n")
+    return len(rows)
+
+
+def track_watermark(rows, mark):
+    # Pass rows through, remembering the ("updatedAt", id) of the last one
+    for r in rows:
+        mark["updatedAt"], mark["id"] = r["updatedAt"].isoformat(), r["id"]
+        yield r
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reporte de PreRevisiones (evaluaciones IA) en streaming")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="text")
+    parser.add_argument("--out", help="Output file (default: stdout)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows fetched per round trip")
+    parser.add_argument("--since-last-run", action="store_true",
+                        help="Only evaluations changed since the previous --since-last-run (oldest first)")
+    parser.add_argument("--state", default=STATE_PATH, help="Watermark file for --since-last-run")
+    agregado = parser.add_mutually_exclusive_group()
+    agregado.add_argument("--resumen", action="store_true",
+                          help="Aggregate counts, failure rate and latest failure per programa, escuela and day")
+    agregado.add_argument("--intentos", action="store_true",
+                          help="intentosUsados distribution per programa against limiteIntentos")
+    args = parser.parse_args()
+    if args.since_last_run and (args.resumen or args.intentos):
+        parser.error("--since-last-run streams rows; it can't be combined with --resumen/--intentos")
+
+    out = open(args.out, "w", newline="", encoding="utf-8") if args.out else sys.stdout
+    try:
+        with sisat_db.pooled_connection() as conn:
+            if args.resumen or args.intentos:
+                columns, rows = fetch_aggregate(conn, RESUMEN_QUERY if args.resumen else INTENTOS_QUERY)
+                n = write_aggregate(args.format, columns, rows, out)
+                print(f"{n} summary rows", file=sys.stderr)
+                return 0
+
+            since = load_watermark(args.state) if args.since_last_run else None
+            mark = {}
+            rows = iter_rows(conn, args.batch_size, since, full_history=not args.since_last_run)
+            n = WRITERS[args.format](track_watermark(rows, mark), out)
+    finally:
+        if args.out:
+            out.close()
+    # Only advance the mark once every row has been written
+    if args.since_last_run and mark:
+        save_watermark(mark, args.state)
+    # Summary goes to stderr so CSV/JSONL on stdout stay clean
+    if args.since_last_run:
+        desde = since["updatedAt"] if since else "the beginning"
+        print(f"PreRevisions changed since {desde}: {n}", file=sys.stderr)
+    else:
+        print(f"Total PreRevisions in DB: {n}", file=sys.stderr)
+    return 0
+
 
-cur.close()
-conn.close()
+if __name__ == "__main__":
+    sys.exit(main())
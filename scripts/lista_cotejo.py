@@ -0,0 +1,231 @@
+"""Parse the Lista de Cotejo de Supervisión EMS workbook into structured JSON.
+
+For every sheet, the header row is found by its labels (indicador/criterio,
+evidencia, puntaje, observaciones). The rows below it become items
+{seccion, fila, indicador, evidencia, puntaje, observaciones}. A row with a
+single text cell outside the indicator column, or merged across columns,
+starts a new section; a lone indicator is an item with empty fields (a blank
+template). A row with no indicator continues the previous item (indicators
+merged over several rows).
+
+Results are cached on disk under the SHA-256 of the workbook, so an
+unchanged file is never parsed twice. Dashboards and AI reviewers can read
+the cached JSON directly:
+
+    python scripts/lista_cotejo.py "Lista_Cotejo_Supervision_EMS (PW SEP2025).xlsx" --out cotejo.json
+    python scripts/lista_cotejo.py listas/ --out-dir listas_json/
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import unicodedata
+from itertools import zip_longest
+
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+
+from read_excel import DEFAULT_PATH, file_sha256, find_workbooks, merged_ranges, sheet_parts
+
+# Bump when the output shape or the parsing rules change; old cache entries are then ignored
+PARSER_VERSION = 3
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "lista_cotejo")
+HEADER_SCAN_ROWS = 30
+FIELD_PATTERNS = {
+    "indicador": re.compile(r"indicador|criterio|aspecto|rasgo|elemento|reactivo"),
+    "evidencia": re.compile(r"evidencia|medio de verificacion|verificacion|documento|soporte"),
+    "puntaje": re.compile(r"puntaje|puntos|puntuacion|valor|calificacion|cumple|si/no|nivel"),
+    "observaciones": re.compile(r"observacion|comentario|recomendacion|nota"),
+}
+MARKS_TRUE = {"si", "sí", "x", "✓", "✔", "cumple"}
+MARKS_FALSE = {"no", "no cumple"}
+
+
+def _norm(value):
+    text = unicodedata.normalize("NFKD", str(value)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def _text(value):
+    return re.sub(r"\s+", " ", str(value)).strip() if value not in (None, "") else ""
+
+
+def find_header(rows, merges=()):
+    # -> (row index, {field: 0-based column}, rows the header spans) or None.
+    # A row that starts a merged range (a group label such as "Evaluación" over
+    # "Puntaje | Observaciones") is also read together with the row below, the
+    # lower label winning wherever there is one; the reading that maps more
+    # fields is kept, so a group label that happens to match a pattern
+    # ("Valoración") doesn't hide the columns under it. If no row qualifies,
+    # every row is tried again with the one below (unmerged two-row headers)
+    merged_rows = {r0 - 1 for r0, _, _, _ in merges}
+    for any_two_rows in (False, True):
+        for i, row in enumerate(rows[:HEADER_SCAN_ROWS]):
+            if not any(v not in (None, "") for v in row):
+                continue
+            two_rows = (any_two_rows or i in merged_rows) and i + 1 < len(rows)
+            best = None
+            for span in ((1, 2) if two_rows else (1,)):
+                below = rows[i + 1] if span == 2 else ()
+                labels = [_norm(b if b not in (None, "") else v if v not in (None, "") else "")
+                          for v, b in zip_longest(row, below)]
+                columns = {}
+                for field, pattern in FIELD_PATTERNS.items():
+                    for c, label in enumerate(labels):
+                        if label and c not in columns.values() and pattern.search(label):
+                            columns[field] = c
+                            break
+                if "indicador" in columns and len(columns) >= 2 and (best is None or len(columns) > len(best[1])):
+                    best = (i, columns, span)
+            if best is not None:
+                return best
+    return None
+
+
+def parse_score(value):
+    # -> (number or None, raw text): numbers as-is, check marks as 1/0
+    if value in (None, ""):
+        return None, ""
+    if isinstance(value, bool):
+        return int(value), str(value)
+    if isinstance(value, (int, float)):
+        return value, str(value)
+    raw = _text(value)
+    mark = raw.lower()
+    if mark in MARKS_TRUE:
+        return 1, raw
+    if mark in MARKS_FALSE:
+        return 0, raw
+    try:
+        return float(raw.replace(",", ".")), raw
+    except ValueError:
+        return None, raw
+
+
+def parse_sheet(ws, path, part):
+    rows = [tuple(r) for r in ws.iter_rows(values_only=True)]
+    merges = merged_ranges(path, part, len(rows))
+    header = find_header(rows, merges)
+    if header is None:
+        return {"hoja": ws.title, "encabezado": None, "total_items": 0, "puntaje_total": None, "items": []}
+    h_idx, columns, span = header
+    # (row, col) 0-based anchors of cells merged across columns: section headings
+    wide = {(r0 - 1, c0 - 1) for r0, c0, _, c1 in merges if c1 > c0}
+
+    def cell(row, field):
+        c = columns.get(field)
+        return row[c] if c is not None and c < len(row) else None
+
+    items = []
+    seccion = None
+    for r_idx in range(h_idx + span, len(rows)):
+        row = rows[r_idx]
+        filled = [c for c, v in enumerate(row) if v not in (None, "")]
+        if not filled:
+            continue
+        indicador = _text(cell(row, "indicador"))
+        evidencia = _text(cell(row, "evidencia"))
+        observaciones = _text(cell(row, "observaciones"))
+        puntaje, puntaje_raw = parse_score(cell(row, "puntaje"))
+        if (len(filled) == 1 and not evidencia and not observaciones and puntaje_raw == ""
+                and (filled[0] != columns.get("indicador") or (r_idx, filled[0]) in wide)):
+            # Section / group label row
+            seccion = _text(row[filled[0]])
+            continue
+        if not indicador:
+            # Continues the previous item; before the first one it is a stray
+            # header or note row, never an item of its own
+            if not items:
+                continue
+            prev = items[-1]
+            for field, value in (("evidencia", evidencia), ("observaciones", observaciones)):
+                if value:
+                    prev[field] = f"{prev[field]} {value}".strip()
+            if prev["puntaje"] is None and puntaje is not None:
+                prev["puntaje"], prev["puntaje_texto"] = puntaje, puntaje_raw
+            continue
+        items.append({
+            "seccion": seccion, "fila": r_idx + 1, "indicador": indicador, "evidencia": evidencia,
+            "puntaje": puntaje, "puntaje_texto": puntaje_raw, "observaciones": observaciones,
+        })
+
+    scores = [i["puntaje"] for i in items if isinstance(i["puntaje"], (int, float))]
+    return {
+        "hoja": ws.title,
+        "encabezado": {"fila": h_idx + 1, "columnas": {f: get_column_letter(c + 1) for f, c in columns.items()}},
+        "total_items": len(items),
+        "puntaje_total": sum(scores) if scores else None,
+        "items": items,
+    }
+
+
+def parse_workbook(path):
+    parts = sheet_parts(path)
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        return [parse_sheet(wb[name], path, parts[name]) for name in wb.sheetnames]
+    finally:
+        wb.close()
+
+
+def load_checklist(path, cache_dir=CACHE_DIR, refresh=False):
+    # -> (result, cached?). Keyed on file content, not name or mtime, so copies
+    # and re-downloads of the same workbook share one entry
+    digest = file_sha256(path)
+    cache_path = os.path.join(cache_dir, f"{digest}.json")
+    if not refresh:
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("version") == PARSER_VERSION:
+                return dict(cached, archivo=os.path.basename(path)), True
+        except (OSError, ValueError):
+            pass
+
+    result = {"version": PARSER_VERSION, "sha256": digest, "archivo": os.path.basename(path),
+              "hojas": parse_workbook(path)}
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = cache_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False)
+    os.replace(tmp, cache_path)
+    return result, False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convierte la Lista de Cotejo de Supervisión EMS a JSON estructurado")
+    parser.add_argument("paths", nargs="*", default=[DEFAULT_PATH], help="Workbooks or folders of .xlsx/.xlsm files")
+    parser.add_argument("--out", help="Write the JSON here (one workbook) instead of stdout")
+    parser.add_argument("--out-dir", help="Write <workbook>.json per workbook into this folder")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Parsed results keyed by SHA-256")
+    parser.add_argument("--refresh", action="store_true", help="Parse again even if the cache has the file")
+    args = parser.parse_args()
+
+    files = find_workbooks(args.paths)
+    if not files:
+        parser.error("no .xlsx/.xlsm workbooks found")
+    if args.out and len(files) > 1:
+        parser.error("--out takes a single workbook; use --out-dir for several")
+
+    for path in files:
+        result, cached = load_checklist(path, args.cache_dir, args.refresh)
+        n_items = sum(len(h["items"]) for h in result["hojas"])
+        print(f"{os.path.basename(path)}: {len(result['hojas'])} hojas, {n_items} indicadores"
+              f" ({'caché' if cached else 'procesado'})", file=sys.stderr)
+        payload = json.dumps(result, ensure_ascii=False, indent=2)
+        if args.out_dir:
+            os.makedirs(args.out_dir, exist_ok=True)
+            target = os.path.join(args.out_dir, os.path.splitext(os.path.basename(path))[0] + ".json")
+        else:
+            target = args.out
+        if target:
+            with open(target, "w", encoding="utf-8") as f:
+                f.write(payload)
+        else:
+            print(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
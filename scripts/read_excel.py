@@ -1,15 +1,196 @@
-import openpyxl
-
-wb = openpyxl.load_workbook(r'c:\NotebookLM\Lista_Cotejo_Supervision_EMS (PW SEP2025).xlsx')
-
-for sheet_name in wb.sheetnames[:3]:
-    ws = wb[sheet_name]
-    print(f'=== Sheet: {sheet_name} ===')
-    print(f'Max row: {ws.max_row}, Max col: {ws.max_column}')
-    for i, row in enumerate(ws.iter_rows(max_row=min(25, ws.max_row))):
-        cells = []
-        for c in row:
-            val = str(c.value)[:50] if c.value is not None else ''
-            cells.append(val)
-        print(f'  Row {i+1}: {cells}')
-    print()
+"""Inspect workbooks without loading them whole.
+
+Each workbook is opened in read_only streaming mode, and reading stops after
+the requested row window. The merged-range scan is the exception: <mergeCells>
+comes after <sheetData>, so it streams through the whole sheet part (skip it
+with --sin-combinadas). For every sheet it reports:
+- the declared shape;
+- the populated column span of each row in the window, and of the window as a
+  whole;
+- the merged ranges that start inside the window (the header structure), with
+  their text;
+- the window rows themselves.
+Folders are expanded to their .xlsx/.xlsm files, which are inspected in a
+process pool:
+
+    python scripts/read_excel.py
+    python scripts/read_excel.py entregas_zona/ --filas 10 --perfil --workers 8
+    python scripts/read_excel.py Lista_Cotejo.xlsx --hojas 3 --json > perfil.json
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import posixpath
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from lxml import etree
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter, range_boundaries
+
+DEFAULT_PATH = r'c:\NotebookLM\Lista_Cotejo_Supervision_EMS (PW SEP2025).xlsx'
+EXTENSIONS = (".xlsx", ".xlsm")
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+MERGE_TAG = f"{{{MAIN_NS}}}mergeCell"
+SHEET_TAG = f"{{{MAIN_NS}}}sheet"
+REL_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+
+
+def find_workbooks(paths):
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files.extend(sorted(f for f in glob.glob(os.path.join(p, "*")) if f.lower().endswith(EXTENSIONS)))
+        else:
+            files.append(p)
+    # Skip Excel lock files left next to open workbooks
+    return [f for f in files if not os.path.basename(f).startswith("~$")]
+
+
+def file_sha256(path):
+    # Hex digest of the file read in 1 MiB chunks, never the whole workbook at once
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def sheet_parts(path):
+    # -> {sheet name: zip member of its worksheet part}, from xl/workbook.xml
+    # and its relationships
+    with zipfile.ZipFile(path) as zf:
+        workbook = etree.fromstring(zf.read("xl/workbook.xml"))
+        rels = etree.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get("Id"): rel.get("Target") for rel in rels}
+    parts = {}
+    for sheet in workbook.iter(SHEET_TAG):
+        target = targets[sheet.get(REL_ID)]
+        # Targets are relative to xl/ unless absolute ("/xl/worksheets/sheet1.xml")
+        parts[sheet.get("name")] = target[1:] if target.startswith("/") else posixpath.normpath(f"xl/{target}")
+    return parts
+
+
+def merged_ranges(path, part, max_row):
+    # Read-only sheets don't expose merged_cells. <mergeCells> sits after
+    # <sheetData>, so the whole sheet part is streamed with iterparse (not just
+    # the first max_row rows), dropping every element as soon as it is seen.
+    # -> [(min_row, min_col, max_row, max_col)] of ranges starting by max_row
+    ranges = []
+    with zipfile.ZipFile(path) as zf, zf.open(part) as source:
+        for _, el in etree.iterparse(source, events=("end",)):
+            if el.tag == MERGE_TAG:
+                min_col, min_row, max_col, last_row = range_boundaries(el.get("ref"))
+                if min_row <= max_row:
+                    ranges.append((min_row, min_col, last_row, max_col))
+            el.clear()
+            while el.getprevious() is not None:
+                del el.getparent()[0]
+    return ranges
+
+
+def profile_sheet(ws, n_rows, width, merged=()):
+    rows = []
+    spans = []
+    first_col = last_col = None
+    for values in ws.iter_rows(max_row=n_rows, values_only=True):
+        filled = [i for i, v in enumerate(values, 1) if v not in (None, "")]
+        if filled:
+            spans.append((filled[0], filled[-1]))
+            first_col = filled[0] if first_col is None else min(first_col, filled[0])
+            last_col = filled[-1] if last_col is None else max(last_col, filled[-1])
+        else:
+            spans.append(None)
+        rows.append(["" if v is None else str(v)[:width] for v in values])
+
+    merges = []
+    for min_row, min_col, max_row, max_col in sorted(merged):
+        row = rows[min_row - 1] if min_row <= len(rows) else []
+        text = row[min_col - 1] if min_col <= len(row) else ""
+        merges.append({
+            "rango": f"{get_column_letter(min_col)}{min_row}:{get_column_letter(max_col)}{max_row}",
+            "filas": max_row - min_row + 1, "columnas": max_col - min_col + 1, "texto": text,
+        })
+
+    return {
+        "hoja": ws.title,
+        # Declared <dimension>; absent or stale in some generated files
+        "max_row": ws.max_row,
+        "max_col": ws.max_column,
+        "columnas_pobladas": (f"{get_column_letter(first_col)}:{get_column_letter(last_col)}"
+                              if first_col is not None else None),
+        "spans": [f"{get_column_letter(s[0])}:{get_column_letter(s[1])}" if s else None for s in spans],
+        "encabezados_combinados": merges,
+        "filas": rows,
+    }
+
+
+def inspect_workbook(job):
+    path, n_rows, n_sheets, width, include_merges = job
+    try:
+        wb = load_workbook(path, read_only=True, data_only=True)
+    except Exception as e:
+        return {"archivo": path, "error": str(e), "hojas": []}
+    try:
+        names = wb.sheetnames[:n_sheets] if n_sheets else wb.sheetnames
+        parts = sheet_parts(path) if include_merges else {}
+        sheets = [profile_sheet(wb[name], n_rows, width, merged_ranges(path, parts[name], n_rows) if parts else ())
+                  for name in names]
+        return {"archivo": path, "total_hojas": len(wb.sheetnames), "hojas": sheets}
+    finally:
+        wb.close()
+
+
+def print_report(result, show_rows=True):
+    print(f"##### {result['archivo']}")
+    if result.get("error"):
+        print(f"  ERROR: {result['error']}\n")
+        return
+    for sheet in result["hojas"]:
+        print(f"=== Sheet: {sheet['hoja']} ===")
+        print(f"Max row: {sheet['max_row']}, Max col: {sheet['max_col']}, "
+              f"Populated columns (first {len(sheet['filas'])} rows): {sheet['columnas_pobladas'] or '-'}")
+        for m in sheet["encabezados_combinados"]:
+            print(f"  Merged {m['rango']} ({m['filas']}x{m['columnas']}): {m['texto']}")
+        if show_rows:
+            for i, (cells, span) in enumerate(zip(sheet["filas"], sheet["spans"]), 1):
+                print(f"  Row {i} [{span or '-'}]: {cells}")
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspecciona libros de Excel en modo streaming (forma, columnas y encabezados combinados)")
+    parser.add_argument("paths", nargs="*", default=[DEFAULT_PATH], help="Workbooks or folders of .xlsx/.xlsm files")
+    parser.add_argument("--filas", type=int, default=25, help="Rows read per sheet (the window)")
+    parser.add_argument("--hojas", type=int, help="Only the first N sheets of each workbook")
+    parser.add_argument("--ancho", type=int, default=50, help="Characters kept per cell")
+    parser.add_argument("--perfil", action="store_true", help="Profile only; don't print the window rows")
+    parser.add_argument("--sin-combinadas", action="store_true", help="Skip the merged-range scan (reads only the window)")
+    parser.add_argument("--json", action="store_true", help="Print one JSON document instead of text")
+    parser.add_argument("--workers", type=int, help="Worker processes for several workbooks (default: CPU count)")
+    args = parser.parse_args()
+
+    files = find_workbooks(args.paths)
+    if not files:
+        parser.error("no .xlsx/.xlsm workbooks found")
+    jobs = [(f, args.filas, args.hojas, args.ancho, not args.sin_combinadas) for f in files]
+    if len(jobs) == 1:
+        results = [inspect_workbook(jobs[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(inspect_workbook, jobs))
+
+    if args.json:
+        json.dump(results, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        for result in results:
+            print_report(result, show_rows=not args.perfil)
+    return 1 if any(r.get("error") for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""Shared database access for the Python tooling.
+
+Settings are resolved once per process. Connections come from a thread-safe
+pool, so batch jobs that run many queries, or serve many threads, reuse open
+connections instead of paying TCP+TLS+auth setup for every query:
+
+    with sisat_db.pooled_connection() as conn:
+        for row in sisat_db.stream(conn, "SELECT ...", name="reporte"):
+            ...
+
+connect() still opens a standalone connection for callers that manage their
+own lifetime.
+"""
+import atexit
+import csv
+import io
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+ENV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+POOL_MIN = 1
+POOL_MAX = int(os.environ.get("SISAT_DB_POOL_MAX", "8"))
+TENANT_ID = os.environ.get("TENANT_ID", "zona004")
+
+CICLO_ACTIVO_QUERY = 'SELECT id, nombre FROM "CicloEscolar" WHERE activo ORDER BY inicio DESC LIMIT 1'
+CICLO_NOMBRE_QUERY = 'SELECT id, nombre FROM "CicloEscolar" WHERE nombre = %s'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_database_url():
+    # The process environment wins over the project's .env file
+    db_url = os.environ.get("DATABASE_URL")
+    if db_url:
+        return db_url
+    if os.path.exists(ENV_PATH):
+        with open(ENV_PATH, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("DATABASE_URL="):
+                    # Split once: the URL itself carries "=" in its query string (?sslmode=require)
+                    return line.split("=", 1)[1].strip().strip('"').strip("'")
+    return None
+
+
+def _require_url():
+    db_url = get_database_url()
+    if not db_url:
+        raise RuntimeError("DATABASE_URL not found")
+    return db_url
+
+
+def connect():
+    return psycopg2.connect(_require_url())
+
+
+def get_pool():
+    # Created on first use; safe to call from several threads at once
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(POOL_MIN, POOL_MAX, _require_url())
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+atexit.register(close_pool)
+
+
+@contextmanager
+def pooled_connection():
+    # Commits on success and rolls back on error, like "with conn:", then hands
+    # the connection back to the pool. A broken connection is discarded
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))
+
+
+@contextmanager
+def server_cursor(conn, name, itersize=2000, cursor_factory=None):
+    # Named cursor: the result set stays on the server and is pulled itersize
+    # rows per round trip while iterating
+    cur = conn.cursor(name=name, cursor_factory=cursor_factory)
+    cur.itersize = itersize
+    try:
+        yield cur
+    finally:
+        cur.close()
+
+
+def stream(conn, query, params=None, name="sisat_stream", itersize=2000, cursor_factory=None):
+    with server_cursor(conn, name, itersize, cursor_factory) as cur:
+        cur.execute(query, params)
+        yield from cur
+
+
+def copy_rows(cur, table, columns, rows):
+    # Bulk load through COPY ... FROM STDIN (CSV); rows are sequences in column
+    # order, None becomes NULL. Returns the number of rows sent
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    n = 0
+    for row in rows:
+        writer.writerow(["\\N" if v is None else v for v in row])
+        n += 1
+    buf.seek(0)
+    cols = ", ".join(f'"{c}"' for c in columns)
+    cur.copy_expert(f"COPY {table} ({cols}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buf)
+    return n
+
+
+def new_id():
+    # @default(cuid()) is filled in by Prisma Client, so raw inserts bring their own id
+    return "c" + uuid.uuid4().hex[:24]
+
+
+def resolve_ciclo(nombre=None, cur=None):
+    # -> (id, nombre) of the named cycle, or of the active one. On cur when given
+    # (inside the caller's transaction), otherwise on a pooled connection
+    if cur is None:
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                return resolve_ciclo(nombre, cur)
+    if nombre:
+        cur.execute(CICLO_NOMBRE_QUERY, (nombre,))
+    else:
+        cur.execute(CICLO_ACTIVO_QUERY)
+    row = cur.fetchone()
+    if not row:
+        raise RuntimeError(f"Ciclo escolar no encontrado: {nombre or '(activo)'}")
+    return row
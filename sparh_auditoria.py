@@ -0,0 +1,529 @@
+"""Zone-wide SPARH staff audit: every school's plantilla checked against all the others.
+
+The per-file rules are a Python port of parsearYValidarPlantillaExcel
+(src/lib/plantillas-sparh/sparh-engine.ts). It finds the header by its labels
+and reports empty names/ids, people repeated in the sheet, hours above
+maxHorasJornadaDocente and a full-time post held together with another one.
+The workbooks are read in read-only streaming mode, one per worker process.
+
+The audit then builds one in-memory index of the whole tenant on RFC and
+CURP. A person listed by RFC in one sheet and by CURP in another is still
+one person. Everyone who holds posts in two or more schools has their hours
+summed across schools, and the same compatibility rules are applied. This
+is one pass, not one PlantillaDetallePlaza query per teacher.
+
+Without workbooks, the latest plantilla of each school is audited straight
+from the database. esIncompatible is then updated, and the audit's
+PlantillaInconsistencia rows are replaced, each with a single COPY:
+
+    python sparh_auditoria.py --dry-run --out auditoria_sparh.csv
+    python sparh_auditoria.py sabanas_sparh/ --max-horas 42 --out auditoria_sparh.csv
+    python sparh_auditoria.py sabanas_sparh/ --guardar
+
+--guardar first registers the workbooks as the upload route does
+(PlantillaPersonalRegistro + plazas + the per-file inconsistencies), skipping
+files already uploaded. It then runs the database audit.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from openpyxl import load_workbook
+
+import sisat_db
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+from read_excel import file_sha256, find_workbooks  # noqa: E402
+
+# Marks the PlantillaInconsistencia rows this audit owns, so a re-run replaces them
+ORIGEN = "auditoria_zona"
+HEADER_WORDS = ("RFC", "CURP", "NOMBRE", "CCT", "FUNCION", "CLAVE")
+HOURS_WORDS = ("HORAS", "HRS", "HORARIO", "H.S.M", "HSM", "CARGA")
+FULL_TIME_WORDS = ("DIRECTOR", "SUPERVISOR", "COMPLETO")
+FALLBACK_COLUMNS = {"nombre": 1, "cct": 2, "funcion": 3, "rfc": 4, "curp": 5, "horas": 6}
+CCT_RE = re.compile(r"21[A-Z0-9]{8}")
+NUMBER_RE = re.compile(r"\d+\.?\d*|\.\d+")
+REPORT_FIELDS = ["archivo", "registro", "escuelaCCT", "tipoInconsistencia", "severidad", "filaNumero",
+                 "columnaCampo", "valorEncontrado", "descripcion"]
+
+CONFIG_QUERY = """
+    SELECT "maxHorasJornadaDocente", "permitirDoblePlaza" FROM "PlantillaCorteConfig" WHERE "tenantId" = %s
+"""
+# The latest plantilla with data per school; older uploads are superseded
+PLAZAS_QUERY = """
+    WITH ultimos AS (
+        SELECT DISTINCT ON (coalesce(r."escuelaId", r."escuelaCCT", r.id)) r.id, r."escuelaCCT"
+        FROM "PlantillaPersonalRegistro" r
+        WHERE r."tenantId" = %(tenant)s AND r."totalRegistros" > 0
+        ORDER BY coalesce(r."escuelaId", r."escuelaCCT", r.id), r."createdAt" DESC
+    )
+    SELECT u.id, u."escuelaCCT", p.id, p."escuelaCCT", p.rfc, p.curp, p."nombreDocente", p.funcion,
+           p."horasAsignadas", p."esIncompatible"
+    FROM ultimos u
+    JOIN "PlantillaDetallePlaza" p ON p."plantillaRegistroId" = u.id
+    ORDER BY u.id, p."createdAt", p.id
+"""
+SUBIDOS_QUERY = 'SELECT "sha256Hash" FROM "PlantillaPersonalRegistro" WHERE "tenantId" = %s AND "sha256Hash" = ANY(%s)'
+DELETE_AUDIT_QUERY = f"""
+    DELETE FROM "PlantillaInconsistencia" WHERE "tenantId" = %s AND detalles->>'origen' = '{ORIGEN}'
+"""
+FLAGS_DDL = "CREATE TEMP TABLE _sparh_flags (id text PRIMARY KEY, incompatible boolean) ON COMMIT DROP"
+FLAGS_UPDATE = """
+    UPDATE "PlantillaDetallePlaza" p SET "esIncompatible" = f.incompatible
+    FROM _sparh_flags f WHERE p.id = f.id
+"""
+REGISTRO_COLUMNS = ["id", "tenantId", "escuelaCCT", "nombreArchivo", "sha256Hash", "excelNombre", "fechaSubidaExcel",
+                    "totalRegistros", "totalHoras", "estado", "metadatos", "updatedAt"]
+PLAZA_COLUMNS = ["id", "tenantId", "plantillaRegistroId", "escuelaCCT", "rfc", "curp", "nombreDocente", "clavePlaza",
+                 "funcion", "horasAsignadas", "tipoJornada", "esIncompatible"]
+INCONSISTENCIA_COLUMNS = ["id", "tenantId", "plantillaRegistroId", "escuelaCCT", "tipoInconsistencia", "severidad",
+                          "filaNumero", "columnaCampo", "valorEncontrado", "descripcion", "detalles"]
+
+
+def _n(x):
+    # Number as JavaScript prints it in the messages: 40, not 40.0
+    return int(x) if float(x).is_integer() else x
+
+
+def normalizar(value):
+    # normalizarTexto: trim, upper case, accents removed
+    if value is None:
+        return ""
+    text = unicodedata.normalize("NFD", str(value).strip().upper())
+    return "".join(ch for ch in text if not "\u0300" <= ch <= "\u036f")
+
+
+def parse_horas(value):
+    # Numbers as-is; text keeps its digits and dots and is read like parseFloat
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if not value:
+        return 0.0
+    m = NUMBER_RE.match(re.sub(r"[^0-9.]", "", str(value)))
+    return float(m.group(0)) if m else 0.0
+
+
+def es_tiempo_completo(funcion):
+    return any(w in funcion for w in FULL_TIME_WORDS)
+
+
+# ── Per-file parsing ────────────────────────────────────────────────────────
+
+def find_columns(rows):
+    # -> (header row number, {field: column}); rows come padded so columns are 1-based like ExcelJS row.values
+    for fila, values in rows:
+        labels = [normalizar(v) for v in values]
+        if not any(w in " | ".join(labels) for w in HEADER_WORDS):
+            continue
+        columns = {}
+        for c, norm in enumerate(labels):
+            if "RFC" in norm:
+                columns["rfc"] = c
+            elif "CURP" in norm:
+                columns["curp"] = c
+            elif "NOMBRE" in norm or "DOCENTE" in norm or "PERSONAL" in norm:
+                columns["nombre"] = c
+            elif "PATERNO" in norm:
+                columns.setdefault("paterno", c)
+            elif "MATERNO" in norm:
+                columns.setdefault("materno", c)
+            elif "CCT" in norm or "CENTRO DE TRABAJO" in norm:
+                columns["cct"] = c
+            elif "CLAVE" in norm or "PRESUPUESTAL" in norm:
+                columns["clavePlaza"] = c
+            elif "FUNCION" in norm or "PUESTO" in norm:
+                columns["funcion"] = c
+            elif any(w in norm for w in HOURS_WORDS):
+                columns["horas"] = c
+            elif "JORNADA" in norm or "TIPO" in norm:
+                columns["jornada"] = c
+        return fila, columns
+    return None
+
+
+def validate_people(personas, config):
+    # The per-file "global" rules over {key: {count, filas, horasTotal, plazaFullTime}}
+    out = []
+    limite = config["maxHorasJornadaDocente"]
+    for key, data in personas.items():
+        if data["count"] > 1:
+            out.append({
+                "tipoInconsistencia": "DUPLICADO_RFC", "severidad": "ADVERTENCIA", "filaNumero": data["filas"][0],
+                "columnaCampo": "RFC/CURP", "valorEncontrado": key,
+                "descripcion": f"El docente con identificador {key} aparece registrado {data['count']} veces "
+                               f"en las filas [{', '.join(map(str, data['filas']))}].",
+                "detalles": {"filas": data["filas"], "identificador": key},
+            })
+        if data["horasTotal"] > limite:
+            out.append({
+                "tipoInconsistencia": "EXCESO_HORAS", "severidad": "ERROR_CRITICO", "filaNumero": data["filas"][0],
+                "columnaCampo": "Horas Asignadas", "valorEncontrado": f"{_n(data['horasTotal'])} hrs",
+                "descripcion": f"El docente {key} acumula un total de {_n(data['horasTotal'])} horas, superando el "
+                               f"límite legal configurado ({_n(limite)} hrs).",
+                "detalles": {"horasAcumuladas": _n(data["horasTotal"]), "limiteLegal": _n(limite)},
+            })
+        if data["count"] > 1 and data["plazaFullTime"] and not config["permitirDoblePlaza"]:
+            out.append({
+                "tipoInconsistencia": "INCOMPATIBILIDAD_PLAZA", "severidad": "ERROR_CRITICO",
+                "filaNumero": data["filas"][0], "columnaCampo": "Función", "valorEncontrado": key,
+                "descripcion": f"El docente {key} ostenta una plaza de Tiempo Completo / Dirección y tiene cargos "
+                               f"o plazas adicionales no compatibles.",
+                "detalles": {"identificador": key},
+            })
+    return out
+
+
+def parse_plantilla(job):
+    """One SPARH workbook -> {archivo, sha256, escuelaCCT, totalRegistros, totalHoras, plazas, inconsistencias}."""
+    path, config = job
+    archivo = os.path.basename(path)
+    sha256 = file_sha256(path)
+    try:
+        wb = load_workbook(path, read_only=True, data_only=True)
+    except Exception as e:
+        return {"archivo": archivo, "sha256": sha256, "error": str(e)}
+    try:
+        ws = wb[wb.sheetnames[0]]
+        # ExcelJS eachRow skips rows with no values; (None,) pads column 0 so indexes stay 1-based
+        rows = [(fila, (None,) + values) for fila, values in enumerate(ws.iter_rows(values_only=True), 1)
+                if any(v is not None for v in values)]
+    finally:
+        wb.close()
+
+    header = find_columns(rows)
+    header_fila, columns = header if header else (1, dict(FALLBACK_COLUMNS))
+    inconsistencias = []
+    if "horas" not in columns:
+        inconsistencias.append({
+            "tipoInconsistencia": "CAMPO_VACIO", "severidad": "INFO", "filaNumero": header_fila,
+            "columnaCampo": "Horas", "valorEncontrado": "Ausente",
+            "descripcion": "Archivo sin columna de horas — no parece sábana de plantillas SPARH",
+        })
+
+    def cell(values, field):
+        c = columns.get(field)
+        return values[c] if c is not None and c < len(values) else None
+
+    plazas, personas, detected = [], {}, ""
+    for fila, values in rows:
+        if fila <= header_fila:
+            continue
+        nombre = normalizar(cell(values, "nombre"))
+        paterno = normalizar(cell(values, "paterno"))
+        materno = normalizar(cell(values, "materno"))
+        rfc, curp = normalizar(cell(values, "rfc")), normalizar(cell(values, "curp"))
+        cct = normalizar(cell(values, "cct"))
+        clave, funcion = normalizar(cell(values, "clavePlaza")), normalizar(cell(values, "funcion"))
+        horas = parse_horas(cell(values, "horas"))
+        completo = f"{paterno} {materno} {nombre}".strip() if paterno or materno else nombre
+        if not completo and not rfc and not curp and not cct:
+            continue
+        detected = detected or cct
+
+        if not completo:
+            inconsistencias.append({
+                "tipoInconsistencia": "CAMPO_VACIO", "severidad": "ERROR_CRITICO", "filaNumero": fila,
+                "columnaCampo": "Nombre", "valorEncontrado": "",
+                "descripcion": f"El nombre del personal en la fila {fila} está vacío.",
+            })
+        if not rfc and not curp:
+            inconsistencias.append({
+                "tipoInconsistencia": "CAMPO_VACIO", "severidad": "ADVERTENCIA", "filaNumero": fila,
+                "columnaCampo": "RFC/CURP", "valorEncontrado": "",
+                "descripcion": f"El registro en fila {fila} ({completo or 'Sin Nombre'}) no cuenta con RFC ni CURP.",
+            })
+        key = rfc or curp or completo
+        if key:
+            p = personas.setdefault(key, {"count": 0, "filas": [], "horasTotal": 0.0, "plazaFullTime": False})
+            p["count"] += 1
+            p["filas"].append(fila)
+            p["horasTotal"] += horas
+            p["plazaFullTime"] = p["plazaFullTime"] or es_tiempo_completo(funcion)
+        plazas.append({
+            "nombreDocente": completo, "rfc": rfc, "curp": curp, "escuelaCCT": cct or detected,
+            "clavePlaza": clave, "funcion": funcion or "DOCENTE", "horasAsignadas": horas,
+            "tipoJornada": "TIEMPO_COMPLETO" if "DIRECTOR" in funcion else "HORAS", "fila": fila,
+        })
+
+    inconsistencias.extend(validate_people(personas, config))
+    if len(plazas) < 5:
+        inconsistencias.append({
+            "tipoInconsistencia": "CAMPO_VACIO", "severidad": "INFO", "filaNumero": 0,
+            "columnaCampo": "Filas Datos", "valorEncontrado": f"{len(plazas)} filas",
+            "descripcion": "Archivo con menos de 5 filas de datos — archivo sin datos o layout de estructura",
+        })
+    if not detected:
+        # The upload form supplies the school; in a batch, fall back to a CCT in the file name
+        m = CCT_RE.search(archivo.upper())
+        detected = m.group(0) if m else ""
+    return {
+        "archivo": archivo, "sha256": sha256, "escuelaCCT": detected, "totalRegistros": len(plazas),
+        "totalHoras": sum(p["horasAsignadas"] for p in plazas), "plazas": plazas, "inconsistencias": inconsistencias,
+    }
+
+
+def parse_folder(paths, config, workers=None):
+    jobs = [(f, config) for f in find_workbooks(paths)]
+    if len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(parse_plantilla, jobs))
+    return [parse_plantilla(j) for j in jobs]
+
+
+# ── Tenant-wide index ───────────────────────────────────────────────────────
+
+def index_people(plazas):
+    """Group plazas into people via a hash index on RFC and on CURP.
+
+    Two plazas are the same person when they share an RFC or a CURP, directly
+    or through a chain (union-find over the index buckets). -> [[plaza index]].
+    """
+    parent = list(range(len(plazas)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for field in ("rfc", "curp"):
+        first = {}
+        for i, p in enumerate(plazas):
+            value = p[field]
+            if not value:
+                continue
+            j = first.setdefault(value, i)
+            if j != i:
+                parent[find(i)] = find(j)
+
+    groups = defaultdict(list)
+    for i, p in enumerate(plazas):
+        if p["rfc"] or p["curp"]:
+            groups[find(i)].append(i)
+    return list(groups.values())
+
+
+def audit_tenant(fuentes, plazas, config):
+    """Cross-school compatibility over every plantilla of the tenant.
+
+    fuentes: [{archivo, registro, escuelaCCT}], one per plantilla. plazas:
+    [{fuente, rfc, curp, nombreDocente, funcion, horasAsignadas, fila, ...}].
+    -> (inconsistencias, each with its fuente; esIncompatible per plaza)
+    """
+    limite = config["maxHorasJornadaDocente"]
+    incompatible = [False] * len(plazas)
+    out = []
+    for group in index_people(plazas):
+        horas = sum(plazas[i]["horasAsignadas"] for i in group)
+        completo = any(es_tiempo_completo(plazas[i]["funcion"] or "") for i in group)
+        exceso = horas > limite
+        doble = len(group) > 1 and completo and not config["permitirDoblePlaza"]
+        if not (exceso or doble):
+            continue
+        for i in group:
+            incompatible[i] = True
+
+        por_fuente = defaultdict(list)
+        for i in group:
+            por_fuente[plazas[i]["fuente"]].append(i)
+        if len(por_fuente) < 2:
+            # Single plantilla: the per-file rules already report it
+            continue
+        first = plazas[group[0]]
+        key = next((plazas[i]["rfc"] for i in group if plazas[i]["rfc"]), "") or first["curp"]
+        planteles = [{"escuelaCCT": fuentes[f]["escuelaCCT"],
+                      "horas": _n(sum(plazas[i]["horasAsignadas"] for i in idx)),
+                      "funciones": sorted({plazas[i]["funcion"] or "DOCENTE" for i in idx}),
+                      "filas": [plazas[i]["fila"] for i in idx if plazas[i]["fila"] is not None]}
+                     for f, idx in por_fuente.items()]
+        lista = ", ".join(p["escuelaCCT"] or "?" for p in planteles)
+        detalles = {"origen": ORIGEN, "identificador": key, "nombreDocente": first["nombreDocente"],
+                    "planteles": planteles}
+        for f, idx in por_fuente.items():
+            fila = plazas[idx[0]]["fila"]
+            if exceso:
+                out.append({
+                    "fuente": f, "tipoInconsistencia": "EXCESO_HORAS", "severidad": "ERROR_CRITICO",
+                    "filaNumero": fila, "columnaCampo": "Horas Asignadas", "valorEncontrado": f"{_n(horas)} hrs",
+                    "descripcion": f"El docente {key} acumula un total de {_n(horas)} horas entre "
+                                   f"{len(planteles)} planteles ({lista}), superando el límite legal configurado "
+                                   f"({_n(limite)} hrs).",
+                    "detalles": dict(detalles, horasAcumuladas=_n(horas), limiteLegal=_n(limite)),
+                })
+            if doble:
+                out.append({
+                    "fuente": f, "tipoInconsistencia": "INCOMPATIBILIDAD_PLAZA", "severidad": "ERROR_CRITICO",
+                    "filaNumero": fila, "columnaCampo": "Función", "valorEncontrado": key,
+                    "descripcion": f"El docente {key} ostenta una plaza de Tiempo Completo / Dirección y tiene "
+                                   f"plazas en otros planteles ({lista}) no compatibles.",
+                    "detalles": detalles,
+                })
+    return out, incompatible
+
+
+# ── Database ────────────────────────────────────────────────────────────────
+
+def load_config(conn, tenant):
+    # Same defaults as the upload route (a 0 limit falls back to 40 there too)
+    with conn.cursor() as cur:
+        cur.execute(CONFIG_QUERY, (tenant,))
+        row = cur.fetchone()
+    return {"maxHorasJornadaDocente": (row and row[0]) or 40, "permitirDoblePlaza": bool(row and row[1])}
+
+
+def load_db_plantillas(conn, tenant):
+    # -> (fuentes, plazas, plaza ids, stored esIncompatible)
+    fuentes, plazas, ids, flags, pos = [], [], [], [], {}
+    for reg_id, reg_cct, plaza_id, cct, rfc, curp, nombre, funcion, horas, flag in sisat_db.stream(
+            conn, PLAZAS_QUERY, {"tenant": tenant}, name="sparh_auditoria", itersize=5000):
+        f = pos.get(reg_id)
+        if f is None:
+            f = pos[reg_id] = len(fuentes)
+            fuentes.append({"archivo": None, "registro": reg_id, "escuelaCCT": reg_cct or cct or ""})
+        plazas.append({"fuente": f, "rfc": normalizar(rfc), "curp": normalizar(curp), "nombreDocente": nombre,
+                       "funcion": funcion or "", "horasAsignadas": horas or 0.0, "fila": None})
+        ids.append(plaza_id)
+        flags.append(flag)
+    return fuentes, plazas, ids, flags
+
+
+def save_audit(conn, tenant, fuentes, inconsistencias, ids, flags, incompatible):
+    # -> (plazas whose esIncompatible changed, inconsistencias inserted)
+    with conn.cursor() as cur:
+        cur.execute(FLAGS_DDL)
+        changed = sisat_db.copy_rows(cur, "_sparh_flags", ["id", "incompatible"], (
+            (plaza_id, new) for plaza_id, old, new in zip(ids, flags, incompatible) if old != new))
+        cur.execute(FLAGS_UPDATE)
+        cur.execute(DELETE_AUDIT_QUERY, (tenant,))
+        inserted = sisat_db.copy_rows(cur, '"PlantillaInconsistencia"', INCONSISTENCIA_COLUMNS, (
+            (sisat_db.new_id(), tenant, fuentes[inc["fuente"]]["registro"], fuentes[inc["fuente"]]["escuelaCCT"] or None,
+             inc["tipoInconsistencia"], inc["severidad"], inc["filaNumero"], inc["columnaCampo"],
+             inc["valorEncontrado"], inc["descripcion"], json.dumps(inc["detalles"], ensure_ascii=False))
+            for inc in inconsistencias))
+    return changed, inserted
+
+
+def register_workbooks(conn, tenant, results):
+    # What the upload route stores for an Excel-only upload, in three COPYs.
+    # Files whose SHA-256 is already registered for the tenant are skipped
+    with conn.cursor() as cur:
+        cur.execute(SUBIDOS_QUERY, (tenant, [r["sha256"] for r in results]))
+        subidos = {row[0] for row in cur.fetchall()}
+        nuevos, vistos = [], set()
+        for r in results:
+            if r["sha256"] not in subidos and r["sha256"] not in vistos:
+                vistos.add(r["sha256"])
+                nuevos.append(dict(r, id=sisat_db.new_id()))
+        # Prisma keeps DateTime columns in UTC
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+        sisat_db.copy_rows(cur, '"PlantillaPersonalRegistro"', REGISTRO_COLUMNS, (
+            (r["id"], tenant, r["escuelaCCT"] or None, r["archivo"], r["sha256"], r["archivo"], now,
+             r["totalRegistros"], r["totalHoras"],
+             "CON_ERRORES" if any(i["severidad"] == "ERROR_CRITICO" for i in r["inconsistencias"]) else "RECIBIDO",
+             json.dumps({"fechaCarga": now, "tienePdf": False, "tieneExcel": True,
+                         "totalInconsistencias": len(r["inconsistencias"]), "origen": ORIGEN}), now)
+            for r in nuevos))
+        sisat_db.copy_rows(cur, '"PlantillaDetallePlaza"', PLAZA_COLUMNS, (
+            (sisat_db.new_id(), tenant, r["id"], p["escuelaCCT"] or r["escuelaCCT"] or None, p["rfc"], p["curp"],
+             p["nombreDocente"], p["clavePlaza"], p["funcion"], p["horasAsignadas"], p["tipoJornada"], False)
+            for r in nuevos for p in r["plazas"]))
+        sisat_db.copy_rows(cur, '"PlantillaInconsistencia"', INCONSISTENCIA_COLUMNS, (
+            (sisat_db.new_id(), tenant, r["id"], r["escuelaCCT"] or None, i["tipoInconsistencia"], i["severidad"],
+             i["filaNumero"], i["columnaCampo"], i["valorEncontrado"], i["descripcion"],
+             json.dumps(i["detalles"], ensure_ascii=False) if "detalles" in i else None)
+            for r in nuevos for i in r["inconsistencias"]))
+    return len(nuevos)
+
+
+# ── Output ──────────────────────────────────────────────────────────────────
+
+def write_report(path, rows):
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def report_rows(fuentes, inconsistencias):
+    rows = []
+    for inc in inconsistencias:
+        fuente = fuentes[inc["fuente"]]
+        rows.append(dict(inc, archivo=fuente["archivo"] or "", registro=fuente["registro"] or "",
+                         escuelaCCT=fuente["escuelaCCT"]))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audita las plantillas SPARH de toda la zona con un índice de RFC/CURP")
+    parser.add_argument("paths", nargs="*", help="SPARH workbooks or folders; without them, the database is audited")
+    parser.add_argument("--tenant", default=sisat_db.TENANT_ID, help="tenantId (default: $TENANT_ID or zona004)")
+    parser.add_argument("--max-horas", type=float, help="maxHorasJornadaDocente (default: PlantillaCorteConfig)")
+    parser.add_argument("--permitir-doble-plaza", action="store_true", default=None,
+                        help="permitirDoblePlaza (default: PlantillaCorteConfig)")
+    parser.add_argument("--guardar", action="store_true",
+                        help="Register the workbooks as uploads, then audit the database")
+    parser.add_argument("--dry-run", action="store_true", help="Database audit without writing anything")
+    parser.add_argument("--out", help="CSV with one row per inconsistency")
+    parser.add_argument("--workers", type=int, help="Worker processes for reading workbooks (default: CPU count)")
+    args = parser.parse_args()
+
+    offline = args.paths and not args.guardar
+    if offline and args.max_horas is not None:
+        config = {"maxHorasJornadaDocente": args.max_horas, "permitirDoblePlaza": bool(args.permitir_doble_plaza)}
+    else:
+        with sisat_db.pooled_connection() as conn:
+            config = load_config(conn, args.tenant)
+        if args.max_horas is not None:
+            config["maxHorasJornadaDocente"] = args.max_horas
+        if args.permitir_doble_plaza is not None:
+            config["permitirDoblePlaza"] = True
+
+    start = time.perf_counter()
+    rows = []
+    if args.paths:
+        results = parse_folder(args.paths, config, args.workers)
+        if not results:
+            parser.error("no .xlsx/.xlsm workbooks found")
+        for r in results:
+            if r.get("error"):
+                print(f"{r['archivo']}: ERROR {r['error']}")
+        results = [r for r in results if not r.get("error")]
+        print(f"{len(results)} plantillas leídas en {time.perf_counter() - start:.2f}s")
+        fuentes = [{"archivo": r["archivo"], "registro": None, "escuelaCCT": r["escuelaCCT"]} for r in results]
+        rows += report_rows(fuentes, [dict(i, fuente=f) for f, r in enumerate(results) for i in r["inconsistencias"]])
+        if args.guardar:
+            with sisat_db.pooled_connection() as conn:
+                print(f"{register_workbooks(conn, args.tenant, results)} plantillas nuevas registradas")
+
+    if offline:
+        plazas = [dict(p, fuente=f) for f, r in enumerate(results) for p in r["plazas"]]
+        inconsistencias, incompatible = audit_tenant(fuentes, plazas, config)
+    else:
+        with sisat_db.pooled_connection() as conn:
+            fuentes, plazas, ids, flags = load_db_plantillas(conn, args.tenant)
+            inconsistencias, incompatible = audit_tenant(fuentes, plazas, config)
+            if not args.dry_run:
+                changed, inserted = save_audit(conn, args.tenant, fuentes, inconsistencias, ids, flags, incompatible)
+                print(f"esIncompatible actualizado en {changed} plazas; {inserted} inconsistencias de zona guardadas")
+    rows += report_rows(fuentes, inconsistencias)
+
+    personas = sum(1 for _ in index_people(plazas))
+    print(f"{len(fuentes)} plantillas, {len(plazas)} plazas, {personas} personas con RFC/CURP: "
+          f"{sum(incompatible)} plazas incompatibles, {len(inconsistencias)} inconsistencias entre planteles "
+          f"({time.perf_counter() - start:.2f}s)")
+    if args.out:
+        write_report(args.out, rows)
+        print(f"Inconsistencias -> {args.out}")
+    return 1 if any(i["severidad"] == "ERROR_CRITICO" for i in inconsistencias) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""Validate returned registration workbooks (Registro_Zona_*_2026_Inteligente.xlsm) in bulk.
+
+Python port of the Workbook_BeforeSave rules generated by generar_excel_2026.py,
+built from the same build_layout() pair/single mappings. Each workbook is read
+once in read-only streaming mode into a (rows x columns) grid, and every rule is
+evaluated over whole columns with NumPy. Errors go to one CSV report per zone:
+
+    python validar_registros.py devueltos/ --out reportes/
+    python validar_registros.py Registro_Zona_004_2026_Inteligente.xlsm --offline
+"""
+import argparse
+import csv
+import glob
+import os
+import re
+import sys
+
+import numpy as np
+from openpyxl import load_workbook
+
+from generar_excel_2026 import CATEGORIAS_2026, FIRST_DATA_ROW, build_layout, load_event_config, zone_slug
+
+SHEET = "Registro General"
+HEADER_ROW = 2  # discipline names (rows 2-3 merged)
+ZONE_FILE_RE = re.compile(r"Registro_Zona_(.+?)_2026", re.IGNORECASE)
+REPORT_FIELDS = ["archivo", "fila", "cct", "escuela", "disciplina", "error"]
+
+
+def zone_of(path):
+    m = ZONE_FILE_RE.search(os.path.basename(path))
+    return m.group(1) if m else "SIN_ZONA"
+
+
+def find_workbooks(paths):
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files.extend(sorted(glob.glob(os.path.join(p, "*.xlsm"))))
+        else:
+            files.append(p)
+    # Skip Excel lock files left next to open workbooks
+    return [f for f in files if not os.path.basename(f).startswith("~$")]
+
+
+def read_grid(path, n_cols):
+    # -> (header names, Excel row numbers, object grid of the school rows)
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[SHEET]
+        header = next(ws.iter_rows(min_row=HEADER_ROW, max_row=HEADER_ROW, max_col=n_cols, values_only=True), ())
+        row_numbers = []
+        rows = []
+        for r, values in enumerate(ws.iter_rows(min_row=FIRST_DATA_ROW, max_col=n_cols, values_only=True),
+                                   start=FIRST_DATA_ROW):
+            if not values or values[0] in (None, ""):
+                continue
+            row_numbers.append(r)
+            rows.append(tuple(values) + (None,) * (n_cols - len(values)))
+    finally:
+        wb.close()
+    grid = np.empty((len(rows), n_cols), dtype=object)
+    if rows:
+        grid[:] = rows
+    return tuple(header) + (None,) * (n_cols - len(header)), np.array(row_numbers, dtype=int), grid
+
+
+def _to_count(value):
+    # VBA IsNumeric semantics, roughly: numbers and numeric text count, "" is empty
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return np.nan, True, False
+    if isinstance(value, bool):
+        return np.nan, False, True
+    if isinstance(value, (int, float)):
+        return float(value), False, False
+    try:
+        return float(str(value).strip().replace(",", ".")), False, False
+    except ValueError:
+        return np.nan, False, True
+
+
+def count_columns(grid):
+    # One conversion pass over the grid -> numeric value, empty and invalid masks
+    if not grid.size:
+        shape = grid.shape
+        return np.full(shape, np.nan), np.ones(shape, dtype=bool), np.zeros(shape, dtype=bool)
+    parsed = np.frompyfunc(_to_count, 1, 3)(grid)
+    return parsed[0].astype(float), parsed[1].astype(bool), parsed[2].astype(bool)
+
+
+def check_layout(header, all_disciplines):
+    problems = []
+    for desc in all_disciplines:
+        found = header[desc["col"] - 1]
+        if str(found or "").strip() != desc["name"]:
+            problems.append(f'Columna {desc["col"]}: se esperaba "{desc["name"]}", se encontró "{found or ""}"')
+    return problems
+
+
+def validate_grid(grid, pair_mapping, single_mapping):
+    # -> [(row mask, discipline, message)], the same checks BeforeSave runs row by row
+    si = grid == "Sí"
+    num, empty, invalid = count_columns(grid)
+    checks = []
+
+    for g, info in pair_mapping.items():
+        ic, ec, nc = info["indiv_col"] - 1, info["equipo_col"] - 1, info["num_col"] - 1
+        ind, eq = si[:, ic], si[:, ec]
+        n, e, bad = num[:, nc], empty[:, nc], invalid[:, nc]
+        eq_only = eq & ~ind
+        out_of_range = (n < info["equipo_min"]) | (n > info["equipo_max"])
+        checks += [
+            # Worksheet_Change keeps these exclusive, but pasted values bypass it
+            (ind & eq, g, f"[{g}] no puede marcarse como Indiv. y Equipo a la vez."),
+            (ind & (e | bad | (n != info["indiv_val"])), g,
+             f"[{g} - Indiv.] exige exactamente {info['indiv_val']} participante."),
+            (eq_only & e, g, f"Falta el número de participantes en [{g} - Equipo]"),
+            (eq_only & ~e & (bad | out_of_range), g,
+             f"[{g} - Equipo] exige entre {info['equipo_min']} y {info['equipo_max']} participantes."),
+            (~ind & ~eq & ~e, g, f"Si NO participa en [{g}], el número de participantes debe estar vacío."),
+        ]
+
+    for name, info in single_mapping.items():
+        pc, nc = info["participa_col"] - 1, info["num_col"] - 1
+        part = si[:, pc]
+        n, e, bad = num[:, nc], empty[:, nc], invalid[:, nc]
+        out_of_range = (n < info["min"]) | (n > info["max"])
+        checks += [
+            (part & (e | bad | out_of_range), name,
+             f"[{name}] exige entre {info['min']} y {info['max']} participantes."),
+            (~part & ~e, name, f"Si NO participa en [{name}], el número debe estar vacío."),
+        ]
+    return checks
+
+
+def validate_workbook(path, layout):
+    all_disciplines, _, pair_mapping, single_mapping = layout
+    n_cols = max([3] + [d["col"] for d in all_disciplines])
+    archivo = os.path.basename(path)
+    try:
+        header, row_numbers, grid = read_grid(path, n_cols)
+    except Exception as e:
+        return 0, [{"archivo": archivo, "fila": "", "cct": "", "escuela": "", "disciplina": "",
+                    "error": f"No se pudo leer el libro: {e}"}]
+
+    problems = check_layout(header, all_disciplines)
+    if problems:
+        # Columns can't be trusted against the rules once the layout differs
+        return len(row_numbers), [{"archivo": archivo, "fila": HEADER_ROW, "cct": "", "escuela": "",
+                                   "disciplina": "", "error": p} for p in problems]
+
+    errors = []
+    for mask, disciplina, message in validate_grid(grid, pair_mapping, single_mapping):
+        for i in np.flatnonzero(mask):
+            errors.append({"archivo": archivo, "fila": int(row_numbers[i]), "cct": grid[i, 0],
+                           "escuela": grid[i, 1], "disciplina": disciplina, "error": message})
+    errors.sort(key=lambda e: (e["fila"], e["disciplina"]))
+    return len(row_numbers), errors
+
+
+def write_report(path, errors):
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valida los registros de zona 2026 devueltos por las escuelas")
+    parser.add_argument("paths", nargs="+", help="Workbooks or folders of .xlsm files")
+    parser.add_argument("--out", default=".", help="Folder for the Errores_Zona_<zona>.csv reports")
+    parser.add_argument("--zona", help="Report every workbook under this zone instead of the one in its file name")
+    parser.add_argument("--offline", action="store_true", help="Use the built-in 2026 layout instead of the database")
+    args = parser.parse_args()
+
+    categories = CATEGORIAS_2026 if args.offline else load_event_config()[0]
+    layout = build_layout(categories)
+
+    files = find_workbooks(args.paths)
+    if not files:
+        parser.error("no .xlsm workbooks found")
+
+    por_zona = {}
+    for path in files:
+        por_zona.setdefault(args.zona or zone_of(path), []).append(path)
+
+    os.makedirs(args.out, exist_ok=True)
+    total_errors = 0
+    for zona, paths in sorted(por_zona.items()):
+        zone_errors = []
+        rows = 0
+        for path in paths:
+            n, errors = validate_workbook(path, layout)
+            rows += n
+            zone_errors.extend(errors)
+        report = os.path.join(args.out, f"Errores_Zona_{zone_slug(zona)}.csv")
+        write_report(report, zone_errors)
+        total_errors += len(zone_errors)
+        print(f"Zona {zona}: {len(paths)} libros, {rows} escuelas, {len(zone_errors)} errores -> {report}")
+    return 1 if total_errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())